@@ -0,0 +1,574 @@
+"""
+Geçici dosyalar (PDF raporları, yedekler) için yönetilen depo.
+
+Üretilen her dosya bir kimlikle (artifact id) bellek içi indexe kaydedilir:
+yol, boyut, içerik tipi ve son kullanma zamanı. Arka plandaki temizleyici süresi
+dolanları siler; toplam boyut bütçeyi aşarsa en uzun süredir kullanılmayanlar
+(LRU) silinir. `/api/download-temp/{file_id}` sadece bu indexte arama yapar.
+
+Önbelleklenen üretimler (raporlar) her zaman rastgele kimlikle yazılır; önbellek
+anahtarı kimliğe ayrı bir eşlemeyle bağlanır (`cached`/`commit(key=...)`). Aynı
+anahtarı eş zamanlı üreten sunucular birbirinin dosyasına dokunmaz: eşlemeyi ilk
+alan kazanır, diğerleri kendi dosyasını silip kazananınkini döndürür.
+
+Depolama arka ucu ortam değişkeniyle seçilir:
+    ARTIFACT_BACKEND=local    yerel disk (varsayılan); dosyalar ARTIFACT_DIR altında
+                              süreç başına ayrı bir dizinde tutulur
+    ARTIFACT_BACKEND=gridfs   MongoDB GridFS; birden çok sunucu birbirinin QR
+                              indirme linklerini sunabilir
+"""
+import asyncio
+import logging
+import os
+import re
+import secrets
+import shutil
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from email.utils import formatdate
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from gridfs.errors import NoFile
+from pymongo.errors import DuplicateKeyError
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+from starlette.datastructures import Headers
+from starlette.responses import Response
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIRECTORY = "/tmp/arkas_artifacts"
+DEFAULT_TTL_SECONDS = 3600
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_SWEEP_INTERVAL_SECONDS = 60
+GRIDFS_BUCKET = "artifacts"
+ALIAS_COLLECTION = "artifact_keys"
+CHUNK_SIZE = 256 * 1024
+
+# Kimlikler sunucuda üretilir; dışarıdan gelen kimlik yol olarak kullanılmadan önce doğrulanır
+_ARTIFACT_ID = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,200}$")
+
+
+def valid_artifact_id(artifact_id: str) -> bool:
+    return bool(_ARTIFACT_ID.match(artifact_id)) and ".." not in artifact_id
+
+
+# Her süreç ARTIFACT_DIR altında kendi dizinini kullanır ({pid}-{token}); yapılandırılan
+# dizin paylaşımlı olabilir (/tmp, aynı makinedeki diğer worker'lar), hiçbir zaman silinmez
+_PROCESS_DIRECTORY = re.compile(r"^(\d+)-[0-9a-f]{8}$")
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _make_process_directory(base: str, stale_after: float) -> str:
+    """Süreç dizinini oluşturur; çökmüş süreçlerden kalan eski dizinleri temizler.
+    Sadece bu deponun adlandırdığı, süreci çalışmayan ve süre sınırından eski dizinler silinir."""
+    os.makedirs(base, exist_ok=True)
+    now = datetime.now().timestamp()
+    for name in os.listdir(base):
+        match = _PROCESS_DIRECTORY.match(name)
+        if not match or int(match.group(1)) == os.getpid() or _pid_alive(int(match.group(1))):
+            continue
+        path = os.path.join(base, name)
+        try:
+            if now - os.path.getmtime(path) > stale_after:
+                shutil.rmtree(path, True)
+        except OSError:
+            pass
+    directory = os.path.join(base, f"{os.getpid()}-{secrets.token_hex(4)}")
+    os.makedirs(directory)
+    return directory
+
+
+class ArtifactInfo:
+    __slots__ = ("id", "filename", "content_type", "size", "created_at", "expires_at", "path", "key")
+
+    def __init__(self, artifact_id: str, filename: str, content_type: str, size: int,
+                 expires_at: datetime, created_at: Optional[datetime] = None, path: Optional[str] = None):
+        self.id = artifact_id
+        self.filename = filename
+        self.content_type = content_type
+        self.size = size
+        self.created_at = created_at or datetime.now(timezone.utc)
+        self.expires_at = expires_at
+        # Yerel diskteki yol; GridFS'te None
+        self.path = path
+        # Bağlı olduğu önbellek anahtarı; artifact silinince eşleme de kaldırılır
+        self.key: Optional[str] = None
+
+    def expired(self, now: datetime) -> bool:
+        return self.expires_at <= now
+
+    @property
+    def etag(self) -> str:
+        # Artifact içeriği değişmez ve kimlik tekrar kullanılmaz; güçlü ETag için yeterli
+        return f'"{self.id}-{self.size}"'
+
+
+class LocalDiskBackend:
+    """Dosyalar tek bir dizinde artifact id adıyla tutulur"""
+
+    name = "local"
+
+    def __init__(self, directory: str = DEFAULT_DIRECTORY):
+        self.base_directory = directory
+        self.directory: Optional[str] = None
+        # Önbellek anahtarı -> artifact id; dosyalar süreçte olduğundan eşleme de süreçte
+        self.aliases: Dict[str, str] = {}
+
+    async def start(self, stale_after: float = DEFAULT_TTL_SECONDS):
+        # Index bellekte; dosyalar bu sürece ait dizinde tutulur
+        self.directory = await asyncio.to_thread(_make_process_directory, self.base_directory, stale_after)
+
+    async def stop(self):
+        # Süreç kapanınca indexi de gider; kendi dosyaları artık sunulamaz
+        if self.directory:
+            await asyncio.to_thread(shutil.rmtree, self.directory, True)
+
+    def staging_path(self, artifact_id: str) -> str:
+        return os.path.join(self.directory, artifact_id)
+
+    async def store(self, info: ArtifactInfo, staging_path: str):
+        info.path = staging_path
+
+    async def lookup(self, artifact_id: str) -> Optional[ArtifactInfo]:
+        return None
+
+    async def find_alias(self, key: str) -> Optional[str]:
+        return self.aliases.get(key)
+
+    async def claim_alias(self, key: str, info: ArtifactInfo) -> str:
+        return self.aliases.setdefault(key, info.id)
+
+    async def drop_alias(self, key: str, artifact_id: str):
+        if self.aliases.get(key) == artifact_id:
+            del self.aliases[key]
+
+    async def delete(self, info: ArtifactInfo):
+        try:
+            await asyncio.to_thread(os.remove, info.path)
+        except FileNotFoundError:
+            pass
+
+    async def delete_expired(self, now: datetime):
+        return None
+
+    async def iter_range(self, info: ArtifactInfo, start: int, length: int) -> AsyncIterator[bytes]:
+        handle = await asyncio.to_thread(open, info.path, "rb")
+        try:
+            await asyncio.to_thread(handle.seek, start)
+            while length > 0:
+                chunk = await asyncio.to_thread(handle.read, min(CHUNK_SIZE, length))
+                if not chunk:
+                    break
+                length -= len(chunk)
+                yield chunk
+        finally:
+            await asyncio.to_thread(handle.close)
+
+
+class GridFSBackend:
+    """Dosyalar GridFS'te tutulur; son kullanma zamanı metadata'dadır.
+    Başka bir sunucunun ürettiği dosya, indexte yoksa GridFS'ten bulunur."""
+
+    name = "gridfs"
+
+    def __init__(self, db, bucket_name: str = GRIDFS_BUCKET, staging_directory: str = DEFAULT_DIRECTORY):
+        self.db = db
+        self.bucket_name = bucket_name
+        self.bucket = AsyncIOMotorGridFSBucket(db, bucket_name=bucket_name)
+        self.base_directory = staging_directory
+        self.staging_directory: Optional[str] = None
+
+    @property
+    def files(self):
+        return self.db[f"{self.bucket_name}.files"]
+
+    @property
+    def aliases(self):
+        return self.db[ALIAS_COLLECTION]
+
+    async def start(self, stale_after: float = DEFAULT_TTL_SECONDS):
+        self.staging_directory = await asyncio.to_thread(_make_process_directory, self.base_directory, stale_after)
+
+    async def stop(self):
+        if self.staging_directory:
+            await asyncio.to_thread(shutil.rmtree, self.staging_directory, True)
+
+    def staging_path(self, artifact_id: str) -> str:
+        return os.path.join(self.staging_directory, artifact_id)
+
+    async def store(self, info: ArtifactInfo, staging_path: str):
+        grid_in = self.bucket.open_upload_stream_with_id(
+            info.id,
+            info.id,
+            metadata={
+                "download_name": info.filename,
+                "content_type": info.content_type,
+                "expires_at": info.expires_at,
+            }
+        )
+        handle = await asyncio.to_thread(open, staging_path, "rb")
+        try:
+            while True:
+                chunk = await asyncio.to_thread(handle.read, CHUNK_SIZE)
+                if not chunk:
+                    break
+                await grid_in.write(chunk)
+            await grid_in.close()
+        except BaseException:
+            await grid_in.abort()
+            raise
+        finally:
+            await asyncio.to_thread(handle.close)
+            await asyncio.to_thread(os.remove, staging_path)
+
+    async def lookup(self, artifact_id: str) -> Optional[ArtifactInfo]:
+        doc = await self.files.find_one({"_id": artifact_id})
+        if doc is None:
+            return None
+        metadata = doc.get("metadata") or {}
+        expires_at = metadata.get("expires_at")
+        if expires_at is None:
+            return None
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        return ArtifactInfo(
+            artifact_id,
+            metadata.get("download_name") or doc.get("filename") or artifact_id,
+            metadata.get("content_type") or "application/octet-stream",
+            doc.get("length", 0),
+            expires_at,
+            created_at=doc.get("uploadDate")
+        )
+
+    async def find_alias(self, key: str) -> Optional[str]:
+        doc = await self.aliases.find_one({"_id": key})
+        return doc["artifact_id"] if doc else None
+
+    async def claim_alias(self, key: str, info: ArtifactInfo) -> str:
+        """Anahtar boşsa veya süresi dolmuşsa bu artifact'a bağlar; geçerli bir eşleme
+        varsa (başka sunucu önce yazdı) upsert çakışır ve o eşlemenin kimliği döner"""
+        try:
+            await self.aliases.update_one(
+                {"_id": key, "expires_at": {"$lte": datetime.now(timezone.utc)}},
+                {"$set": {"artifact_id": info.id, "expires_at": info.expires_at}},
+                upsert=True
+            )
+            return info.id
+        except DuplicateKeyError:
+            doc = await self.aliases.find_one({"_id": key})
+            return doc["artifact_id"] if doc else info.id
+
+    async def drop_alias(self, key: str, artifact_id: str):
+        await self.aliases.delete_one({"_id": key, "artifact_id": artifact_id})
+
+    async def delete(self, info: ArtifactInfo):
+        try:
+            await self.bucket.delete(info.id)
+        except NoFile:
+            pass
+
+    async def delete_expired(self, now: datetime):
+        """Herhangi bir sunucunun ürettiği süresi dolmuş dosyaları ve eşlemeleri siler"""
+        async for doc in self.files.find({"metadata.expires_at": {"$lte": now}}, {"_id": 1}):
+            try:
+                await self.bucket.delete(doc["_id"])
+            except NoFile:
+                pass
+        await self.aliases.delete_many({"expires_at": {"$lte": now}})
+
+    async def iter_range(self, info: ArtifactInfo, start: int, length: int) -> AsyncIterator[bytes]:
+        grid_out = await self.bucket.open_download_stream(info.id)
+        grid_out.seek(start)
+        while length > 0:
+            chunk = await grid_out.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+class ArtifactStore:
+    """Artifact indexi: süre dolumu, toplam boyut bütçesi ve LRU silme"""
+
+    def __init__(self, backend, ttl_seconds: int = DEFAULT_TTL_SECONDS, max_bytes: int = DEFAULT_MAX_BYTES,
+                 sweep_interval: int = DEFAULT_SWEEP_INTERVAL_SECONDS):
+        self.backend = backend
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        # En son kullanılan sonda (LRU)
+        self.index: "OrderedDict[str, ArtifactInfo]" = OrderedDict()
+        self.total_bytes = 0
+        self.sweeper: Optional[asyncio.Task] = None
+        self.lock = asyncio.Lock()
+
+    # ---- Yaşam döngüsü ----
+
+    async def start(self):
+        await self.backend.start(self.ttl.total_seconds())
+        self.sweeper = asyncio.create_task(self.sweep_forever())
+        logger.info(
+            f"Artifact deposu hazır: {self.backend.name}, süre {int(self.ttl.total_seconds())}s, "
+            f"bütçe {self.max_bytes // (1024 * 1024)} MB"
+        )
+
+    async def stop(self):
+        if self.sweeper:
+            self.sweeper.cancel()
+        await self.backend.stop()
+
+    async def sweep_forever(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Artifact temizliği başarısız: {str(e)}")
+
+    async def sweep(self) -> int:
+        """Süresi dolan artifact'ları siler, silinen sayısını döndürür"""
+        now = datetime.now(timezone.utc)
+        async with self.lock:
+            expired = [info for info in self.index.values() if info.expired(now)]
+            for info in expired:
+                self._forget(info)
+        for info in expired:
+            await self._delete(info)
+        await self.backend.delete_expired(now)
+        if expired:
+            logger.info(f"Süresi dolan {len(expired)} artifact silindi")
+        return len(expired)
+
+    # ---- Üretim ----
+
+    def new_id(self, prefix: str, extension: str) -> str:
+        return f"{prefix}_{secrets.token_hex(8)}{extension}"
+
+    def staging_path(self, artifact_id: str) -> str:
+        """Üreticinin dosyayı yazacağı yol; yazım bitince commit() çağrılır"""
+        return self.backend.staging_path(artifact_id)
+
+    async def commit(self, artifact_id: str, filename: str, content_type: str,
+                     ttl_seconds: Optional[int] = None, key: Optional[str] = None) -> ArtifactInfo:
+        """Yazılmış dosyayı depoya alır ve indexe ekler; bütçe aşılırsa eski dosyalar silinir.
+        `key` verilirse dosya önbellek anahtarına bağlanır; anahtar başka bir üretime
+        bağlandıysa bu dosya silinir ve o üretim döndürülür."""
+        staging_path = self.staging_path(artifact_id)
+        size = await asyncio.to_thread(os.path.getsize, staging_path)
+        ttl = self.ttl if ttl_seconds is None else timedelta(seconds=ttl_seconds)
+        info = ArtifactInfo(artifact_id, filename, content_type, size, datetime.now(timezone.utc) + ttl)
+        await self.backend.store(info, staging_path)
+
+        async with self.lock:
+            self._remember(info)
+            evicted = []
+            while self.total_bytes > self.max_bytes and len(self.index) > 1:
+                _, oldest = next(iter(self.index.items()))
+                self._forget(oldest)
+                evicted.append(oldest)
+        for old in evicted:
+            await self._delete(old)
+        if evicted:
+            logger.info(f"Boyut bütçesi için {len(evicted)} artifact silindi (LRU)")
+        if key is not None:
+            return await self._claim(key, info)
+        return info
+
+    async def _claim(self, key: str, info: ArtifactInfo) -> ArtifactInfo:
+        winner_id = await self.backend.claim_alias(key, info)
+        winner = info if winner_id == info.id else await self.get(winner_id)
+        if winner is None:
+            # Eşlenen dosya süresi dolmuş veya silinmiş; eşleme bu dosyayla yenilenir
+            await self.backend.drop_alias(key, winner_id)
+            winner_id = await self.backend.claim_alias(key, info)
+            winner = info if winner_id == info.id else await self.get(winner_id)
+            if winner is None:
+                return info
+        if winner is info:
+            info.key = key
+        else:
+            await self.remove(info)
+        return winner
+
+    async def cached(self, key: str) -> Optional[ArtifactInfo]:
+        """Önbellek anahtarına bağlı geçerli artifact; yoksa veya süresi dolduysa None"""
+        artifact_id = await self.backend.find_alias(key)
+        if artifact_id is None:
+            return None
+        info = await self.get(artifact_id)
+        if info is None:
+            await self.backend.drop_alias(key, artifact_id)
+        return info
+
+    async def remove(self, info: ArtifactInfo):
+        async with self.lock:
+            self._forget(info)
+        await self._delete(info)
+
+    async def _delete(self, info: ArtifactInfo):
+        """Artifact dosyasını ve (varsa) önbellek anahtarı eşlemesini siler"""
+        await self.backend.delete(info)
+        if info.key is not None:
+            await self.backend.drop_alias(info.key, info.id)
+
+    async def discard(self, artifact_id: str):
+        """Yarım kalan üretimin geçici dosyasını siler"""
+        try:
+            await asyncio.to_thread(os.remove, self.staging_path(artifact_id))
+        except FileNotFoundError:
+            pass
+
+    # ---- Okuma ----
+
+    async def get(self, artifact_id: str) -> Optional[ArtifactInfo]:
+        if not valid_artifact_id(artifact_id):
+            return None
+        now = datetime.now(timezone.utc)
+        info = self.index.get(artifact_id)
+        if info is None:
+            info = await self.backend.lookup(artifact_id)
+            if info is None:
+                return None
+            async with self.lock:
+                if artifact_id not in self.index:
+                    self._remember(info)
+        if info.expired(now):
+            async with self.lock:
+                self._forget(info)
+            await self._delete(info)
+            return None
+        self.index.move_to_end(artifact_id)
+        return info
+
+    def iter_range(self, info: ArtifactInfo, start: int, length: int) -> AsyncIterator[bytes]:
+        return self.backend.iter_range(info, start, length)
+
+    def stats(self) -> Dict[str, int]:
+        return {"count": len(self.index), "bytes": self.total_bytes, "max_bytes": self.max_bytes}
+
+    # ---- Index ----
+
+    def _remember(self, info: ArtifactInfo):
+        self.index[info.id] = info
+        self.total_bytes += info.size
+
+    def _forget(self, info: ArtifactInfo):
+        if self.index.pop(info.id, None) is not None:
+            self.total_bytes -= info.size
+
+
+class RangeNotSatisfiable(ValueError):
+    pass
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Tek aralıklı `bytes=` başlığını (başlangıç, bitiş) olarak döndürür.
+    Anlaşılmayan veya çok aralıklı istekler için None (tüm dosya gönderilir)."""
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, dash, last = spec.strip().partition("-")
+    if not dash:
+        return None
+    try:
+        if first == "":
+            suffix = int(last)
+            if suffix <= 0 or size == 0:
+                raise RangeNotSatisfiable(header)
+            return max(size - suffix, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start < 0 or end < start and last:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable(header)
+    return start, min(end, size - 1)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+class ArtifactResponse(Response):
+    """Artifact indirme yanıtı: Range (206), If-Range, ETag/304 ve HEAD desteği.
+    Gövde, sadece istenen aralık okunarak parça parça gönderilir."""
+
+    def __init__(self, info: ArtifactInfo, store: "ArtifactStore", headers: Optional[Dict[str, str]] = None):
+        self.info = info
+        self.store = store
+        self.status_code = 200
+        self.media_type = info.content_type
+        self.background = None
+        self.init_headers(headers)
+        remaining = max(int((info.expires_at - datetime.now(timezone.utc)).total_seconds()), 0)
+        self.headers["etag"] = info.etag
+        self.headers["last-modified"] = formatdate(info.created_at.timestamp(), usegmt=True)
+        self.headers["accept-ranges"] = "bytes"
+        self.headers["cache-control"] = f"private, max-age={remaining}, immutable"
+
+    async def __call__(self, scope, receive, send):
+        request_headers = Headers(scope=scope)
+        size = self.info.size
+        start, length = 0, size
+
+        if _etag_matches(request_headers.get("if-none-match", ""), self.info.etag):
+            del self.headers["content-type"]
+            await self._send_empty(send, 304)
+            return
+
+        range_header = request_headers.get("range")
+        if_range = request_headers.get("if-range")
+        if range_header and (if_range is None or if_range.strip() == self.info.etag):
+            try:
+                byte_range = parse_range(range_header, size)
+            except RangeNotSatisfiable:
+                self.headers["content-range"] = f"bytes */{size}"
+                self.headers["content-length"] = "0"
+                await self._send_empty(send, 416)
+                return
+            if byte_range is not None:
+                start, end = byte_range
+                length = end - start + 1
+                self.status_code = 206
+                self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+
+        self.headers["content-length"] = str(length)
+        if scope["method"].upper() == "HEAD" or length == 0:
+            await self._send_empty(send, self.status_code)
+            return
+
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        async for chunk in self.store.iter_range(self.info, start, length):
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def _send_empty(self, send, status_code: int):
+        await send({"type": "http.response.start", "status": status_code, "headers": self.raw_headers})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def store_from_env(db) -> ArtifactStore:
+    """ARTIFACT_* ortam değişkenlerinden depo oluşturur"""
+    directory = os.environ.get("ARTIFACT_DIR", DEFAULT_DIRECTORY)
+    if os.environ.get("ARTIFACT_BACKEND", "local") == "gridfs":
+        backend = GridFSBackend(db, os.environ.get("ARTIFACT_GRIDFS_BUCKET", GRIDFS_BUCKET), directory)
+    else:
+        backend = LocalDiskBackend(directory)
+    return ArtifactStore(
+        backend,
+        ttl_seconds=int(os.environ.get("ARTIFACT_TTL_SECONDS", DEFAULT_TTL_SECONDS)),
+        max_bytes=int(os.environ.get("ARTIFACT_MAX_MB", DEFAULT_MAX_BYTES // (1024 * 1024))) * 1024 * 1024,
+        sweep_interval=int(os.environ.get("ARTIFACT_SWEEP_INTERVAL_SECONDS", DEFAULT_SWEEP_INTERVAL_SECONDS)),
+    )
@@ -0,0 +1,745 @@
+"""
+Yedek dosyaları: akış halinde yazma, okuma ve geri yükleme.
+
+Varsayılan yedek biçimi (json):
+
+    {"timestamp": ..., "version": "2.0", "nakliyeData": [...], "yatulanTutarData": [...]}
+
+Diğer biçimler (jsonl.gz, jsonl.zst, bson) aynı içeriği belge akışı olarak
+taşır: önce başlık belgesi, sonra her bölüm için {"section": "nakliyeData"}
+belgesi ve o bölümün kayıtları. Geri yükleme biçimi dosyanın başından anlar.
+
+Başlıktaki `manifest` yedeğin kimliğini taşır. Artımlı (incremental) yedekler
+sadece ana (parent) yedeğin filigranından (watermark) sonra `updated_at` değeri
+değişen kayıtları ve silinen kayıtların iz kayıtlarını (tombstone, `deletedData`)
+içerir; tam yedek + artımlı yedekler sırayla yüklenerek zincir yeniden oynatılır.
+
+Yazarken belgeler async cursor'dan batch'ler halinde okunup parça parça
+serileştirilir; okurken dosyanın tamamı belleğe alınmadan çözülür ve kayıt
+dizilerindeki her eleman ayrı bir olay olarak döner. Her iki yönde de bellek
+kullanımı bir batch ile sınırlıdır. Geri yüklemede tekrar eden kayıtlar doğal
+anahtar üzerindeki unique index ile ayıklanır (bkz. index_manager.py).
+"""
+import asyncio
+import codecs
+import json
+import logging
+import os
+import re
+import uuid
+import zlib
+from datetime import date, datetime, timedelta, timezone
+from typing import AsyncIterable, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+import bson
+import zstandard
+from bson.codec_options import CodecOptions
+from bson.errors import InvalidBSON
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+NAKLIYE_SECTION = "nakliyeData"
+YATAN_SECTION = "yatulanTutarData"
+DELETED_SECTION = "deletedData"
+RECORD_SECTIONS = (NAKLIYE_SECTION, YATAN_SECTION, DELETED_SECTION)
+
+# Aynı kaydı tanımlayan alanlar; geri yüklemede tekrar kontrolü bunlarla yapılır
+DEDUP_KEYS = {
+    "nakliye_kayitlari": ("sira_no", "musteri", "irsaliye_no"),
+    "yatan_tutar": ("tutar", "yatan_tarih", "baslangic_tarih"),
+}
+
+# Yedeğe yazılan koleksiyonlar, sırasıyla
+BACKUP_SECTIONS = ((NAKLIYE_SECTION, "nakliye_kayitlari"), (YATAN_SECTION, "yatan_tutar"))
+BACKUP_VERSION = "2.0"
+# Yedekte tutulmayan alanlar: Mongo _id, geri yüklemede yeniden üretilen arama alanı ve toplu işlem işareti
+BACKUP_PROJECTION = {"_id": 0, "arama_tokenlari": 0, "_bulk_op": 0}
+
+# format parametresi -> (dosya uzantısı, içerik tipi)
+BACKUP_FORMATS = {
+    "json": (".json", "application/json"),
+    "jsonl.gz": (".jsonl.gz", "application/gzip"),
+    "jsonl.zst": (".jsonl.zst", "application/zstd"),
+    "bson": (".bson", "application/octet-stream"),
+}
+DEFAULT_BACKUP_FORMAT = "json"
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+MAX_BSON_SIZE = 16 * 1024 * 1024
+_BSON_OPTIONS = CodecOptions(tz_aware=True)
+
+# Artımlı yedekler: üretilen yedeklerin kaydı, silinen kayıt izleri ve geri yükleme zincirinin ucu
+MANIFEST_COLLECTION = "backup_manifests"
+TOMBSTONE_COLLECTION = "deleted_records"
+RESTORE_STATE_COLLECTION = "backup_state"
+RESTORE_TIP_ID = "restore_tip"
+# İz kayıtları bu süre sonra TTL index ile silinir; ana yedek bundan eskiyse tam yedek gerekir
+TOMBSTONE_TTL = timedelta(days=365)
+# Yedek sırasında yazılıp cursor'ın kaçırdığı kayıtlar için bir sonraki artımlı yedek
+# filigrandan biraz öncesini de kapsar (aynı kaydın iki yedekte olması zararsız)
+WATERMARK_SKEW = timedelta(minutes=5)
+
+BACKUP_BATCH_SIZE = 500
+RESTORE_BATCH_SIZE = 1000
+# Tek bir kaydın çözülmeden bekleyebileceği en fazla karakter (bozuk dosyaya karşı)
+MAX_PENDING_CHARS = 1024 * 1024
+# Sıkıştırılmış yedekte bir adımda açılan en fazla veri; küçük bir dosya tek adımda
+# belleği dolduracak kadar açılamaz (zstd'de sınır bir bloğun açılmış boyudur, 128 KB)
+DECOMPRESS_CHUNK = 256 * 1024
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class BackupParseError(ValueError):
+    pass
+
+
+class BackupChainError(ValueError):
+    pass
+
+
+class _NeedMore(Exception):
+    pass
+
+
+class BackupStreamParser:
+    """Yedek JSON'unu parça parça çözer.
+
+    feed() her çağrıda tamamlanan olayları döndürür:
+        ("section", bölüm adı, None)   bir kayıt dizisi başladı
+        ("record", bölüm adı, kayıt)   kayıt dizilerinin elemanları
+        ("meta", anahtar, değer)       diğer üst düzey alanlar
+    """
+
+    def __init__(self, record_sections=RECORD_SECTIONS):
+        self.record_sections = set(record_sections)
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.state = "start"
+        self.key = None
+        self.eof = False
+
+    def feed(self, text: str) -> List[tuple]:
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+        return self._parse()
+
+    def close(self) -> List[tuple]:
+        self.eof = True
+        events = self._parse()
+        if self.state != "done":
+            raise BackupParseError("Yedek dosyası eksik veya yarım")
+        return events
+
+    def _decode(self):
+        try:
+            value, end = self.decoder.raw_decode(self.buffer, self.pos)
+        except json.JSONDecodeError as e:
+            if self.eof:
+                raise BackupParseError(f"Geçersiz JSON (konum {e.pos}): {e.msg}")
+            if len(self.buffer) - self.pos > MAX_PENDING_CHARS:
+                raise BackupParseError("Yedek dosyasında çok büyük veya bozuk kayıt")
+            raise _NeedMore()
+        # Sayı gibi değerler parçanın sonunda kesilmiş olabilir
+        if end == len(self.buffer) and not self.eof:
+            raise _NeedMore()
+        self.pos = end
+        return value
+
+    def _expect(self, char: str):
+        if self.buffer[self.pos] != char:
+            raise BackupParseError(f"Geçersiz yedek dosyası: '{char}' bekleniyordu")
+        self.pos += 1
+
+    def _parse(self) -> List[tuple]:
+        events = []
+        buffer = self.buffer
+        while True:
+            self.pos = _WHITESPACE.match(buffer, self.pos).end()
+            if self.pos >= len(buffer):
+                break
+            char = buffer[self.pos]
+            state = self.state
+            try:
+                if state == "start":
+                    self._expect("{")
+                    self.state = "key"
+                elif state == "key":
+                    if char == "}":
+                        self.pos += 1
+                        self.state = "done"
+                        continue
+                    key = self._decode()
+                    if not isinstance(key, str):
+                        raise BackupParseError("Geçersiz yedek dosyası: alan adı bekleniyordu")
+                    self.key = key
+                    self.state = "colon"
+                elif state == "colon":
+                    self._expect(":")
+                    self.state = "value"
+                elif state == "value":
+                    if self.key in self.record_sections and char == "[":
+                        self.pos += 1
+                        events.append(("section", self.key, None))
+                        self.state = "first_item"
+                    else:
+                        events.append(("meta", self.key, self._decode()))
+                        self.state = "object_sep"
+                elif state == "first_item":
+                    if char == "]":
+                        self.pos += 1
+                        self.state = "object_sep"
+                    else:
+                        self.state = "item"
+                elif state == "item":
+                    events.append(("record", self.key, self._decode()))
+                    self.state = "item_sep"
+                elif state == "item_sep":
+                    if char == "]":
+                        self.pos += 1
+                        self.state = "object_sep"
+                    else:
+                        self._expect(",")
+                        self.state = "item"
+                elif state == "object_sep":
+                    if char == "}":
+                        self.pos += 1
+                        self.state = "done"
+                    else:
+                        self._expect(",")
+                        self.state = "key"
+                else:
+                    raise BackupParseError("Yedek dosyasının sonunda fazladan veri var")
+            except _NeedMore:
+                break
+        return events
+
+
+class _DocumentStream:
+    """Satır/belge tabanlı biçimler (JSON lines, BSON) için ortak olay üretimi.
+    İlk belge başlıktır; {"section": ad} belgeleri kayıt bölümünü değiştirir."""
+
+    def __init__(self, record_sections=RECORD_SECTIONS):
+        self.record_sections = set(record_sections)
+        self.header_seen = False
+        self.section = None
+
+    def _document(self, doc) -> List[tuple]:
+        if not isinstance(doc, dict):
+            raise BackupParseError("Geçersiz yedek satırı: nesne bekleniyordu")
+        if not self.header_seen:
+            self.header_seen = True
+            return [("meta", key, value) for key, value in doc.items()]
+        if len(doc) == 1 and "section" in doc:
+            if doc["section"] not in self.record_sections:
+                raise BackupParseError(f"Bilinmeyen yedek bölümü: {doc['section']}")
+            self.section = doc["section"]
+            return [("section", self.section, None)]
+        if self.section is None:
+            raise BackupParseError("Geçersiz yedek dosyası: kayıt bölümü belirtilmemiş")
+        return [("record", self.section, doc)]
+
+    def _finish(self):
+        if not self.header_seen:
+            raise BackupParseError("Yedek dosyası boş")
+
+
+class JsonLinesParser(_DocumentStream):
+    """Her satırı bir JSON nesnesi olan yedekleri parça parça çözer"""
+
+    def __init__(self, record_sections=RECORD_SECTIONS):
+        super().__init__(record_sections)
+        self.pending = b""
+
+    def feed(self, data: bytes) -> List[tuple]:
+        lines = (self.pending + data).split(b"\n")
+        self.pending = lines.pop()
+        if len(self.pending) > MAX_PENDING_CHARS:
+            raise BackupParseError("Yedek dosyasında çok büyük veya bozuk kayıt")
+        events = []
+        for line in lines:
+            events.extend(self._line(line))
+        return events
+
+    def close(self) -> List[tuple]:
+        events = self._line(self.pending)
+        self.pending = b""
+        self._finish()
+        return events
+
+    def _line(self, line: bytes) -> List[tuple]:
+        line = line.strip()
+        if not line:
+            return []
+        try:
+            doc = json.loads(line)
+        except ValueError as e:
+            raise BackupParseError(f"Geçersiz JSON satırı: {str(e)}")
+        return self._document(doc)
+
+
+class BsonStreamParser(_DocumentStream):
+    """Art arda yazılmış BSON belgelerinden oluşan yedekleri parça parça çözer"""
+
+    def __init__(self, record_sections=RECORD_SECTIONS):
+        super().__init__(record_sections)
+        self.buffer = bytearray()
+
+    def feed(self, data: bytes) -> List[tuple]:
+        self.buffer += data
+        events = []
+        pos = 0
+        while len(self.buffer) - pos >= 4:
+            size = int.from_bytes(self.buffer[pos:pos + 4], "little")
+            if size < 5 or size > MAX_BSON_SIZE:
+                raise BackupParseError("Geçersiz BSON yedek dosyası")
+            if len(self.buffer) - pos < size:
+                break
+            try:
+                doc = bson.decode(bytes(self.buffer[pos:pos + size]), codec_options=_BSON_OPTIONS)
+            except InvalidBSON as e:
+                raise BackupParseError(f"Geçersiz BSON belgesi: {str(e)}")
+            pos += size
+            events.extend(self._document(doc))
+        del self.buffer[:pos]
+        return events
+
+    def close(self) -> List[tuple]:
+        if self.buffer:
+            raise BackupParseError("Yedek dosyası eksik veya yarım")
+        self._finish()
+        return []
+
+
+async def _read_head(stream, min_size: int, until: bytes = None, limit: int = 64 * 1024) -> bytes:
+    """Biçim tespiti için akışın başından en az min_size byte (veya `until` görülene kadar) okur"""
+    head = b""
+    while len(head) < min_size or (until is not None and until not in head and len(head) < limit):
+        try:
+            head += await stream.__anext__()
+        except StopAsyncIteration:
+            break
+    return head
+
+
+async def _prepend(head: bytes, stream):
+    if head:
+        yield head
+    async for chunk in stream:
+        yield chunk
+
+
+class _GzipDecoder:
+    def __init__(self):
+        self.decompressor = zlib.decompressobj(wbits=31)
+
+    @property
+    def eof(self) -> bool:
+        return self.decompressor.eof
+
+    def feed(self, chunk: bytes) -> Iterator[bytes]:
+        data = chunk
+        while True:
+            output = self.decompressor.decompress(data, DECOMPRESS_CHUNK)
+            if output:
+                yield output
+            data = self.decompressor.unconsumed_tail
+            # Çıktı sınıra ulaştıysa açıcıda bekleyen veri olabilir
+            if not data and len(output) < DECOMPRESS_CHUNK:
+                return
+
+
+class _ZstdDecoder:
+    """zstd açıcısının çıktı sınırı yoktur; girdi çerçeve başlığı, blok ve sağlama
+    parçalarına bölünüp açıcıya her seferde en çok bir blok verilir."""
+
+    def __init__(self):
+        self.decompressor = zstandard.ZstdDecompressor().decompressobj()
+        self.buffer = bytearray()
+        self.state = "frame"  # frame | block | checksum
+        self.checksum = False
+
+    @property
+    def eof(self) -> bool:
+        return self.decompressor.eof
+
+    def _piece(self) -> Optional[Tuple[int, str, bool]]:
+        """Tampondaki sıradaki parçanın boyu ve sonraki durum; boy henüz bilinmiyorsa None"""
+        buffer = self.buffer
+        if self.state == "frame":
+            if len(buffer) < 5:
+                return None
+            if buffer[:4] != ZSTD_MAGIC:
+                # Açıcı hatayı bildirir
+                return len(buffer), "frame", False
+            descriptor = buffer[4]
+            single_segment = descriptor & 0x20
+            size = 5 + (0 if single_segment else 1) + (0, 1, 2, 4)[descriptor & 3] + \
+                (1 if single_segment else 0, 2, 4, 8)[descriptor >> 6]
+            return size, "block", bool(descriptor & 0x04)
+        if self.state == "block":
+            if len(buffer) < 3:
+                return None
+            header = int.from_bytes(buffer[:3], "little")
+            # RLE bloğunda içerik tek byte, diğerlerinde başlıktaki boy kadar
+            size = 3 + (1 if (header >> 1) & 3 == 1 else header >> 3)
+            if not header & 1:
+                return size, "block", self.checksum
+            return size, "checksum" if self.checksum else "frame", self.checksum
+        return 4, "frame", False
+
+    def feed(self, chunk: bytes) -> Iterator[bytes]:
+        self.buffer += chunk
+        while True:
+            piece = self._piece()
+            if piece is None or piece[0] > len(self.buffer):
+                return
+            size, self.state, self.checksum = piece
+            data = bytes(self.buffer[:size])
+            del self.buffer[:size]
+            output = self.decompressor.decompress(data)
+            if output:
+                yield output
+
+
+async def _decompressed(stream, decoder):
+    try:
+        async for chunk in stream:
+            if not chunk:
+                continue
+            for data in decoder.feed(chunk):
+                yield data
+    except (zlib.error, zstandard.ZstdError) as e:
+        raise BackupParseError(f"Sıkıştırılmış yedek çözülemedi: {str(e)}")
+    if not decoder.eof:
+        raise BackupParseError("Sıkıştırılmış yedek eksik veya yarım")
+
+
+def _is_jsonl_header(line: bytes) -> bool:
+    try:
+        header = json.loads(line)
+    except ValueError:
+        return False
+    return isinstance(header, dict) and header.get("format") == "jsonl"
+
+
+async def _parse_stream(stream, parser):
+    for_text = isinstance(parser, BackupStreamParser)
+    text_decoder = codecs.getincrementaldecoder("utf-8-sig")() if for_text else None
+    try:
+        async for chunk in stream:
+            for event in parser.feed(text_decoder.decode(chunk) if for_text else chunk):
+                yield event
+        if for_text:
+            for event in parser.feed(text_decoder.decode(b"", final=True)):
+                yield event
+        for event in parser.close():
+            yield event
+    except UnicodeDecodeError:
+        raise BackupParseError("Yedek dosyası UTF-8 değil")
+
+
+async def iter_backup_events(chunks: AsyncIterable[bytes], record_sections=RECORD_SECTIONS):
+    """Byte parçalarından (ör. request.stream()) yedek olaylarını üretir.
+    Biçim (JSON, JSON lines, BSON; gzip/zstd sıkıştırmalı ya da değil) dosyanın
+    başından anlaşılır."""
+    stream = chunks.__aiter__()
+    head = await _read_head(stream, 4)
+    stream = _prepend(head, stream)
+    if head.startswith(GZIP_MAGIC):
+        stream = _decompressed(stream, _GzipDecoder())
+    elif head.startswith(ZSTD_MAGIC):
+        stream = _decompressed(stream, _ZstdDecoder())
+
+    head = await _read_head(stream, 1, until=b"\n")
+    stream = _prepend(head, stream)
+    text_head = head.lstrip(codecs.BOM_UTF8).lstrip()
+    if not text_head:
+        raise BackupParseError("Yedek dosyası boş")
+    if text_head.startswith(b"{"):
+        if _is_jsonl_header(text_head.split(b"\n", 1)[0]):
+            parser = JsonLinesParser(record_sections)
+        else:
+            parser = BackupStreamParser(record_sections)
+    else:
+        parser = BsonStreamParser(record_sections)
+
+    async for event in _parse_stream(stream, parser):
+        yield event
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _dump_record(doc: dict) -> str:
+    return json.dumps(doc, ensure_ascii=False, default=_json_default, separators=(",", ":"))
+
+
+# ---- Manifest ve iz kayıtları ----
+
+async def new_manifest(db, kind: str = "full", parent_id: Optional[str] = None) -> dict:
+    """Yeni yedeğin manifestini hazırlar. Artımlı yedekte ana yedek verilmezse
+    en son alınan yedek kullanılır."""
+    now = datetime.now(timezone.utc)
+    manifest = {
+        "backup_id": uuid.uuid4().hex,
+        "kind": kind,
+        "parent_id": None,
+        "since": None,
+        "watermark": now,
+    }
+    if kind == "full":
+        return manifest
+    if kind != "incremental":
+        raise BackupChainError(f"Bilinmeyen yedek türü: {kind}")
+
+    if parent_id:
+        parent = await db[MANIFEST_COLLECTION].find_one({"_id": parent_id})
+    else:
+        parent = await db[MANIFEST_COLLECTION].find_one({}, sort=[("watermark", -1)])
+    if parent is None:
+        raise BackupChainError("Artımlı yedek için önce tam yedek alınmalı")
+    since = parent["watermark"] - WATERMARK_SKEW
+    if since < now - TOMBSTONE_TTL:
+        raise BackupChainError("Ana yedek çok eski, silinen kayıt izleri artık yok; tam yedek alın")
+    manifest.update(parent_id=parent["_id"], since=since)
+    return manifest
+
+
+async def save_manifest(db, manifest: dict):
+    """Yedek tamamen üretildikten sonra kaydedilir; yarım kalan yedek zincire girmez"""
+    await db[MANIFEST_COLLECTION].insert_one(
+        {**manifest, "_id": manifest["backup_id"], "created_at": datetime.now(timezone.utc)}
+    )
+
+
+async def record_tombstones(db, collection_name: str, docs: List[dict]):
+    """Silinen kayıtlar için artımlı yedeklere girecek iz kayıtları yazar"""
+    if not docs:
+        return
+    now = datetime.now(timezone.utc)
+    try:
+        await db[TOMBSTONE_COLLECTION].insert_many(
+            [{"collection": collection_name, "id": doc["id"], "deleted_at": now} for doc in docs],
+            ordered=False
+        )
+    except Exception as e:
+        logger.error(f"Silinen kayıt izi yazılamadı ({collection_name}): {str(e)}")
+
+
+# ---- Yazma ----
+
+def _backup_header(backup_format: str, manifest: Optional[dict]) -> dict:
+    header = {"timestamp": datetime.now().isoformat(), "version": BACKUP_VERSION}
+    if backup_format != "json":
+        header["format"] = backup_format
+    if manifest is not None:
+        header["manifest"] = manifest
+    return header
+
+
+async def _iter_batches(cursor, batch_size: int):
+    batch = []
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    yield batch
+
+
+async def _iter_section_batches(db, batch_size: int, since: Optional[datetime] = None):
+    """(bölüm adı, belgeler) batch'leri; boş koleksiyon için de bir (boş) batch döner.
+    `since` verilirse (artımlı yedek) önce iz kayıtları, sonra değişen kayıtlar gelir."""
+    if since is not None:
+        cursor = db[TOMBSTONE_COLLECTION].find({"deleted_at": {"$gte": since}}, {"_id": 0}).batch_size(batch_size)
+        async for batch in _iter_batches(cursor, batch_size):
+            yield DELETED_SECTION, batch
+    query = {} if since is None else {"updated_at": {"$gte": since}}
+    for section, collection_name in BACKUP_SECTIONS:
+        cursor = db[collection_name].find(query, BACKUP_PROJECTION).batch_size(batch_size)
+        async for batch in _iter_batches(cursor, batch_size):
+            yield section, batch
+
+
+def _since(manifest: Optional[dict]) -> Optional[datetime]:
+    return manifest.get("since") if manifest else None
+
+
+async def iter_backup_json(db, batch_size: int = BACKUP_BATCH_SIZE,
+                           manifest: Optional[dict] = None) -> AsyncIterator[bytes]:
+    """Yedek JSON'unu parça parça üretir; her parça en fazla bir batch belge içerir.
+    Her kayıt tek satırdır, böylece dosya hem geçerli JSON hem okunabilir kalır."""
+    header = _backup_header("json", manifest)
+    yield ("{\n" + "".join(
+        f"{json.dumps(key)}: {_dump_record(value)},\n" for key, value in header.items()
+    )).encode("utf-8")
+
+    current = None
+    separator = "\n"
+    async for section, docs in _iter_section_batches(db, batch_size, _since(manifest)):
+        parts = []
+        if section != current:
+            if current is not None:
+                parts.append("\n],\n")
+            parts.append(f"{json.dumps(section)}: [")
+            current = section
+            separator = "\n"
+        for doc in docs:
+            parts.append(separator + _dump_record(doc))
+            separator = ",\n"
+        yield "".join(parts).encode("utf-8")
+    yield "\n]\n}\n".encode("utf-8")
+
+
+async def iter_backup_jsonl(db, batch_size: int = BACKUP_BATCH_SIZE,
+                            manifest: Optional[dict] = None) -> AsyncIterator[bytes]:
+    """Başlık satırı, {"section": ad} satırları ve her satırda bir kayıt"""
+    yield (_dump_record(_backup_header("jsonl", manifest)) + "\n").encode("utf-8")
+    current = None
+    async for section, docs in _iter_section_batches(db, batch_size, _since(manifest)):
+        lines = []
+        if section != current:
+            lines.append(_dump_record({"section": section}))
+            current = section
+        lines.extend(_dump_record(doc) for doc in docs)
+        if lines:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+async def iter_backup_bson(db, batch_size: int = BACKUP_BATCH_SIZE,
+                           manifest: Optional[dict] = None) -> AsyncIterator[bytes]:
+    """jsonl ile aynı düzende art arda BSON belgeleri; tarihler doğal BSON date olarak kalır"""
+    yield bson.encode(_backup_header("bson", manifest))
+    current = None
+    async for section, docs in _iter_section_batches(db, batch_size, _since(manifest)):
+        parts = []
+        if section != current:
+            parts.append(bson.encode({"section": section}))
+            current = section
+        parts.extend(bson.encode(doc) for doc in docs)
+        if parts:
+            yield b"".join(parts)
+
+
+async def _compressed(chunks: AsyncIterator[bytes], compressor) -> AsyncIterator[bytes]:
+    # Sıkıştırma thread'de yapılır (zlib ve zstd GIL'i bırakır)
+    async for chunk in chunks:
+        data = await asyncio.to_thread(compressor.compress, chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+async def _then_save_manifest(chunks: AsyncIterator[bytes], db, manifest: dict) -> AsyncIterator[bytes]:
+    async for chunk in chunks:
+        yield chunk
+    await save_manifest(db, manifest)
+
+
+def iter_backup(db, backup_format: str = DEFAULT_BACKUP_FORMAT, batch_size: int = BACKUP_BATCH_SIZE,
+                manifest: Optional[dict] = None) -> AsyncIterator[bytes]:
+    """İstenen biçimde yedek parçaları üretir (bkz. BACKUP_FORMATS).
+    Manifest verilirse yedek tamamlandığında kaydedilir."""
+    if backup_format == "json":
+        chunks = iter_backup_json(db, batch_size, manifest)
+    elif backup_format == "jsonl.gz":
+        chunks = _compressed(iter_backup_jsonl(db, batch_size, manifest), zlib.compressobj(6, zlib.DEFLATED, 31))
+    elif backup_format == "jsonl.zst":
+        chunks = _compressed(iter_backup_jsonl(db, batch_size, manifest),
+                             zstandard.ZstdCompressor(level=3).compressobj())
+    elif backup_format == "bson":
+        chunks = iter_backup_bson(db, batch_size, manifest)
+    else:
+        raise ValueError(f"Bilinmeyen yedek biçimi: {backup_format}")
+    if manifest is not None:
+        chunks = _then_save_manifest(chunks, db, manifest)
+    return chunks
+
+
+async def write_backup_file(db, path: str, backup_format: str = DEFAULT_BACKUP_FORMAT,
+                            batch_size: int = BACKUP_BATCH_SIZE, manifest: Optional[dict] = None) -> int:
+    """Yedeği dosyaya yazar; disk işlemleri event loop dışında (thread) yapılır.
+    Dosya önce geçici adla yazılır, tamamlanınca yerine taşınır. Yazılan byte sayısını döner."""
+    chunks = iter_backup(db, backup_format, batch_size, manifest)
+    partial_path = f"{path}.part"
+    handle = await asyncio.to_thread(open, partial_path, "wb")
+    written = 0
+    try:
+        async for chunk in chunks:
+            await asyncio.to_thread(handle.write, chunk)
+            written += len(chunk)
+    except BaseException:
+        await asyncio.to_thread(handle.close)
+        await asyncio.to_thread(os.remove, partial_path)
+        raise
+    await asyncio.to_thread(handle.close)
+    await asyncio.to_thread(os.replace, partial_path, path)
+    return written
+
+
+def _count_write_errors(write_errors: List[dict], key_fields) -> Tuple[set, int, int]:
+    """Toplu yazma hatalarını ayırır: sadece doğal anahtar çakışması "kayıt zaten var"
+    sayılır; başka bir kayıtla id çakışması gibi diğer hatalar loglanıp hatalı sayılır.
+    (hatalı konumlar, atlanan sayısı, hatalı sayısı) döner."""
+    positions = set()
+    skipped = failed = 0
+    for write_error in write_errors:
+        positions.add(write_error["index"])
+        key_pattern = write_error.get("keyPattern") or write_error.get("keyValue") or {}
+        if write_error.get("code") == 11000 and set(key_pattern) == set(key_fields):
+            skipped += 1
+        else:
+            failed += 1
+            logger.warning(f"Geri yükleme yazma hatası: {write_error.get('errmsg')}")
+    return positions, skipped, failed
+
+
+async def upsert_new(collection, docs: List[dict], key_fields) -> Tuple[List[dict], int, int]:
+    """Doğal anahtarı mevcut olmayan belgeleri ekler, olanlara dokunmaz.
+    (eklenen belgeler, atlanan sayısı, hatalı sayısı) döner."""
+    if not docs:
+        return [], 0, 0
+    operations = [
+        UpdateOne({field: doc.get(field) for field in key_fields}, {"$setOnInsert": doc}, upsert=True)
+        for doc in docs
+    ]
+    failed = 0
+    try:
+        result = await collection.bulk_write(operations, ordered=False)
+        upserted: Dict[int, object] = result.upserted_ids or {}
+    except BulkWriteError as e:
+        upserted = {item["index"]: item["_id"] for item in e.details.get("upserted", [])}
+        # Eşzamanlı eklemede doğal anahtar çakışması: kayıt zaten var demektir
+        _, _, failed = _count_write_errors(e.details.get("writeErrors", []), key_fields)
+    inserted = [docs[index] for index in sorted(upserted)]
+    return inserted, len(docs) - len(inserted) - failed, failed
+
+
+async def upsert_latest(collection, docs: List[dict], key_fields) -> Tuple[List[Tuple[Optional[dict], dict]], int, int]:
+    """Artımlı geri yükleme: kayıtları id ile yazar (varsa en son hâliyle değiştirir).
+    (eski, yeni) değişiklik çiftleri, atlanan ve hatalı sayısı döner."""
+    if not docs:
+        return [], 0, 0
+    ids = [doc["id"] for doc in docs]
+    old_docs = {doc["id"]: doc async for doc in collection.find({"id": {"$in": ids}}, {"_id": 0})}
+    operations = [UpdateOne({"id": doc["id"]}, {"$set": doc}, upsert=True) for doc in docs]
+    failed_positions = set()
+    skipped = failed = 0
+    try:
+        await collection.bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        # Doğal anahtarı başka bir kayıtla çakışan kayıt: aynı kayıt zaten var
+        failed_positions, skipped, failed = _count_write_errors(e.details.get("writeErrors", []), key_fields)
+    changes = [
+        (old_docs.get(doc["id"]), {**old_docs.get(doc["id"], {}), **doc})
+        for position, doc in enumerate(docs) if position not in failed_positions
+    ]
+    return changes, skipped, failed
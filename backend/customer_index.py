@@ -0,0 +1,250 @@
+"""
+Müşteri adları için bellek içi index.
+
+Farklı müşteri adları (distinct musteri) başlangıçta tek bir aggregation ile
+yüklenir, yazma endpoint'leri tarafından artımlı olarak güncellenir. Trigram
+index sayesinde "Arkas Lojistk" / "ARKAS LOJ." gibi yazım farklarıyla da
+aday müşteriler milisaniyeler içinde bulunur. Sıralı önek dizisi (bisect) ise
+otomatik tamamlama önerilerini Mongo'ya gitmeden üretir; çok eşleşen kısa önekler
+için ağırlığa göre ilk sıralar önbellekte tutulur.
+"""
+import asyncio
+import heapq
+import logging
+import math
+from bisect import bisect_left, insort
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+from search import fold_text, tokenize
+
+logger = logging.getLogger(__name__)
+
+# Aday kabul eşiği ve varsayılan dönüş sayısı
+MIN_SIMILARITY = 0.3
+DEFAULT_CANDIDATES = 10
+
+# Otomatik tamamlama: bundan fazla eşleşen önekler için sıralama önbelleğe alınır
+# (en fazla SUGGEST_CACHE_SIZE ad). Yakın kullanım ağırlığı zamanla değiştiği için
+# önbellek SUGGEST_CACHE_SECONDS sonra, ilgili müşteri değişince ise hemen yenilenir.
+SUGGEST_SCAN_LIMIT = 200
+SUGGEST_CACHE_SIZE = 50
+SUGGEST_CACHE_SECONDS = 300
+RECENCY_HALF_LIFE_DAYS = 30
+
+# Diğer worker süreçlerinde yapılan yazmaların da yansıması için periyodik tam yenileme
+REFRESH_INTERVAL_SECONDS = 600
+
+
+def prefix_keys(name: str) -> List[str]:
+    """Adın her kelimesinden başlayan normalize anahtarlar ("arkas lojistik", "lojistik")"""
+    words = tokenize(name)
+    return [" ".join(words[i:]) for i in range(len(words))]
+
+
+def trigrams(text: str) -> Set[str]:
+    """Kelime bazlı trigramlar (pg_trgm gibi: her kelime '  ' ile başlar, ' ' ile biter)"""
+    grams = set()
+    for word in tokenize(text):
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+class CustomerStats:
+    __slots__ = ("name", "count", "last_used", "grams", "keys")
+
+    def __init__(self, name: str, count: int = 0, last_used: Optional[datetime] = None):
+        self.name = name
+        self.count = count
+        self.last_used = last_used
+        self.grams = trigrams(name)
+        self.keys = prefix_keys(name)
+
+    def weight(self, now: datetime) -> float:
+        """Kullanım sıklığı ve yakınlığına göre öneri ağırlığı"""
+        weight = math.log1p(max(self.count, 0))
+        if self.last_used is not None:
+            last_used = self.last_used if self.last_used.tzinfo else self.last_used.replace(tzinfo=timezone.utc)
+            days = max((now - last_used).total_seconds() / 86400, 0)
+            weight += 2 * 0.5 ** (days / RECENCY_HALF_LIFE_DAYS)
+        return weight
+
+
+class CustomerIndex:
+    """Distinct müşteri adları, kullanım sayıları ve trigram posting listeleri"""
+
+    def __init__(self):
+        self.customers: Dict[str, CustomerStats] = {}
+        self.postings: Dict[str, Set[str]] = {}
+        # (normalize anahtar, ad) çiftlerinin sıralı dizisi
+        self.prefixes: List[Tuple[str, str]] = []
+        # önek -> (hesaplandığı an, ağırlığa göre sıralı adlar)
+        self.ranked: Dict[str, Tuple[datetime, List[str]]] = {}
+        self.loaded = False
+
+    # ---- Yükleme ----
+
+    async def load(self, collection):
+        """Müşteri adlarını, kayıt sayılarını ve son kullanım tarihlerini yükler"""
+        customers: Dict[str, CustomerStats] = {}
+        pipeline = [
+            {"$group": {"_id": "$musteri", "count": {"$sum": 1}, "last_used": {"$max": "$tarih"}}}
+        ]
+        async for row in collection.aggregate(pipeline):
+            name = row["_id"]
+            if not isinstance(name, str) or not name.strip():
+                continue
+            last_used = row.get("last_used")
+            customers[name] = CustomerStats(name, row["count"], last_used if isinstance(last_used, datetime) else None)
+
+        postings: Dict[str, Set[str]] = {}
+        prefixes: List[Tuple[str, str]] = []
+        for name, stats in customers.items():
+            for gram in stats.grams:
+                postings.setdefault(gram, set()).add(name)
+            prefixes.extend((key, name) for key in stats.keys)
+        prefixes.sort()
+
+        self.customers = customers
+        self.postings = postings
+        self.prefixes = prefixes
+        self.ranked = {}
+        self.loaded = True
+        logger.info(f"Müşteri indexi yüklendi: {len(customers)} müşteri")
+
+    async def refresh_forever(self, collection, interval: int = REFRESH_INTERVAL_SECONDS):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.load(collection)
+            except Exception as e:
+                logger.error(f"Müşteri indexi yenilenemedi: {str(e)}")
+
+    # ---- Artımlı güncelleme ----
+
+    def add(self, name: Optional[str], used_at: Optional[datetime] = None):
+        if not isinstance(name, str) or not name.strip():
+            return
+        stats = self.customers.get(name)
+        if stats is None:
+            stats = CustomerStats(name)
+            self.customers[name] = stats
+            for gram in stats.grams:
+                self.postings.setdefault(gram, set()).add(name)
+            for key in stats.keys:
+                insort(self.prefixes, (key, name))
+        self._forget_ranked(stats)
+        stats.count += 1
+        if isinstance(used_at, datetime) and (stats.last_used is None or _later(used_at, stats.last_used)):
+            stats.last_used = used_at
+
+    def remove(self, name: Optional[str]):
+        stats = self.customers.get(name) if isinstance(name, str) else None
+        if stats is None:
+            return
+        self._forget_ranked(stats)
+        stats.count -= 1
+        if stats.count <= 0:
+            del self.customers[name]
+            for gram in stats.grams:
+                names = self.postings.get(gram)
+                if names is not None:
+                    names.discard(name)
+                    if not names:
+                        del self.postings[gram]
+            for key in stats.keys:
+                i = bisect_left(self.prefixes, (key, name))
+                if i < len(self.prefixes) and self.prefixes[i] == (key, name):
+                    del self.prefixes[i]
+
+    def _forget_ranked(self, stats: CustomerStats):
+        """Müşterinin eşleştiği öneklerin önbellekteki sıralamasını siler"""
+        if not self.ranked:
+            return
+        for key in stats.keys:
+            for end in range(1, len(key) + 1):
+                self.ranked.pop(key[:end], None)
+
+    def apply_change(self, old: Optional[dict], new: Optional[dict]):
+        """Nakliye ekleme/güncelleme/silme sonrası indexi günceller"""
+        if old:
+            self.remove(old.get("musteri"))
+        if new:
+            self.add(new.get("musteri"), new.get("tarih"))
+
+    # ---- Sorgular ----
+
+    def suggest(self, query: str, limit: int = DEFAULT_CANDIDATES) -> List[dict]:
+        """Önek ile başlayan müşteri adları; sık ve yakın zamanda kullanılanlar önce"""
+        prefix = " ".join(tokenize(query))
+        if not prefix:
+            return []
+        if query[-1:].isspace():
+            prefix += " "
+
+        start = bisect_left(self.prefixes, (prefix, ""))
+        end = bisect_left(self.prefixes, (prefix + "\U0010ffff", ""), start)
+        now = datetime.now(timezone.utc)
+        if end - start <= SUGGEST_SCAN_LIMIT:
+            names = self._rank(start, end, limit, now)
+        else:
+            cached = self.ranked.get(prefix)
+            if cached is None or (now - cached[0]).total_seconds() > SUGGEST_CACHE_SECONDS:
+                cached = (now, self._rank(start, end, max(limit, SUGGEST_CACHE_SIZE), now))
+                self.ranked[prefix] = cached
+            names = cached[1][:limit]
+        return [{"musteri": name, "kayit_sayisi": self.customers[name].count} for name in names]
+
+    def _rank(self, start: int, end: int, limit: int, now: datetime) -> List[str]:
+        """Önek aralığındaki adları sıralar"""
+        # ad -> eşleşme adın başında mı (kelime ortasındaki eşleşmelerden önce gelir)
+        matches: Dict[str, bool] = {}
+        for key, name in self.prefixes[start:end]:
+            matches[name] = matches.get(name, False) or key == self.customers[name].keys[0]
+        ranked = heapq.nlargest(
+            limit,
+            matches.items(),
+            key=lambda item: (item[1], self.customers[item[0]].weight(now))
+        )
+        return [name for name, _ in ranked]
+
+    def fuzzy(self, query: str, limit: int = DEFAULT_CANDIDATES, min_similarity: float = MIN_SIMILARITY) -> List[dict]:
+        """Yazım hatalarına toleranslı, benzerliğe göre sıralı aday müşteriler"""
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+
+        shared: Dict[str, int] = {}
+        for gram in query_grams:
+            for name in self.postings.get(gram, ()):
+                shared[name] = shared.get(name, 0) + 1
+
+        query_folded = fold_text(query).strip()
+        results = []
+        for name, common in shared.items():
+            stats = self.customers[name]
+            # Jaccard benzerliği ile sorgunun ne kadarının adda geçtiğinin ortalaması;
+            # kısaltılmış yazımlar ("ARKAS LOJ.") de yüksek puan alır
+            jaccard = common / (len(query_grams) + len(stats.grams) - common)
+            coverage = common / len(query_grams)
+            score = (jaccard + coverage) / 2
+            if fold_text(name).startswith(query_folded):
+                score = max(score, coverage)
+            if score >= min_similarity:
+                results.append((score, stats.count, name))
+
+        results.sort(key=lambda item: (item[0], item[1]), reverse=True)
+        return [
+            {"musteri": name, "benzerlik": round(score, 3), "kayit_sayisi": count}
+            for score, count, name in results[:limit]
+        ]
+
+
+def _later(a: datetime, b: datetime) -> bool:
+    try:
+        return a > b
+    except TypeError:
+        # naive/aware karışık karşılaştırma: UTC kabul et
+        return a.replace(tzinfo=None) > b.replace(tzinfo=None)
@@ -0,0 +1,173 @@
+import logging
+import time
+from typing import Dict, List, Optional
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+
+class IndexSpec:
+    """Bir koleksiyon için beklenen index tanımı"""
+
+    def __init__(self, collection: str, keys: list, name: str, **options):
+        self.collection = collection
+        self.keys = keys
+        self.name = name
+        self.options = options
+
+    def matches_key(self, info: dict) -> bool:
+        return [(field, direction) for field, direction in info.get("key", [])] == \
+            [(field, direction) for field, direction in self.keys]
+
+    def option_drift(self, info: dict) -> Dict[str, tuple]:
+        """Mevcut index ile tanım arasındaki seçenek farklarını döndürür"""
+        drift = {}
+        for option in ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression"):
+            expected = self.options.get(option)
+            actual = info.get(option)
+            if option in ("unique", "sparse"):
+                expected = bool(expected)
+                actual = bool(actual)
+            elif option == "partialFilterExpression" and actual is not None:
+                actual = dict(actual)
+            if expected != actual:
+                drift[option] = (expected, actual)
+        return drift
+
+    def describe(self) -> str:
+        return f"{self.collection}.{self.name}"
+
+
+# Sunucunun yaptığı sorgular için gereken indexler
+INDEX_SPECS: List[IndexSpec] = [
+    # Nakliye kayıtları: id ile tekil erişim, tarih ile sıralama/cursor sayfalama
+    IndexSpec("nakliye_kayitlari", [("id", ASCENDING)], "id_unique", unique=True),
+    IndexSpec("nakliye_kayitlari", [("tarih", DESCENDING), ("id", DESCENDING)], "tarih_id"),
+    # Arama: birebir irsaliye/sıra no ve normalize edilmiş tokenlar üzerinde önek araması
+    IndexSpec("nakliye_kayitlari", [("irsaliye_no", ASCENDING)], "irsaliye_no"),
+    IndexSpec("nakliye_kayitlari", [("sira_no", ASCENDING)], "sira_no"),
+    IndexSpec("nakliye_kayitlari", [("arama_tokenlari", ASCENDING)], "arama_tokenlari"),
+    # Bulanık müşteri araması adayları için $in sorgusu
+    IndexSpec("nakliye_kayitlari", [("musteri", ASCENDING), ("tarih", DESCENDING)], "musteri_tarih"),
+    # Doğal anahtar: geri yüklemede tekrar eden kayıtlar bu index ile ayıklanır (bkz. backup.py)
+    IndexSpec("nakliye_kayitlari", [("sira_no", ASCENDING), ("musteri", ASCENDING), ("irsaliye_no", ASCENDING)],
+              "sira_musteri_irsaliye_unique", unique=True),
+    # Artımlı yedek: son yedekten sonra değişen kayıtlar
+    IndexSpec("nakliye_kayitlari", [("updated_at", ASCENDING)], "updated_at"),
+    # Rapor önbelleği: dönemin kayıt sayısı ve son değişikliği index'ten (covered) okunur
+    IndexSpec("nakliye_kayitlari", [("tarih", ASCENDING), ("updated_at", ASCENDING)], "tarih_updated_at"),
+    # Toplu silme/güncelleme: işlemin işaretlediği kayıtlar (sadece işlem sürerken alan vardır)
+    IndexSpec("nakliye_kayitlari", [("_bulk_op.token", ASCENDING)], "bulk_op_token", sparse=True),
+
+    # Yatan tutar: id ile tekil erişim, yatan_tarih ile sıralama/cursor sayfalama
+    IndexSpec("yatan_tutar", [("id", ASCENDING)], "id_unique", unique=True),
+    IndexSpec("yatan_tutar", [("yatan_tarih", DESCENDING), ("id", DESCENDING)], "yatan_tarih_id"),
+    IndexSpec("yatan_tutar", [("tutar", ASCENDING), ("yatan_tarih", ASCENDING), ("baslangic_tarih", ASCENDING)],
+              "tutar_tarih_unique", unique=True),
+    IndexSpec("yatan_tutar", [("updated_at", ASCENDING)], "updated_at"),
+    IndexSpec("yatan_tutar", [("yatan_tarih", ASCENDING), ("updated_at", ASCENDING)], "yatan_tarih_updated_at"),
+    IndexSpec("yatan_tutar", [("_bulk_op.token", ASCENDING)], "bulk_op_token", sparse=True),
+
+    # Kullanıcılar: email/telefon ile giriş. Kayıtlarda boş alanlar null olarak
+    # saklandığı için sparse yerine sadece string değerleri kapsayan partial index
+    IndexSpec("users", [("email", ASCENDING)], "email_unique", unique=True,
+              partialFilterExpression={"email": {"$type": "string"}}),
+    IndexSpec("users", [("phone", ASCENDING)], "phone_unique", unique=True,
+              partialFilterExpression={"phone": {"$type": "string"}}),
+    IndexSpec("users", [("id", ASCENDING)], "id_unique", unique=True),
+
+    # Doğrulama kodları: kod kontrolü ve süresi dolanların otomatik silinmesi
+    IndexSpec("verification_codes", [("identifier", ASCENDING), ("code", ASCENDING), ("used", ASCENDING)],
+              "identifier_code_used"),
+    IndexSpec("verification_codes", [("expires_at", ASCENDING)], "expires_at_ttl", expireAfterSeconds=0),
+
+    # Aylık toplamlar: (yıl, ay) ile okunur
+    IndexSpec("monthly_rollups", [("year", ASCENDING), ("month", ASCENDING)], "year_month", unique=True),
+
+    # Artımlı yedek zinciri: son yedeğin bulunması ve silinen kayıt izlerinin süresi (bkz. backup.py)
+    IndexSpec("backup_manifests", [("watermark", DESCENDING)], "watermark"),
+    # Süre backup.TOMBSTONE_TTL ile aynı olmalı
+    IndexSpec("deleted_records", [("deleted_at", ASCENDING)], "deleted_at_ttl", expireAfterSeconds=365 * 24 * 3600),
+]
+
+
+async def ensure_indexes(db, specs: Optional[List[IndexSpec]] = None) -> dict:
+    """Tanımlı indexleri oluşturur, doğrular ve farkları loglar"""
+    specs = INDEX_SPECS if specs is None else specs
+    report = {"created": [], "existing": [], "drift": [], "failed": [], "unknown": []}
+
+    by_collection: Dict[str, List[IndexSpec]] = {}
+    for spec in specs:
+        by_collection.setdefault(spec.collection, []).append(spec)
+
+    total = len(specs)
+    done = 0
+    for collection_name, collection_specs in by_collection.items():
+        collection = db[collection_name]
+        try:
+            existing = await collection.index_information()
+        except PyMongoError as e:
+            logger.error(f"Index bilgisi alınamadı ({collection_name}): {str(e)}")
+            report["failed"].extend(spec.describe() for spec in collection_specs)
+            done += len(collection_specs)
+            continue
+
+        matched_names = {"_id_"}
+        for spec in collection_specs:
+            done += 1
+            current = next(
+                ((name, info) for name, info in existing.items() if spec.matches_key(info)),
+                None
+            )
+            if current is not None:
+                name, info = current
+                matched_names.add(name)
+                drift = spec.option_drift(info)
+                if drift or name != spec.name:
+                    logger.warning(
+                        f"Index farkı [{done}/{total}] {spec.describe()}: mevcut ad={name}, "
+                        f"farklı seçenekler={drift}"
+                    )
+                    report["drift"].append(spec.describe())
+                else:
+                    report["existing"].append(spec.describe())
+                continue
+
+            logger.info(f"Index oluşturuluyor [{done}/{total}] {spec.describe()} {spec.keys}")
+            started = time.monotonic()
+            try:
+                await collection.create_index(spec.keys, name=spec.name, **spec.options)
+            except PyMongoError as e:
+                logger.error(f"Index oluşturulamadı {spec.describe()}: {str(e)}")
+                report["failed"].append(spec.describe())
+                continue
+            matched_names.add(spec.name)
+            report["created"].append(spec.describe())
+            logger.info(f"Index hazır {spec.describe()} ({time.monotonic() - started:.2f}s)")
+
+        # Oluşturulan indexlerin gerçekten var olduğunu doğrula
+        created_here = [spec for spec in collection_specs if spec.describe() in report["created"]]
+        if created_here:
+            try:
+                verified = await collection.index_information()
+            except PyMongoError:
+                verified = {}
+            for spec in created_here:
+                if spec.name not in verified:
+                    logger.error(f"Index doğrulanamadı: {spec.describe()}")
+                    report["created"].remove(spec.describe())
+                    report["failed"].append(spec.describe())
+
+        for name in existing:
+            if name not in matched_names:
+                logger.warning(f"Tanımsız index bulundu: {collection_name}.{name}")
+                report["unknown"].append(f"{collection_name}.{name}")
+
+    logger.info(
+        f"Index kontrolü tamamlandı: {len(report['created'])} oluşturuldu, "
+        f"{len(report['existing'])} mevcut, {len(report['drift'])} farklı, "
+        f"{len(report['failed'])} hatalı"
+    )
+    return report
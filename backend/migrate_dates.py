@@ -0,0 +1,169 @@
+"""
+String olarak saklanmış tarih alanlarını BSON date'e çeviren migration.
+
+Kullanım:
+    python migrate_dates.py [--batch-size 500] [--collection nakliye_kayitlari] [--dry-run]
+
+Uygulama çalışırken güvenle çalıştırılabilir: her belge sadece alan hâlâ
+eski string değerini taşıyorsa güncellenir. İlerleme `migrations`
+koleksiyonuna yazılır; yarıda kalırsa aynı komut kaldığı yerden devam eder.
+
+Aylık toplamlar (rollups.py) sadece BSON date tarihli kayıtları sayar; dönüşüm
+bitince toplamlar ham veriden yeniden oluşturulur. Migration sırasında yazma
+yapılmışsa sonrasında `python rollups.py verify` ile kontrol edilebilir.
+"""
+import argparse
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+from rollups import rebuild_rollups
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("migrate_dates")
+
+# Koleksiyon -> (tam tarih-saat alanları, sadece gün olan alanlar)
+DATE_FIELDS = {
+    "nakliye_kayitlari": (["tarih", "created_at"], []),
+    "yatan_tutar": (["created_at"], ["yatan_tarih", "baslangic_tarih", "bitis_tarih"]),
+}
+
+LEGACY_DAY_FORMATS = ['%d.%m.%Y', '%d/%m/%Y', '%Y/%m/%d']
+
+
+def parse_legacy_date(value: str, day_only: bool = False) -> Optional[datetime]:
+    """Eski string tarih değerini UTC datetime'a çevirir, çözülemezse None"""
+    text = value.strip()
+    if not text:
+        return None
+    parsed = None
+    try:
+        parsed = datetime.fromisoformat(text.replace('Z', '+00:00'))
+    except ValueError:
+        for fmt in LEGACY_DAY_FORMATS:
+            try:
+                parsed = datetime.strptime(text, fmt)
+                break
+            except ValueError:
+                continue
+    if parsed is None:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    else:
+        parsed = parsed.astimezone(timezone.utc)
+    if day_only:
+        parsed = datetime(parsed.year, parsed.month, parsed.day, tzinfo=timezone.utc)
+    return parsed
+
+
+async def migrate_collection(db, collection_name: str, batch_size: int, dry_run: bool = False) -> dict:
+    """Bir koleksiyondaki string tarihleri batch'ler halinde dönüştürür"""
+    datetime_fields, day_fields = DATE_FIELDS[collection_name]
+    fields = datetime_fields + day_fields
+    collection = db[collection_name]
+    checkpoint_id = f"native_dates:{collection_name}"
+
+    checkpoint = await db.migrations.find_one({"_id": checkpoint_id}) or {}
+    last_id = checkpoint.get("last_id")
+    stats = {
+        "converted": checkpoint.get("converted", 0),
+        "failed": checkpoint.get("failed", 0),
+    }
+
+    pending_filter = {"$or": [{field: {"$type": "string"}} for field in fields]}
+    remaining = await collection.count_documents(pending_filter)
+    logger.info(f"{collection_name}: dönüştürülecek {remaining} belge (kaldığı yer: {last_id})")
+
+    while True:
+        query = dict(pending_filter)
+        if last_id is not None:
+            query = {"$and": [pending_filter, {"_id": {"$gt": last_id}}]}
+        batch = await collection.find(query, {field: 1 for field in fields}).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+
+        operations = []
+        for doc in batch:
+            guard = {"_id": doc["_id"]}
+            updates = {}
+            for field in fields:
+                value = doc.get(field)
+                if not isinstance(value, str):
+                    continue
+                parsed = parse_legacy_date(value, day_only=field in day_fields)
+                if parsed is None:
+                    logger.warning(f"{collection_name} {doc['_id']}: '{field}' çözülemedi: {value!r}")
+                    stats["failed"] += 1
+                    continue
+                guard[field] = value
+                updates[field] = parsed
+            if updates:
+                # Eski değer hâlâ yerindeyse güncelle; arada değişmişse dokunma
+                operations.append(UpdateOne(guard, {"$set": updates}))
+
+        if operations and not dry_run:
+            result = await collection.bulk_write(operations, ordered=False)
+            stats["converted"] += result.modified_count
+        elif operations:
+            stats["converted"] += len(operations)
+
+        last_id = batch[-1]["_id"]
+        if not dry_run:
+            await db.migrations.update_one(
+                {"_id": checkpoint_id},
+                {"$set": {"last_id": last_id, **stats, "updated_at": datetime.now(timezone.utc)}},
+                upsert=True
+            )
+        logger.info(f"{collection_name}: {stats['converted']} dönüştürüldü, {stats['failed']} hatalı")
+
+    if not dry_run:
+        await db.migrations.update_one(
+            {"_id": checkpoint_id},
+            {"$set": {"completed_at": datetime.now(timezone.utc), **stats}},
+            upsert=True
+        )
+    return stats
+
+
+async def main(args):
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    db = client[os.environ['DB_NAME']]
+    try:
+        collections = [args.collection] if args.collection else list(DATE_FIELDS)
+        converted = 0
+        for collection_name in collections:
+            if args.restart:
+                await db.migrations.delete_one({"_id": f"native_dates:{collection_name}"})
+            stats = await migrate_collection(db, collection_name, args.batch_size, args.dry_run)
+            logger.info(f"{collection_name} tamamlandı: {stats}")
+            converted += stats["converted"]
+        # Dönüştürülen kayıtlar aylık toplamlara ancak yeniden hesaplamayla girer
+        if converted and args.dry_run:
+            logger.info("Gerçek çalıştırmadan sonra aylık toplamlar yeniden oluşturulacak")
+        elif converted:
+            await rebuild_rollups(db)
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="String tarih alanlarını BSON date'e çevirir")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--collection", choices=list(DATE_FIELDS))
+    parser.add_argument("--dry-run", action="store_true", help="Sadece sayar, yazmaz")
+    parser.add_argument("--restart", action="store_true", help="Kayıtlı ilerlemeyi yok sayar")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,90 @@
+"""
+İndirme linkleri için sunucuda üretilen QR kod görselleri (PNG/SVG).
+
+QR matrisi `qrcode` ile hesaplanır; PNG Pillow ile, SVG tek bir path olarak
+çizilir. Üretilen görseller (url, boyut, biçim) anahtarıyla LRU önbellekte
+tutulur; aynı QR'ın tekrar istenmesi yeniden çizim gerektirmez.
+"""
+import os
+from functools import lru_cache
+from io import BytesIO
+from typing import List, Tuple
+
+import qrcode
+from PIL import Image
+
+QR_FORMATS = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+}
+DEFAULT_QR_SIZE = 300
+MIN_QR_SIZE = 64
+MAX_QR_SIZE = 1024
+# Kenar boşluğu (modül sayısı); frontend'deki eski ayarla aynı
+QR_BORDER = 2
+QR_CACHE_ENTRIES = int(os.environ.get("QR_CACHE_ENTRIES", 256))
+
+
+def _matrix(data: str) -> List[List[bool]]:
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, border=QR_BORDER)
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr.get_matrix()
+
+
+def _render_png(matrix: List[List[bool]], size: int) -> bytes:
+    modules = len(matrix)
+    image = Image.new("1", (modules, modules), 1)
+    image.putdata([0 if dark else 1 for row in matrix for dark in row])
+    # Modül başına tam piksel: keskin kenarlar için önce tam katına büyütülür
+    scale = max(size // modules, 1)
+    image = image.resize((modules * scale, modules * scale), Image.NEAREST)
+    if image.width != size:
+        canvas = Image.new("1", (size, size), 1)
+        offset = (size - image.width) // 2
+        canvas.paste(image, (offset, offset))
+        image = canvas if image.width < size else image.resize((size, size), Image.NEAREST)
+    buffer = BytesIO()
+    image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def _render_svg(matrix: List[List[bool]], size: int) -> bytes:
+    modules = len(matrix)
+    path = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < modules:
+            if not row[x]:
+                x += 1
+                continue
+            start = x
+            while x < modules and row[x]:
+                x += 1
+            path.append(f"M{start} {y}h{x - start}v1h-{x - start}z")
+    svg = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" '
+        f'viewBox="0 0 {modules} {modules}" shape-rendering="crispEdges">'
+        f'<rect width="100%" height="100%" fill="#FFFFFF"/>'
+        f'<path fill="#000000" d="{"".join(path)}"/></svg>'
+    )
+    return svg.encode("ascii")
+
+
+@lru_cache(maxsize=QR_CACHE_ENTRIES)
+def render_qr(data: str, size: int = DEFAULT_QR_SIZE, fmt: str = "png") -> bytes:
+    """QR görselini üretir; sonuç (data, size, fmt) anahtarıyla önbelleğe alınır"""
+    if fmt not in QR_FORMATS:
+        raise ValueError(f"Desteklenmeyen QR biçimi: {fmt}")
+    matrix = _matrix(data)
+    if fmt == "svg":
+        return _render_svg(matrix, size)
+    return _render_png(matrix, size)
+
+
+def split_qr_name(name: str) -> Tuple[str, str]:
+    """`{file_id}.png` biçimindeki adı (file_id, biçim) olarak ayırır"""
+    file_id, dot, fmt = name.rpartition(".")
+    if not dot or fmt.lower() not in QR_FORMATS:
+        raise ValueError(f"Desteklenmeyen QR biçimi: {name}")
+    return file_id, fmt.lower()
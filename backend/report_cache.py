@@ -0,0 +1,38 @@
+"""
+Üretilmiş raporlar için içerik adresli önbellek.
+
+Önbellek anahtarı; rapor parametreleri (tür, biçim, dönem), şablon sürümü ve dönem
+verisinin sürüm özetinden (kayıt sayısı + en son `updated_at`) türetilir.
+Aynı dönem için veri değişmediyse anahtar aynıdır ve artifact deposunda bu anahtara
+bağlı dosya yeniden çizilmeden döndürülür. Döneme yapılan her yazma (ekleme/güncelleme
+`updated_at`'i, silme kayıt sayısını değiştirir) özeti, dolayısıyla anahtarı
+değiştirir; eski dosya süresi dolunca veya LRU ile silinir.
+
+Dosyanın kendisi rastgele kimlikle yazılır, anahtar ona depoda bağlanır
+(`ArtifactStore.cached` / `commit(key=...)`). GridFS arka ucunda eşleme paylaşıldığından
+diğer sunucuların ürettiği raporlar da önbellekten gelir.
+"""
+import hashlib
+import json
+from typing import Any, Dict, List
+
+from reports import REPORT_VERSION
+
+
+async def period_fingerprint(collection, date_field: str, query: dict) -> Dict[str, Any]:
+    """Dönemin kayıt sayısı ve son değişiklik zamanı; (tarih, updated_at) index'inden okunur"""
+    rows = await collection.aggregate([
+        {"$match": query},
+        {"$project": {"_id": 0, date_field: 1, "updated_at": 1}},
+        {"$group": {"_id": None, "count": {"$sum": 1}, "last": {"$max": "$updated_at"}}},
+    ]).to_list(1)
+    if not rows:
+        return {"count": 0, "last": None}
+    return {"count": rows[0]["count"], "last": rows[0]["last"]}
+
+
+def cache_key(params: Dict[str, Any], fingerprints: List[Dict[str, Any]]) -> str:
+    payload = {"version": REPORT_VERSION, "params": params, "data": fingerprints}
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
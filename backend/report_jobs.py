@@ -0,0 +1,154 @@
+"""
+Arka planda çalışan rapor işleri.
+
+`POST /api/reports` işi kuyruğa ekleyip hemen kimliğini döndürür; istemci
+`GET /api/reports/{id}` ile durumu sorgular ve iş bitince indirme linkini alır.
+Aynı içerikle bekleyen ya da çalışan bir iş varsa yeni iş açılmaz, mevcut iş
+döndürülür. Biten işler bir süre (artifact süresi kadar) bellekte tutulur.
+
+Ayarlar:
+    REPORT_JOB_WORKERS       aynı anda çalışan iş sayısı
+    REPORT_JOB_QUEUE_DEPTH   kuyrukta bekleyebilecek iş sayısı
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOB_WORKERS = 2
+DEFAULT_JOB_QUEUE_DEPTH = 32
+DEFAULT_JOB_RETENTION_SECONDS = 3600
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Durum bazlı ilerleme (çizim alt süreçte olduğundan sayfa bazlı ilerleme yok)
+PROGRESS = {QUEUED: 0, RUNNING: 50, DONE: 100, FAILED: 100}
+
+
+class ReportQueueFull(RuntimeError):
+    """Kuyrukta yer yok"""
+
+
+def job_key(params: Dict[str, Any]) -> str:
+    """İstek içeriğinin özeti; aynı özetli bekleyen işler birleştirilir"""
+    canonical = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ReportJob:
+    __slots__ = ("id", "key", "params", "status", "created_at", "started_at", "finished_at", "result", "error")
+
+    def __init__(self, key: str, params: Dict[str, Any]):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.params = params
+        self.status = QUEUED
+        self.created_at = datetime.now(timezone.utc)
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+
+    @property
+    def pending(self) -> bool:
+        return self.status in (QUEUED, RUNNING)
+
+    @property
+    def progress(self) -> int:
+        return PROGRESS[self.status]
+
+
+class ReportJobQueue:
+    def __init__(self, runner: Callable[[Dict[str, Any]], Awaitable[Any]], workers: int = DEFAULT_JOB_WORKERS,
+                 queue_depth: int = DEFAULT_JOB_QUEUE_DEPTH, retention_seconds: int = DEFAULT_JOB_RETENTION_SECONDS):
+        # runner: iş parametrelerini alıp sonucu (ör. artifact bilgisi) döndüren coroutine
+        self.runner = runner
+        self.workers = max(workers, 1)
+        self.queue: "asyncio.Queue[ReportJob]" = asyncio.Queue(maxsize=max(queue_depth, 1))
+        self.retention = timedelta(seconds=retention_seconds)
+        self.jobs: Dict[str, ReportJob] = {}
+        # İçerik özeti -> bekleyen/çalışan iş
+        self.pending: Dict[str, ReportJob] = {}
+        self.tasks = []
+
+    def start(self):
+        self.tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        self.tasks = []
+
+    def submit(self, params: Dict[str, Any]) -> ReportJob:
+        """İşi kuyruğa ekler; aynı içerikli bekleyen iş varsa onu döndürür"""
+        self._prune()
+        key = job_key(params)
+        existing = self.pending.get(key)
+        if existing is not None:
+            return existing
+        job = ReportJob(key, params)
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise ReportQueueFull("Rapor kuyruğu dolu, lütfen biraz sonra tekrar deneyin")
+        self.jobs[job.id] = job
+        self.pending[key] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[ReportJob]:
+        self._prune()
+        return self.jobs.get(job_id)
+
+    def position(self, job: ReportJob) -> int:
+        """Kuyruktaki sırası (0: sıradaki)"""
+        if job.status != QUEUED:
+            return 0
+        queued = [queued_job for queued_job in self.jobs.values() if queued_job.status == QUEUED]
+        return sum(1 for queued_job in queued if queued_job.created_at < job.created_at)
+
+    async def _work(self):
+        while True:
+            job = await self.queue.get()
+            job.status = RUNNING
+            job.started_at = datetime.now(timezone.utc)
+            try:
+                job.result = await self.runner(job.params)
+                job.status = DONE
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                job.status = FAILED
+                job.error = getattr(e, "detail", None) or str(e)
+                logger.error(f"Rapor işi başarısız {job.id}: {job.error}")
+            finally:
+                job.finished_at = datetime.now(timezone.utc)
+                if self.pending.get(job.key) is job:
+                    del self.pending[job.key]
+                self.queue.task_done()
+
+    def _prune(self):
+        cutoff = datetime.now(timezone.utc) - self.retention
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if not job.pending and job.finished_at and job.finished_at < cutoff]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+
+def queue_from_env(runner: Callable[[Dict[str, Any]], Awaitable[Any]],
+                   retention_seconds: int = DEFAULT_JOB_RETENTION_SECONDS) -> ReportJobQueue:
+    """REPORT_JOB_* ortam değişkenlerinden kuyruk oluşturur"""
+    return ReportJobQueue(
+        runner,
+        workers=int(os.environ.get("REPORT_JOB_WORKERS", DEFAULT_JOB_WORKERS)),
+        queue_depth=int(os.environ.get("REPORT_JOB_QUEUE_DEPTH", DEFAULT_JOB_QUEUE_DEPTH)),
+        retention_seconds=retention_seconds,
+    )
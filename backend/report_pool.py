@@ -0,0 +1,128 @@
+"""
+Raporları (PDF/CSV/XLSX) event loop dışında, ayrı süreçlerde üreten havuz.
+
+ReportLab işi CPU'ya bağlıdır; doğrudan handler içinde çalışınca aynı
+worker'daki tüm istekler (girişler dahil) rapor bitene kadar bekler. Havuzdaki
+süreçler başlangıçta ısıtılır (font, stil ve logo yüklü) ve raporlar çekirdeklere
+dağılır.
+
+Ayarlar:
+    REPORT_WORKERS           süreç sayısı
+    REPORT_QUEUE_DEPTH       çalışanlar doluyken bekleyebilecek rapor sayısı
+    REPORT_TIMEOUT_SECONDS   tek raporun en uzun süresi
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional
+
+import reports
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = min(2, os.cpu_count() or 1)
+DEFAULT_QUEUE_DEPTH = 8
+DEFAULT_TIMEOUT_SECONDS = 120
+
+
+class ReportPoolBusy(RuntimeError):
+    """Çalışan ve bekleyen rapor sayısı sınırda"""
+
+
+class ReportTimeout(TimeoutError):
+    """Rapor süre sınırında bitmedi"""
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _remove_output(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class ReportPool:
+    def __init__(self, workers: int = DEFAULT_WORKERS, queue_depth: int = DEFAULT_QUEUE_DEPTH,
+                 timeout: float = DEFAULT_TIMEOUT_SECONDS):
+        self.workers = max(workers, 1)
+        self.queue_depth = max(queue_depth, 0)
+        self.timeout = timeout
+        self.executor: Optional[ProcessPoolExecutor] = None
+        # Havuzda çalışan + bekleyen rapor sayısı
+        self.in_flight = 0
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # spawn: event loop ve Mongo istemcisi thread'leri alt sürece kopyalanmaz
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=reports.warm_up
+        )
+
+    async def start(self):
+        self.executor = self._new_executor()
+        # Süreçler ilk istekte değil şimdi başlatılır
+        loop = asyncio.get_running_loop()
+        pids = await asyncio.gather(*(loop.run_in_executor(self.executor, _ping) for _ in range(self.workers)))
+        logger.info(
+            f"Rapor havuzu hazır: {len(set(pids))} süreç, kuyruk {self.queue_depth}, süre sınırı {self.timeout}s"
+        )
+
+    async def stop(self):
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    async def render(self, path: str, period: str, data: List[dict], yatan_data: Optional[List[dict]] = None,
+                     kind: str = "detailed", fmt: str = "pdf"):
+        """Raporu bir alt süreçte `path` yoluna yazar"""
+        if self.executor is None:
+            raise RuntimeError("Rapor havuzu başlatılmadı")
+        if self.in_flight >= self.workers + self.queue_depth:
+            raise ReportPoolBusy("Rapor kuyruğu dolu, lütfen biraz sonra tekrar deneyin")
+
+        loop = asyncio.get_running_loop()
+        executor = self.executor
+        self.in_flight += 1
+        future = executor.submit(reports.render_report, path, period, data, yatan_data, kind, fmt)
+        # Callback havuzun yönetim thread'inde çalışır; sayaç event loop'ta güncellenir
+        future.add_done_callback(lambda _: self._release_from_thread(loop))
+        try:
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.timeout)
+        except asyncio.TimeoutError:
+            # Başlamamışsa iptal edilir; çalışıyorsa süreç işi bitirir ve çıktı silinir
+            if not future.cancel():
+                future.add_done_callback(lambda _: _remove_output(path))
+            raise ReportTimeout(f"Rapor {self.timeout} saniyede oluşturulamadı")
+        except BrokenProcessPool:
+            # Bir süreç çöktü (ör. bellek); havuz yenilenir
+            if self.executor is executor:
+                logger.error("Rapor havuzu bozuldu, yeniden başlatılıyor")
+                self.executor = self._new_executor()
+                executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    def _release(self):
+        self.in_flight -= 1
+
+    def _release_from_thread(self, loop: asyncio.AbstractEventLoop):
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            # Kapanışta event loop rapordan önce kapanmış olabilir
+            pass
+
+
+def pool_from_env() -> ReportPool:
+    """REPORT_* ortam değişkenlerinden havuz oluşturur"""
+    return ReportPool(
+        workers=int(os.environ.get("REPORT_WORKERS", DEFAULT_WORKERS)),
+        queue_depth=int(os.environ.get("REPORT_QUEUE_DEPTH", DEFAULT_QUEUE_DEPTH)),
+        timeout=float(os.environ.get("REPORT_TIMEOUT_SECONDS", DEFAULT_TIMEOUT_SECONDS)),
+    )
@@ -0,0 +1,432 @@
+"""
+PDF rapor üretimi (ReportLab).
+
+Fontlar, paragraf/tablo stilleri ve logo süreç başına bir kez hazırlanır;
+her rapor sadece satırları üretip belgeyi oluşturur. DejaVu fontları TTF
+olarak kaydedilir ve PDF'e yalnızca kullanılan glifler (subset) gömülür.
+
+Rapor türleri:
+    detailed   tüm nakliye sütunları + yatan tutar tablosu (indirme)
+    summary    özet nakliye sütunları (QR ile paylaşım)
+
+Biçimler: pdf, csv ve xlsx; satırlar `report_data` ile bir kez hazırlanır.
+
+Büyük raporlar (REPORT_LARGE_ROWS satırdan fazla) sabit sütun genişlikli,
+sayfa boyu parçalara bölünmüş `LongTable`'larla çizilir: her sayfa kendi
+başlığını ve sayfa toplamını taşır, hücreler ölçülmez ve parçalar belge
+oluşturulurken sırayla üretilir; bellekte tüm satırların tablosu tutulmaz.
+"""
+import csv
+import logging
+import os
+from functools import lru_cache
+from io import BytesIO
+from pathlib import Path
+from types import SimpleNamespace
+from typing import List, Optional, Sequence, Tuple
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from PIL import Image as PILImage
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import (
+    Flowable, Image, LongTable, PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+)
+
+from report_data import DATE, DETAILED_MONEY_FIELDS, MONEY, ReportTable, money, nakliye_table, yatan_table
+
+logger = logging.getLogger(__name__)
+
+FONT_PATH = os.environ.get("REPORT_FONT", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf")
+FONT_BOLD_PATH = os.environ.get("REPORT_FONT_BOLD", "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf")
+LOGO_PATH = os.environ.get(
+    "REPORT_LOGO",
+    str(Path(__file__).resolve().parent.parent / "frontend" / "public" / "arkas-logo.jpg")
+)
+# Başlıktaki logo boyutu; görsel baskı kalitesi için 300 dpi'a küçültülür
+LOGO_SIZE = 0.8 * inch
+LOGO_DPI = 300
+
+REPORT_KINDS = ("detailed", "summary")
+# Biçim -> (içerik türü, dosya uzantısı)
+REPORT_FORMATS = {
+    "pdf": ("application/pdf", ".pdf"),
+    "csv": ("text/csv; charset=utf-8", ".csv"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", ".xlsx"),
+}
+# Rapor düzeni değiştiğinde artırılır; önbellekteki eski raporlar kullanılmaz
+REPORT_VERSION = 2
+# Bu sayının üzerindeki raporlar sayfa parçalı (büyük rapor) düzeninde çizilir
+LARGE_REPORT_ROWS = int(os.environ.get("REPORT_LARGE_ROWS", 1000))
+
+DETAILED_HEADER = ['Sıra No', 'Kod', 'Müşteri', 'İrsaliye No', 'Tarih', 'Tür', 'Boş Taşıma', 'Reefer', 'Bekleme',
+                   'Geceleme', 'Pazar', 'Harcirah', 'Toplam', 'Sistem']
+SUMMARY_HEADER = ['Sıra No', 'Müşteri', 'İrsaliye No', 'Tarih', 'Toplam (₺)', 'Sistem (₺)']
+YATAN_HEADER = ['Yatan Tarih', 'Çalışma Başlangıç', 'Çalışma Bitiş', 'Yatan Tutar', 'Açıklama']
+
+# Veritabanından sadece raporda basılan alanlar okunur
+NAKLIYE_PROJECTIONS = {
+    "detailed": ['sira_no', 'kod', 'musteri', 'irsaliye_no', 'tarih', 'ithalat', 'ihracat', 'bos',
+                 *DETAILED_MONEY_FIELDS, 'toplam', 'sistem'],
+    "summary": ['sira_no', 'musteri', 'irsaliye_no', 'tarih', 'toplam', 'sistem'],
+}
+YATAN_PROJECTION = {field: 1 for field in ['yatan_tarih', 'baslangic_tarih', 'bitis_tarih', 'tutar', 'aciklama']}
+YATAN_PROJECTION["_id"] = 0
+
+# Tablo yazı boyutları (başlık, gövde)
+FONT_SIZES = {"detailed": (8, 7), "summary": (10, 9), "yatan": (10, 9)}
+# Büyük rapor düzeninde sütunların göreli genişlikleri; toplamı sayfa genişliğine ölçeklenir
+COLUMN_WEIGHTS = {
+    "detailed": [4, 5, 14, 7, 6, 8, 6, 5, 5, 5, 5, 5, 7, 7],
+    "summary": [6, 30, 12, 10, 12, 12],
+    "yatan": [10, 12, 12, 10, 30],
+}
+# Sabit genişlikte taşmaması için kısaltılan metin sütunları
+TEXT_COLUMNS = {"detailed": (1, 2, 5), "summary": (1,), "yatan": (4,)}
+
+MONTH_NAMES = ["Ocak", "Şubat", "Mart", "Nisan", "Mayıs", "Haziran",
+               "Temmuz", "Ağustos", "Eylül", "Ekim", "Kasım", "Aralık"]
+
+
+def nakliye_projection(kind: str) -> dict:
+    return {"_id": 0, **{field: 1 for field in NAKLIYE_PROJECTIONS[kind]}}
+
+
+def period_label(year: Optional[int] = None, month: Optional[int] = None,
+                 date_from: Optional[str] = None, date_to: Optional[str] = None) -> str:
+    """Dosya adı ve başlık için dönem etiketi (ör. Ocak_2025, 2025_Yillik)"""
+    if year is not None and month is not None:
+        label = f"{MONTH_NAMES[month - 1]}_{year}"
+    elif year is not None:
+        label = f"{year}_Yillik"
+    else:
+        label = ""
+    if date_from or date_to:
+        label = "_".join(part for part in (label, date_from or "", date_to or "") if part)
+    return label or "Tum_Kayitlar"
+
+
+@lru_cache(maxsize=None)
+def fonts() -> Tuple[str, str]:
+    """Türkçe karakterler için DejaVu fontlarını bir kez kaydeder; yoksa Helvetica"""
+    try:
+        pdfmetrics.registerFont(TTFont('DejaVuSans', FONT_PATH))
+        pdfmetrics.registerFont(TTFont('DejaVuSans-Bold', FONT_BOLD_PATH))
+        return 'DejaVuSans', 'DejaVuSans-Bold'
+    except Exception as e:
+        logger.warning(f"DejaVu fontları yüklenemedi, Helvetica kullanılacak: {str(e)}")
+        return 'Helvetica', 'Helvetica-Bold'
+
+
+@lru_cache(maxsize=None)
+def logo() -> Optional[bytes]:
+    """Logoyu bir kez çözüp başlık boyutuna küçültür ve JPEG olarak saklar.
+    ReportLab JPEG verisini çözmeden PDF'e gömer."""
+    try:
+        with PILImage.open(LOGO_PATH) as image:
+            pixels = int(LOGO_SIZE / inch * LOGO_DPI)
+            image = image.convert("RGB")
+            image.thumbnail((pixels, pixels), PILImage.LANCZOS)
+            buffer = BytesIO()
+            image.save(buffer, format="JPEG", quality=85, optimize=True)
+            return buffer.getvalue()
+    except Exception as e:
+        logger.warning(f"Rapor logosu yüklenemedi: {str(e)}")
+        return None
+
+
+def _table_style(font: str, font_bold: str, header_background, body_background,
+                 header_size: int, body_size: int) -> TableStyle:
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), header_background),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), font_bold),
+        ('FONTNAME', (0, 1), (-1, -2), font),
+        ('FONTSIZE', (0, 0), (-1, 0), header_size),
+        ('FONTSIZE', (0, 1), (-1, -1), body_size),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -2), body_background),
+        ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
+        ('FONTNAME', (0, -1), (-1, -1), font_bold),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ])
+
+
+@lru_cache(maxsize=None)
+def templates() -> SimpleNamespace:
+    """Paragraf ve tablo stilleri (süreç başına bir kez oluşturulur).
+    TableStyle komutları tabloya uygulanırken çözülür; aynı nesne tüm raporlarda kullanılabilir."""
+    font, font_bold = fonts()
+    styles = getSampleStyleSheet()
+    return SimpleNamespace(
+        title=ParagraphStyle(
+            'TitleStyle',
+            parent=styles['Heading1'],
+            fontSize=16,
+            alignment=1,  # Center
+            spaceAfter=20,
+            fontName=font_bold
+        ),
+        section=ParagraphStyle('YatanTitleStyle', parent=styles['Heading2'], fontName=font_bold),
+        header=TableStyle([
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 0),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+        ]),
+        detailed=_table_style(font, font_bold, colors.lightblue, colors.beige, *FONT_SIZES["detailed"]),
+        summary=_table_style(font, font_bold, colors.lightblue, colors.beige, *FONT_SIZES["summary"]),
+        yatan=_table_style(font, font_bold, colors.lightcoral, colors.white, *FONT_SIZES["yatan"]),
+        # Büyük rapor: son parçada sayfa toplamının altına genel toplam eklenir
+        grand_total=TableStyle([
+            ('BACKGROUND', (0, -2), (-1, -2), colors.lightgrey),
+            ('FONTNAME', (0, -2), (-1, -2), font_bold),
+        ]),
+    )
+
+
+def warm_up():
+    """Font, stil ve logoyu önceden yükler (başlangıçta çağrılır)"""
+    fonts()
+    templates()
+    logo()
+
+
+def nakliye_header(kind: str) -> list:
+    return list(DETAILED_HEADER if kind == "detailed" else SUMMARY_HEADER)
+
+
+def total_row(kind: str, label: str, *amounts: float) -> list:
+    """Toplam satırı; etiket tutar sütunlarının hemen solunda"""
+    width = len(YATAN_HEADER if kind == "yatan" else nakliye_header(kind))
+    if kind == "yatan":
+        return [''] * 2 + [label, *(money(amount) for amount in amounts), '']
+    return [''] * (width - 1 - len(amounts)) + [label, *(money(amount) for amount in amounts)]
+
+
+def nakliye_rows(table: ReportTable, kind: str) -> List[list]:
+    """Başlık, kayıt satırları ve toplam satırından oluşan nakliye tablosu"""
+    return [nakliye_header(kind), *table.rows(),
+            total_row(kind, 'TOPLAM:', table.total('toplam'), table.total('sistem'))]
+
+
+def yatan_rows(table: ReportTable) -> List[list]:
+    return [list(YATAN_HEADER), *table.rows(), total_row("yatan", 'TOPLAM:', table.total('tutar'))]
+
+
+def _header(period: str, width: float) -> list:
+    style = templates()
+    title = Paragraph(f"ARKAS LOJİSTİK - {period} RAPORU", style.title)
+    logo_data = logo()
+    if logo_data is None:
+        return [title, Spacer(1, 20)]
+    image = Image(BytesIO(logo_data), width=LOGO_SIZE, height=LOGO_SIZE)
+    # Boş üçüncü sütun başlığın sayfa ortasında kalmasını sağlar
+    header = Table([[image, title, '']], colWidths=[LOGO_SIZE, width - 2 * LOGO_SIZE, LOGO_SIZE])
+    header.setStyle(style.header)
+    return [header, Spacer(1, 20)]
+
+
+def column_widths(kind: str, width: float) -> List[float]:
+    weights = COLUMN_WEIGHTS[kind]
+    return [width * weight / sum(weights) for weight in weights]
+
+
+def row_heights(kind: str) -> Tuple[float, float]:
+    """Sabit (başlık, gövde) satır yükseklikleri; yazı boyu + tablo stilindeki boşluklar"""
+    header_size, body_size = FONT_SIZES[kind]
+    return header_size * 1.2 + 3 + 12, body_size * 1.2 + 3 + 3
+
+
+def _fit(row: list, kind: str, widths: Sequence[float]) -> list:
+    """Uzun metinleri sütun genişliğine göre kısaltır (ölçüm yerine ortalama karakter genişliği)"""
+    body_size = FONT_SIZES[kind][1]
+    for column in TEXT_COLUMNS[kind]:
+        text = str(row[column])
+        limit = max(int((widths[column] - 6) / (body_size * 0.55)), 1)
+        if len(text) > limit:
+            row[column] = text[:limit - 1] + '…'
+    return row
+
+
+class _PageChunks(Flowable):
+    """Nakliye kayıtlarını sayfa başına bir `LongTable` olarak çizen flowable.
+
+    Sayfaya sığmadığında ReportLab `split` çağırır: kalan yere sığan kayıtlar
+    (başlık + kayıtlar + sayfa toplamı) bir `LongTable` olur, sonraki kayıtlar yeni
+    sayfada başlayan yeni bir `_PageChunks` ile devam eder. Parçalar sırası gelince
+    üretilir ve çizildikten sonra bırakılır; son parça genel toplamla biter."""
+
+    def __init__(self, table: ReportTable, kind: str, width: float, start: int = 0):
+        super().__init__()
+        self.table = table
+        self.kind = kind
+        self.page_width = width
+        self.start = start
+        self.widths = column_widths(kind, width)
+        self.header_height, self.body_height = row_heights(kind)
+
+    def _height(self, count: int) -> float:
+        # Başlık, kayıtlar, sayfa toplamı ve (son parçada) genel toplam
+        return self.header_height + self.body_height * (count + 2)
+
+    def _chunk(self, stop: Optional[int] = None) -> LongTable:
+        style = templates()
+        stop = self.table.size if stop is None else stop
+        last = stop == self.table.size
+        rows = [nakliye_header(self.kind),
+                *(_fit(row, self.kind, self.widths) for row in self.table.rows(self.start, stop)),
+                total_row(self.kind, 'Sayfa Toplamı:', self.table.subtotal('toplam', self.start, stop),
+                          self.table.subtotal('sistem', self.start, stop))]
+        if last:
+            rows.append(total_row(self.kind, 'GENEL TOPLAM:', self.table.total('toplam'), self.table.total('sistem')))
+        chunk = LongTable(rows, colWidths=self.widths,
+                          rowHeights=[self.header_height] + [self.body_height] * (len(rows) - 1), repeatRows=1)
+        chunk.setStyle(getattr(style, self.kind))
+        if last:
+            chunk.setStyle(style.grand_total)
+        return chunk
+
+    def wrap(self, availWidth, availHeight):
+        self.width = self.page_width
+        self.height = self._height(self.table.size - self.start)
+        return self.width, self.height
+
+    def split(self, availWidth, availHeight):
+        count = int((availHeight - self.header_height) // self.body_height) - 2
+        if count < 1:
+            # Bu sayfada yer yok; ReportLab yeni sayfada tekrar dener
+            return []
+        stop = self.start + count
+        if stop >= self.table.size:
+            return [self._chunk()]
+        return [self._chunk(stop), PageBreak(), _PageChunks(self.table, self.kind, self.page_width, stop)]
+
+    def draw(self):
+        # Kalan kayıtlar bu sayfaya sığıyor: tek (son) parça çizilir
+        chunk = self._chunk()
+        chunk.wrapOn(self.canv, self.width, self.height)
+        chunk.drawOn(self.canv, 0, 0)
+
+
+def _yatan_section(table: ReportTable, width: Optional[float] = None) -> list:
+    style = templates()
+    rows = yatan_rows(table)
+    if width is None:
+        yatan_table = Table(rows)
+    else:
+        # Büyük rapor: sabit genişlik, sayfaya sığmazsa başlık tekrarlanarak bölünür
+        widths = column_widths("yatan", width)
+        header_height, body_height = row_heights("yatan")
+        yatan_table = LongTable(
+            [rows[0]] + [_fit(row, "yatan", widths) for row in rows[1:]], colWidths=widths,
+            rowHeights=[header_height] + [body_height] * (len(rows) - 1), repeatRows=1
+        )
+    yatan_table.setStyle(style.yatan)
+    return [Spacer(1, 20), Paragraph("YATAN TUTAR KAYITLARI", style.section), Spacer(1, 10), yatan_table]
+
+
+def _large_report(doc: SimpleDocTemplate, header: list, table: ReportTable, yatan: Optional[ReportTable],
+                  kind: str) -> list:
+    elements = [*header, _PageChunks(table, kind, doc.width)]
+    if yatan is not None:
+        elements.extend(_yatan_section(yatan, doc.width))
+    return elements
+
+
+def _tables(data: List[dict], yatan_data: Optional[List[dict]], kind: str):
+    if kind not in REPORT_KINDS:
+        raise ValueError(f"Geçersiz rapor türü: {kind}")
+    # Yatan tutar bölümü sadece detaylı raporda (eğer varsa)
+    yatan = yatan_table(yatan_data) if kind == "detailed" and yatan_data else None
+    return nakliye_table(data, kind), yatan
+
+
+def build_report(output, period: str, data: List[dict], yatan_data: Optional[List[dict]] = None,
+                 kind: str = "detailed"):
+    """Raporu `output` yoluna (veya dosya nesnesine) yazar"""
+    table, yatan = _tables(data, yatan_data, kind)
+    style = templates()
+    doc = SimpleDocTemplate(output, pagesize=landscape(A4))
+    elements = _header(period, doc.width)
+
+    if table.size > LARGE_REPORT_ROWS:
+        doc.build(_large_report(doc, elements, table, yatan, kind))
+        return
+
+    nakliye = Table(nakliye_rows(table, kind))
+    nakliye.setStyle(getattr(style, kind))
+    elements.append(nakliye)
+    if yatan is not None:
+        elements.extend(_yatan_section(yatan))
+
+    doc.build(elements)
+
+
+def build_csv(output: str, period: str, data: List[dict], yatan_data: Optional[List[dict]] = None,
+              kind: str = "detailed"):
+    """PDF'teki tabloları CSV olarak yazar; yatan tutar tablosu bir boş satır sonra gelir.
+    BOM ile yazılır ki Excel Türkçe karakterleri doğru açsın."""
+    table, yatan = _tables(data, yatan_data, kind)
+    with open(output, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerows(nakliye_rows(table, kind))
+        if yatan is not None:
+            writer.writerow([])
+            writer.writerows(yatan_rows(yatan))
+
+
+def _sheet(workbook: Workbook, title: str, header: List[str], table: ReportTable, total_label_column: int,
+           total_fields: Sequence[str]):
+    """Tutarlar sayı, tarihler tarih hücresi olarak yazılır (Excel'de toplanabilir/sıralanabilir)"""
+    sheet = workbook.create_sheet(title)
+    bold = Font(bold=True)
+
+    def cell(value, number_format: Optional[str] = None, font: Optional[Font] = None) -> WriteOnlyCell:
+        written = WriteOnlyCell(sheet, value)
+        if number_format:
+            written.number_format = number_format
+        if font:
+            written.font = font
+        return written
+
+    formats = {MONEY: '#,##0.00', DATE: 'DD.MM.YYYY'}
+    column_formats = [formats.get(column_type) for _, column_type in table.columns]
+    sheet.append([cell(label, font=bold) for label in header])
+    for row in table.typed_rows():
+        sheet.append([cell(value, number_format) if number_format and value is not None else value
+                      for value, number_format in zip(row, column_formats)])
+    total = [None] * len(header)
+    total[total_label_column] = cell('TOPLAM:', font=bold)
+    for offset, field in enumerate(total_fields, start=1):
+        total[total_label_column + offset] = cell(table.total(field), formats[MONEY], bold)
+    sheet.append(total)
+
+
+def build_xlsx(output: str, period: str, data: List[dict], yatan_data: Optional[List[dict]] = None,
+               kind: str = "detailed"):
+    table, yatan = _tables(data, yatan_data, kind)
+    # write_only: satırlar bellekte tutulmadan dosyaya yazılır
+    workbook = Workbook(write_only=True)
+    header = nakliye_header(kind)
+    _sheet(workbook, "Nakliye", header, table, len(header) - 3, ('toplam', 'sistem'))
+    if yatan is not None:
+        _sheet(workbook, "Yatan Tutar", YATAN_HEADER, yatan, 2, ('tutar',))
+    workbook.save(output)
+
+
+BUILDERS = {"pdf": build_report, "csv": build_csv, "xlsx": build_xlsx}
+
+
+def render_report(output: str, period: str, data: List[dict], yatan_data: Optional[List[dict]] = None,
+                  kind: str = "detailed", fmt: str = "pdf"):
+    """Raporu istenen biçimde `output` yoluna yazar"""
+    if fmt not in BUILDERS:
+        raise ValueError(f"Geçersiz rapor biçimi: {fmt}")
+    BUILDERS[fmt](output, period, data, yatan_data, kind)
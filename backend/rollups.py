@@ -0,0 +1,232 @@
+"""
+Aylık toplamlar (monthly_rollups).
+
+Her ay için nakliye sayısı/para sütunu toplamları ve yatan tutar sayısı/toplamı
+tek belgede tutulur. Yazma endpoint'leri belgeyi $inc ile günceller; özet
+okumaları ise (yıl, ay) anahtarıyla tek bir index araması olur.
+
+Kullanım:
+    python rollups.py verify    # ham veriden yeniden hesaplar, farkları raporlar
+    python rollups.py rebuild   # ham veriden yeniden hesaplar ve yazar
+"""
+import argparse
+import asyncio
+import logging
+import os
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_COLLECTION = "monthly_rollups"
+
+# Nakliye kayıtlarındaki para sütunları
+MONEY_FIELDS = ["bos_tasima", "reefer", "bekleme", "geceleme", "pazar", "harcirah", "toplam", "sistem"]
+
+NAKLIYE_COUNTERS = ["nakliye_sayisi"] + MONEY_FIELDS
+YATAN_COUNTERS = ["yatan_sayisi", "yatan_toplam"]
+
+# Float toplamlarda kabul edilen fark
+TOLERANCE = 0.005
+
+
+def month_key(value) -> Optional[Tuple[int, int]]:
+    """Tarih değerinden (yıl, ay) anahtarı üretir"""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        return value.year, value.month
+    if isinstance(value, date):
+        return value.year, value.month
+    return None
+
+
+def rollup_id(year: int, month: int) -> str:
+    return f"{year:04d}-{month:02d}"
+
+
+def nakliye_contribution(doc: dict) -> Dict[str, float]:
+    values = {"nakliye_sayisi": 1}
+    for field in MONEY_FIELDS:
+        values[field] = float(doc.get(field) or 0)
+    return values
+
+
+def yatan_contribution(doc: dict) -> Dict[str, float]:
+    return {"yatan_sayisi": 1, "yatan_toplam": float(doc.get("tutar") or 0)}
+
+
+def _collect_deltas(changes: Iterable[Tuple[Optional[dict], Optional[dict]]], date_field: str,
+                    contribution) -> Dict[Tuple[int, int], Dict[str, float]]:
+    """Eski belgelerin katkısını çıkarıp yenilerinkini ekleyen ay bazlı farklar"""
+    deltas: Dict[Tuple[int, int], Dict[str, float]] = {}
+    for old, new in changes:
+        for doc, sign in ((old, -1), (new, 1)):
+            if not doc:
+                continue
+            key = month_key(doc.get(date_field))
+            if key is None:
+                continue
+            bucket = deltas.setdefault(key, {})
+            for field, value in contribution(doc).items():
+                bucket[field] = bucket.get(field, 0) + sign * value
+    return deltas
+
+
+async def _apply_deltas(db, deltas: Dict[Tuple[int, int], Dict[str, float]]):
+    for (year, month), inc in deltas.items():
+        inc = {field: value for field, value in inc.items() if value}
+        if not inc:
+            continue
+        await db[ROLLUP_COLLECTION].update_one(
+            {"_id": rollup_id(year, month)},
+            {
+                "$inc": inc,
+                "$set": {"year": year, "month": month, "updated_at": datetime.now(timezone.utc)}
+            },
+            upsert=True
+        )
+
+
+async def apply_nakliye_changes(db, changes: Iterable[Tuple[Optional[dict], Optional[dict]]]):
+    """Nakliye ekleme/güncelleme/silme sonrası ilgili ayların toplamlarını günceller.
+    Toplu işlemlerde her ay için tek bir $inc yapılır."""
+    try:
+        await _apply_deltas(db, _collect_deltas(changes, "tarih", nakliye_contribution))
+    except Exception as e:
+        # Toplamlar yeniden hesaplanabilir; yazma işlemini başarısız saymıyoruz
+        logger.error(f"Aylık toplam güncellenemedi (nakliye): {str(e)}")
+
+
+async def apply_yatan_changes(db, changes: Iterable[Tuple[Optional[dict], Optional[dict]]]):
+    """Yatan tutar ekleme/güncelleme/silme sonrası ilgili ayların toplamlarını günceller"""
+    try:
+        await _apply_deltas(db, _collect_deltas(changes, "yatan_tarih", yatan_contribution))
+    except Exception as e:
+        logger.error(f"Aylık toplam güncellenemedi (yatan tutar): {str(e)}")
+
+
+async def apply_nakliye_change(db, old: Optional[dict], new: Optional[dict]):
+    await apply_nakliye_changes(db, [(old, new)])
+
+
+async def apply_yatan_change(db, old: Optional[dict], new: Optional[dict]):
+    await apply_yatan_changes(db, [(old, new)])
+
+
+async def compute_rollups(db) -> Dict[str, dict]:
+    """Ham verilerden tüm ayların toplamlarını aggregation ile hesaplar"""
+    nakliye_group = {
+        "_id": {"year": {"$year": "$tarih"}, "month": {"$month": "$tarih"}},
+        "nakliye_sayisi": {"$sum": 1},
+    }
+    for field in MONEY_FIELDS:
+        nakliye_group[field] = {"$sum": {"$ifNull": [f"${field}", 0]}}
+    yatan_group = {
+        "_id": {"year": {"$year": "$yatan_tarih"}, "month": {"$month": "$yatan_tarih"}},
+        "yatan_sayisi": {"$sum": 1},
+        "yatan_toplam": {"$sum": {"$ifNull": ["$tutar", 0]}},
+    }
+    # $year/$month sadece BSON date üzerinde çalışır (bkz. migrate_dates.py)
+    date_only = {"$type": "date"}
+
+    rollups: Dict[str, dict] = {}
+
+    def bucket(key: dict) -> dict:
+        doc_id = rollup_id(key["year"], key["month"])
+        if doc_id not in rollups:
+            rollups[doc_id] = {"_id": doc_id, "year": key["year"], "month": key["month"],
+                               **{field: 0 for field in NAKLIYE_COUNTERS + YATAN_COUNTERS}}
+        return rollups[doc_id]
+
+    async for row in db.nakliye_kayitlari.aggregate([{"$match": {"tarih": date_only}}, {"$group": nakliye_group}]):
+        target = bucket(row["_id"])
+        for field in NAKLIYE_COUNTERS:
+            target[field] = row.get(field, 0)
+
+    async for row in db.yatan_tutar.aggregate([{"$match": {"yatan_tarih": date_only}}, {"$group": yatan_group}]):
+        target = bucket(row["_id"])
+        for field in YATAN_COUNTERS:
+            target[field] = row.get(field, 0)
+
+    return rollups
+
+
+def _differs(expected: dict, actual: Optional[dict]) -> Dict[str, tuple]:
+    diff = {}
+    for field in NAKLIYE_COUNTERS + YATAN_COUNTERS:
+        expected_value = expected.get(field, 0) if expected else 0
+        actual_value = (actual or {}).get(field, 0)
+        if abs(float(expected_value) - float(actual_value)) > TOLERANCE:
+            diff[field] = (expected_value, actual_value)
+    return diff
+
+
+async def verify_rollups(db) -> Dict[str, dict]:
+    """Kayıtlı toplamları ham veriyle karşılaştırır ve farkları döndürür"""
+    expected = await compute_rollups(db)
+    stored = {doc["_id"]: doc async for doc in db[ROLLUP_COLLECTION].find()}
+    drift = {}
+    for doc_id in sorted(set(expected) | set(stored)):
+        diff = _differs(expected.get(doc_id), stored.get(doc_id))
+        if diff:
+            drift[doc_id] = diff
+            logger.warning(f"Aylık toplam farkı {doc_id}: {diff}")
+    logger.info(f"Aylık toplam kontrolü: {len(expected)} ay, {len(drift)} farklı")
+    return drift
+
+
+async def rebuild_rollups(db) -> int:
+    """Toplamları ham veriden yeniden yazar"""
+    expected = await compute_rollups(db)
+    now = datetime.now(timezone.utc)
+    for doc_id, doc in expected.items():
+        await db[ROLLUP_COLLECTION].replace_one({"_id": doc_id}, {**doc, "updated_at": now}, upsert=True)
+    await db[ROLLUP_COLLECTION].delete_many({"_id": {"$nin": list(expected)}})
+    logger.info(f"Aylık toplamlar yeniden oluşturuldu: {len(expected)} ay")
+    return len(expected)
+
+
+async def ensure_rollups(db):
+    """Toplamlar hiç oluşturulmamışsa (ilk kurulum) ham veriden oluşturur"""
+    try:
+        if await db[ROLLUP_COLLECTION].count_documents({}, limit=1) == 0 and \
+                await db.nakliye_kayitlari.count_documents({}, limit=1) + \
+                await db.yatan_tutar.count_documents({}, limit=1) > 0:
+            await rebuild_rollups(db)
+    except Exception as e:
+        logger.error(f"Aylık toplamlar oluşturulamadı: {str(e)}")
+
+
+async def main(args):
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    db = client[os.environ['DB_NAME']]
+    try:
+        if args.command == "rebuild":
+            await rebuild_rollups(db)
+        else:
+            drift = await verify_rollups(db)
+            if drift:
+                raise SystemExit(1)
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Aylık toplamları doğrular veya yeniden oluşturur")
+    parser.add_argument("command", choices=["verify", "rebuild"])
+    asyncio.run(main(parser.parse_args()))
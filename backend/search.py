@@ -0,0 +1,165 @@
+"""
+Nakliye arama altyapısı.
+
+Her nakliye belgesinde `arama_tokenlari` alanı tutulur: müşteri, kod, sıra no
+ve irsaliye no değerlerinin Türkçe kurallarıyla küçültülmüş ve aksanlardan
+arındırılmış parçaları. Bu alan üzerindeki multikey index sayesinde
+"^önek" sorguları index aralık taraması olarak çalışır; irsaliye no ve sıra no
+için ayrıca birebir eşleşme yolu vardır.
+"""
+import logging
+import re
+import unicodedata
+from typing import List
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+SEARCH_SOURCE_FIELDS = ["musteri", "sira_no", "kod", "irsaliye_no"]
+SEARCH_TOKENS_FIELD = "arama_tokenlari"
+
+# Sıralama (relevance) için bellekte değerlendirilecek en fazla aday sayısı
+CANDIDATE_LIMIT = 1000
+
+# Türkçe'de I -> ı ve İ -> i; str.lower() bunları doğru çevirmez
+_TURKISH_LOWER = str.maketrans({"I": "ı", "İ": "i"})
+# Telefonda Türkçe karakter olmadan yazılan aramaları da bulabilmek için
+_ASCII_FOLD = str.maketrans({
+    "ı": "i", "ş": "s", "ğ": "g", "ü": "u", "ö": "o", "ç": "c",
+    "â": "a", "î": "i", "û": "u",
+})
+_TOKEN_SPLIT = re.compile(r"[^0-9a-z]+")
+
+
+def fold_text(value) -> str:
+    """Türkçe duyarlı küçük harfe çevirme ve aksan temizleme"""
+    if value is None:
+        return ""
+    text = unicodedata.normalize("NFC", str(value))
+    return text.translate(_TURKISH_LOWER).lower().translate(_ASCII_FOLD)
+
+
+def tokenize(value) -> List[str]:
+    return [token for token in _TOKEN_SPLIT.split(fold_text(value)) if token]
+
+
+def search_fields(doc: dict) -> dict:
+    """Belge için saklanacak arama alanlarını üretir"""
+    tokens = set()
+    for field in SEARCH_SOURCE_FIELDS:
+        parts = tokenize(doc.get(field))
+        tokens.update(parts)
+        if field != "musteri" and len(parts) > 1:
+            # "ABC-123" gibi kodlar ayırıcısız ("abc123") yazıldığında da bulunsun
+            tokens.add("".join(parts))
+    return {SEARCH_TOKENS_FIELD: sorted(tokens)}
+
+
+def search_fields_changed(update_data: dict) -> bool:
+    return any(field in update_data for field in SEARCH_SOURCE_FIELDS)
+
+
+def _score(doc: dict, query_folded: str, query_tokens: List[str]) -> int:
+    score = 0
+    for field in ("irsaliye_no", "sira_no"):
+        if fold_text(doc.get(field)) == query_folded:
+            score += 100
+    musteri = fold_text(doc.get("musteri"))
+    if musteri == query_folded:
+        score += 50
+    elif musteri.startswith(query_folded):
+        score += 20
+    musteri_tokens = set(tokenize(musteri))
+    doc_tokens = set(doc.get(SEARCH_TOKENS_FIELD) or [])
+    for token in query_tokens:
+        if token in doc_tokens:
+            score += 10
+        else:
+            score += 5
+        if any(t.startswith(token) for t in musteri_tokens):
+            score += 2
+    return score
+
+
+async def search_records(collection, query: str, skip: int = 0, limit: int = 100) -> List[dict]:
+    """Birebir (irsaliye/sıra no/müşteri) ve önek eşleşmelerini alaka sırasıyla döndürür.
+
+    Birebir eşleşmeler kendi indexleriyle ayrıca okunur, tarihten bağımsız her
+    zaman aday kümesindedir. Önek eşleşmelerinden ise sadece en yeni
+    CANDIDATE_LIMIT kayıt değerlendirilir; alaka sıralaması bu adayları
+    yeniden sıralar, daha eski önek eşleşmeleri sonuçta yer almaz."""
+    query = query.strip()
+    query_tokens = tokenize(query)
+    if not query_tokens:
+        return []
+    query_folded = fold_text(query)
+
+    # Birebir eşleşme: irsaliye_no / sira_no indexleri
+    exact = await collection.find(
+        {"$or": [{"irsaliye_no": query}, {"sira_no": query}]}
+    ).limit(CANDIDATE_LIMIT).to_list(CANDIDATE_LIMIT)
+    # Müşteri adının tamamı yazıldıysa: (musteri, tarih) index'i, en yeni kayıtlar
+    exact += await collection.find({"musteri": query}).sort(
+        [("tarih", -1), ("id", -1)]
+    ).limit(CANDIDATE_LIMIT).to_list(CANDIDATE_LIMIT)
+
+    # Önek eşleşmesi: her arama parçası bir tokenın başı olmalı; girdi regex olarak kaçırılır
+    prefix_filter = {"$and": [
+        {SEARCH_TOKENS_FIELD: {"$regex": f"^{re.escape(token)}"}} for token in query_tokens
+    ]}
+    candidate_limit = max(CANDIDATE_LIMIT, skip + limit)
+    candidates = await collection.find(prefix_filter).sort(
+        [("tarih", -1), ("id", -1)]
+    ).limit(candidate_limit).to_list(candidate_limit)
+
+    seen = set()
+    merged = []
+    for doc in exact + candidates:
+        if doc["id"] in seen:
+            continue
+        seen.add(doc["id"])
+        merged.append(doc)
+
+    # Python'un sort'u kararlı: aynı puanda tarih sırası korunur
+    merged.sort(key=lambda doc: _score(doc, query_folded, query_tokens), reverse=True)
+    return merged[skip:skip + limit]
+
+
+async def backfill_search_fields(collection, batch_size: int = 500) -> int:
+    """Arama alanı olmayan (eski) belgeleri batch'ler halinde doldurur"""
+    updated = 0
+    try:
+        while True:
+            batch = await collection.find(
+                {SEARCH_TOKENS_FIELD: {"$exists": False}},
+                {field: 1 for field in SEARCH_SOURCE_FIELDS}
+            ).limit(batch_size).to_list(batch_size)
+            if not batch:
+                break
+            operations = [UpdateOne({"_id": doc["_id"]}, {"$set": search_fields(doc)}) for doc in batch]
+            result = await collection.bulk_write(operations, ordered=False)
+            updated += result.modified_count
+            if result.modified_count == 0:
+                break
+        if updated:
+            logger.info(f"Arama alanları dolduruldu: {updated} belge")
+    except Exception as e:
+        logger.error(f"Arama alanları doldurulamadı: {str(e)}")
+    return updated
+
+
+async def fuzzy_search_records(collection, customer_index, query: str, limit: int = 100,
+                               exclude_ids=()) -> List[dict]:
+    """Yazım hatalı müşteri aramaları: trigram adaylarıyla indexli $in sorgusu"""
+    candidates = [item["musteri"] for item in customer_index.fuzzy(query)]
+    if not candidates or limit <= 0:
+        return []
+    query_filter = {"musteri": {"$in": candidates}}
+    if exclude_ids:
+        query_filter["id"] = {"$nin": list(exclude_ids)}
+    docs = await collection.find(query_filter).sort([("tarih", -1), ("id", -1)]).limit(limit).to_list(limit)
+    # Daha benzer müşterinin kayıtları önce
+    rank = {name: i for i, name in enumerate(candidates)}
+    docs.sort(key=lambda doc: rank.get(doc.get("musteri"), len(rank)))
+    return docs
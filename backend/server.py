@@ -1,32 +1,49 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, ValidationError
+from typing import Any, Dict, List, Optional
 import uuid
-from datetime import datetime, timezone, timedelta
+from datetime import date, datetime, timezone, timedelta
 from decimal import Decimal
-
-# PDF generation imports
-from reportlab.lib.pagesizes import A4, landscape
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from io import BytesIO
+import asyncio
+import base64
+import json
+from urllib.parse import quote
 
 # Authentication imports
 from auth_models import *
 from auth_utils import *
 from notification_service import NotificationService
+from index_manager import ensure_indexes
+from search import (
+    SEARCH_TOKENS_FIELD, backfill_search_fields, fuzzy_search_records, search_fields, search_fields_changed,
+    search_records
+)
+from customer_index import CustomerIndex
+from backup import (
+    BACKUP_FORMATS, DEDUP_KEYS, DEFAULT_BACKUP_FORMAT, DELETED_SECTION, NAKLIYE_SECTION, RESTORE_BATCH_SIZE,
+    RESTORE_STATE_COLLECTION, RESTORE_TIP_ID, YATAN_SECTION, BackupChainError, BackupParseError, iter_backup,
+    iter_backup_events, new_manifest, record_tombstones, upsert_latest, upsert_new, write_backup_file
+)
+from artifacts import ArtifactResponse, store_from_env
+from qr_codes import DEFAULT_QR_SIZE, MAX_QR_SIZE, MIN_QR_SIZE, QR_FORMATS, render_qr, split_qr_name
+from report_cache import cache_key, period_fingerprint
+from report_jobs import ReportQueueFull, queue_from_env
+from report_pool import ReportPoolBusy, ReportTimeout, pool_from_env
+from reports import REPORT_FORMATS, YATAN_PROJECTION, nakliye_projection, period_label
+from rollups import (
+    MONEY_FIELDS, ROLLUP_COLLECTION, apply_nakliye_change, apply_nakliye_changes, apply_yatan_change,
+    apply_yatan_changes, ensure_rollups, rollup_id
+)
 
 
 ROOT_DIR = Path(__file__).parent
@@ -37,7 +54,8 @@ BACKEND_URL = os.environ.get('BACKEND_URL', 'http://localhost:8000')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+# tz_aware: tarih alanları BSON date olarak saklanır ve UTC datetime olarak okunur
+client = AsyncIOMotorClient(mongo_url, tz_aware=True)
 db = client[os.environ['DB_NAME']]
 
 # Collections
@@ -47,6 +65,17 @@ biometric_credentials_collection = db["biometric_credentials"]
 nakliye_collection = db["nakliye_kayitlari"]
 yatan_tutar_collection = db["yatan_tutar"]
 
+# Müşteri adları için bellek içi index (başlangıçta yüklenir)
+customer_index = CustomerIndex()
+
+# PDF/yedek gibi geçici indirmeler (süre dolumu, boyut bütçesi, LRU)
+artifact_store = store_from_env(db)
+
+# PDF raporları ayrı süreçlerde üretilir
+report_pool = pool_from_env()
+# Önbellek anahtarı -> çizilmekte olan rapor (aynı raporun eş zamanlı çizimini önler)
+report_renders: Dict[str, asyncio.Future] = {}
+
 # Security
 security = HTTPBearer()
 
@@ -103,9 +132,9 @@ class NakliyeKayit(BaseModel):
 class YatanTutar(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     tutar: float
-    yatan_tarih: str  # Paranın yattığı tarih
-    baslangic_tarih: str  # Çalışmanın başlangıç tarihi
-    bitis_tarih: str  # Çalışmanın bitiş tarihi
+    yatan_tarih: date  # Paranın yattığı tarih
+    baslangic_tarih: date  # Çalışmanın başlangıç tarihi
+    bitis_tarih: date  # Çalışmanın bitiş tarihi
     aciklama: Optional[str] = ""  # Ek açıklama
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
@@ -130,12 +159,43 @@ class NakliyeKayitCreate(BaseModel):
 
 class YatanTutarCreate(BaseModel):
     tutar: float
-    yatan_tarih: str
-    baslangic_tarih: str
-    bitis_tarih: str
+    yatan_tarih: date
+    baslangic_tarih: date
+    bitis_tarih: date
     aciklama: Optional[str] = ""
 
 
+class BulkItemResult(BaseModel):
+    index: int
+    status: str  # "ok" veya "error"
+    id: Optional[str] = None
+    detail: Optional[str] = None
+
+
+class BulkInsertResponse(BaseModel):
+    inserted: int
+    failed: int
+    results: List[BulkItemResult]
+
+
+class BulkSelection(BaseModel):
+    """Toplu işlemde etkilenecek kayıtlar: id listesi ve/veya dönem filtresi"""
+    ids: Optional[List[str]] = None
+    year: Optional[int] = None
+    month: Optional[int] = Field(None, ge=1, le=12)
+    date_from: Optional[str] = Field(None, alias="from")
+    date_to: Optional[str] = Field(None, alias="to")
+
+
+class NakliyeBulkSelection(BulkSelection):
+    musteri: Optional[str] = None
+
+
+class BulkDeleteResponse(BaseModel):
+    deleted: int
+    failed: int = 0
+
+
 class NakliyeKayitUpdate(BaseModel):
     tarih: Optional[datetime] = None
     sira_no: Optional[str] = None
@@ -156,32 +216,172 @@ class NakliyeKayitUpdate(BaseModel):
 
 class YatanTutarUpdate(BaseModel):
     tutar: Optional[float] = None
-    yatan_tarih: Optional[str] = None
-    baslangic_tarih: Optional[str] = None
-    bitis_tarih: Optional[str] = None
+    yatan_tarih: Optional[date] = None
+    baslangic_tarih: Optional[date] = None
+    bitis_tarih: Optional[date] = None
     aciklama: Optional[str] = None
-    yatan_tarih: Optional[str] = None
+
+
+class NakliyeBulkUpdate(NakliyeBulkSelection):
+    update: NakliyeKayitUpdate
+
+
+class YatanTutarBulkUpdate(BulkSelection):
+    update: YatanTutarUpdate
+
+
+class BulkUpdateResponse(BaseModel):
+    matched: int
+    modified: int
+    failed: int = 0
+
+
+class DonemOzeti(BaseModel):
+    year: Optional[int] = None
+    month: Optional[int] = None
+    nakliye_sayisi: int = 0
+    bos_tasima: float = 0.0
+    reefer: float = 0.0
+    bekleme: float = 0.0
+    geceleme: float = 0.0
+    pazar: float = 0.0
+    harcirah: float = 0.0
+    toplam: float = 0.0
+    sistem: float = 0.0
+    yatan_sayisi: int = 0
+    yatan_toplam: float = 0.0
+    fark: float = 0.0  # Nakliye toplamı - yatan tutar toplamı
+
+
+class YillikOzet(BaseModel):
+    year: int
+    toplam: DonemOzeti
+    aylar: List[DonemOzeti]
 
 
 def prepare_for_mongo(data):
-    """MongoDB serialization helper"""
+    """MongoDB serialization helper - tarihler BSON date olarak saklanır"""
     if isinstance(data, dict):
         for key, value in data.items():
-            if isinstance(value, datetime):
-                data[key] = value.isoformat()
+            # BSON'da sadece datetime var; gün değerleri UTC gece yarısı olarak saklanır
+            if isinstance(value, date) and not isinstance(value, datetime):
+                data[key] = datetime(value.year, value.month, value.day, tzinfo=timezone.utc)
     return data
 
 
-def parse_from_mongo(item):
-    """MongoDB deserialization helper"""
-    if isinstance(item, dict):
-        for key, value in item.items():
-            if key in ['tarih', 'created_at'] and isinstance(value, str):
-                try:
-                    item[key] = datetime.fromisoformat(value.replace('Z', '+00:00'))
-                except:
-                    pass
-    return item
+def touch(data: dict) -> dict:
+    """Artımlı yedekler için değişiklik zamanını işaretler"""
+    data["updated_at"] = datetime.now(timezone.utc)
+    return data
+
+
+def encode_cursor(values):
+    """Sayfalama için (sıralama alanı, id) değerlerinden opak cursor üretir"""
+    payload = []
+    for value in values:
+        if isinstance(value, datetime):
+            payload.append({"$date": value.isoformat()})
+        else:
+            payload.append(value)
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str):
+    """encode_cursor ile üretilen cursor'ı çözer"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        values = []
+        for value in payload:
+            if isinstance(value, dict) and "$date" in value:
+                value = datetime.fromisoformat(value["$date"])
+            values.append(value)
+        if len(values) != 2:
+            raise ValueError("cursor")
+        return values
+    except Exception:
+        raise HTTPException(status_code=400, detail="Geçersiz cursor")
+
+
+def keyset_filter(sort_field: str, cursor: Optional[str]):
+    """(sort_field, id) azalan sıralaması için cursor'dan sonraki kayıtları seçen filtre"""
+    if not cursor:
+        return {}
+    last_value, last_id = decode_cursor(cursor)
+    return {
+        "$or": [
+            {sort_field: {"$lt": last_value}},
+            {sort_field: last_value, "id": {"$lt": last_id}}
+        ]
+    }
+
+
+def next_cursor_for(docs, sort_field: str, limit: int):
+    """Sayfa doluysa son kayıttan bir sonraki sayfanın cursor'ını üretir"""
+    if limit <= 0 or len(docs) < limit:
+        return None
+    last = docs[-1]
+    return encode_cursor([last.get(sort_field), last.get("id")])
+
+
+def parse_date_param(value: str, name: str) -> datetime:
+    """YYYY-MM-DD veya ISO formatındaki sorgu parametresini UTC (naive) olarak çözer"""
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Geçersiz tarih parametresi: {name}")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def period_bounds(year: Optional[int] = None, month: Optional[int] = None,
+                  date_from: Optional[str] = None, date_to: Optional[str] = None):
+    """Yıl/ay veya from/to parametrelerinden [başlangıç, bitiş) tarih aralığı üretir"""
+    if month is not None and year is None:
+        raise HTTPException(status_code=400, detail="Ay filtresi için yıl gerekli")
+
+    start = end = None
+    if year is not None:
+        if month is not None:
+            start = datetime(year, month, 1)
+            end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+        else:
+            start = datetime(year, 1, 1)
+            end = datetime(year + 1, 1, 1)
+    if date_from:
+        parsed = parse_date_param(date_from, "from")
+        start = parsed if start is None else max(start, parsed)
+    if date_to:
+        # Sadece tarih verilmişse o günün tamamı dahil edilir
+        parsed = parse_date_param(date_to, "to")
+        if len(date_to) == 10:
+            parsed = parsed + timedelta(days=1)
+        end = parsed if end is None else min(end, parsed)
+    return start, end
+
+
+def period_filter(field: str, year: Optional[int] = None, month: Optional[int] = None,
+                  date_from: Optional[str] = None, date_to: Optional[str] = None):
+    """Tarih alanı için index aralık sorgusu filtresi"""
+    start, end = period_bounds(year, month, date_from, date_to)
+    condition = {}
+    if start is not None:
+        condition["$gte"] = start.replace(tzinfo=timezone.utc)
+    if end is not None:
+        condition["$lt"] = end.replace(tzinfo=timezone.utc)
+    return {field: condition} if condition else {}
+
+
+def combine_filters(*filters):
+    """Boş olmayan filtreleri $and ile birleştirir"""
+    parts = [f for f in filters if f]
+    if not parts:
+        return {}
+    if len(parts) == 1:
+        return parts[0]
+    return {"$and": parts}
 
 
 # Add your routes to the router instead of directly to app
@@ -196,18 +396,270 @@ async def create_nakliye(input: NakliyeKayitCreate):
     try:
         nakliye_dict = input.dict()
         nakliye_obj = NakliyeKayit(**nakliye_dict)
-        prepared_data = prepare_for_mongo(nakliye_obj.dict())
+        prepared_data = touch(prepare_for_mongo(nakliye_obj.dict()))
+        prepared_data.update(search_fields(prepared_data))
         await db.nakliye_kayitlari.insert_one(prepared_data)
+        await apply_nakliye_change(db, None, prepared_data)
+        customer_index.apply_change(None, prepared_data)
         return nakliye_obj
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Aynı sıra no, müşteri ve irsaliye no ile kayıt zaten var")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# Toplu işlemlerde tek istekte kabul edilen en fazla kayıt ve insert_many parça boyutu
+BULK_MAX_ITEMS = 20000
+BULK_CHUNK_SIZE = 1000
+# Toplu silme/güncellemede seçilen kayıtlar bu alanla işlemin kimliği ve zamanıyla işaretlenir
+BULK_OP_FIELD = "_bulk_op"
+# İşaretini kaldıramadan kesilen bir işlemin kayıtları bu süreden sonra yeniden seçilebilir
+BULK_OP_TIMEOUT = timedelta(minutes=10)
+
+
+def validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in error.errors()
+    )
+
+
+async def unwritten_positions(collection, chunk: list, error: str) -> Dict[int, str]:
+    """insert_many yarıda kaldığında (ağ, primary değişimi) parçadaki hangi
+    belgelerin yazılmadığını id'lerle yeniden okuyarak bulur"""
+    logger.error(f"Toplu ekleme parçası başarısız: {error}")
+    try:
+        written = await collection.find(
+            {"id": {"$in": [doc["id"] for _, doc in chunk]}}, {"_id": 0, "id": 1}
+        ).to_list(None)
+    except Exception:
+        # Durum okunamadı; kayıtlar hata sayılır (tekrar gönderilirse id'ler yeniden üretilir)
+        return {position: error for position in range(len(chunk))}
+    written_ids = {doc["id"] for doc in written}
+    return {position: error for position, (_, doc) in enumerate(chunk) if doc["id"] not in written_ids}
+
+
+async def bulk_insert(collection, items: List[Any], create_model, record_model, prepare=None):
+    """Kayıtları tek geçişte doğrular, sırasız insert_many ile parça parça yazar.
+    Her kayıt için sonuç ve başarıyla yazılan belgeler döner."""
+    if len(items) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Tek istekte en fazla {BULK_MAX_ITEMS} kayıt gönderilebilir")
+
+    results: List[Optional[BulkItemResult]] = [None] * len(items)
+    valid = []  # (index, belge)
+    for index, item in enumerate(items):
+        try:
+            record = record_model(**create_model(**item).dict())
+        except ValidationError as e:
+            results[index] = BulkItemResult(index=index, status="error", detail=validation_message(e))
+            continue
+        except TypeError:
+            results[index] = BulkItemResult(index=index, status="error", detail="Kayıt bir JSON nesnesi olmalı")
+            continue
+        doc = touch(prepare_for_mongo(record.dict()))
+        if prepare:
+            doc.update(prepare(doc))
+        valid.append((index, doc))
+
+    # Bir parçadaki hata sonraki parçaları durdurmaz; önceki parçalar zaten yazılmış
+    # olduğundan yazılan belgeler her durumda döner (toplamlar ve müşteri indexi için)
+    inserted_docs = []
+    for start in range(0, len(valid), BULK_CHUNK_SIZE):
+        chunk = valid[start:start + BULK_CHUNK_SIZE]
+        failed_positions = {}
+        try:
+            await collection.insert_many([doc for _, doc in chunk], ordered=False)
+        except BulkWriteError as e:
+            for write_error in e.details.get("writeErrors", []):
+                failed_positions[write_error["index"]] = write_error.get("errmsg", "Yazma hatası")
+        except Exception as e:
+            failed_positions = await unwritten_positions(collection, chunk, str(e))
+        for position, (index, doc) in enumerate(chunk):
+            if position in failed_positions:
+                results[index] = BulkItemResult(index=index, status="error", id=doc["id"],
+                                                detail=failed_positions[position])
+            else:
+                results[index] = BulkItemResult(index=index, status="ok", id=doc["id"])
+                inserted_docs.append(doc)
+
+    return results, inserted_docs
+
+
+def selection_filter(selection: BulkSelection, date_field: str, **equals):
+    """Toplu silme/güncelleme seçiminden Mongo filtresi üretir. Yanlışlıkla tüm
+    koleksiyonun etkilenmemesi için en az bir id veya filtre gerekir."""
+    filters = []
+    if selection.ids is not None:
+        if len(selection.ids) > BULK_MAX_ITEMS:
+            raise HTTPException(status_code=413, detail=f"Tek istekte en fazla {BULK_MAX_ITEMS} kayıt seçilebilir")
+        filters.append({"id": {"$in": selection.ids}})
+    filters.append(period_filter(date_field, selection.year, selection.month, selection.date_from, selection.date_to))
+    for field, value in equals.items():
+        if value is not None:
+            filters.append({field: value})
+    query = combine_filters(*filters)
+    if not query:
+        raise HTTPException(status_code=400, detail="Kayıt seçimi için id listesi veya filtre gerekli")
+    return query
+
+
+def unclaimed_filter() -> dict:
+    """Başka bir toplu işlemin işaretlemediği (veya işareti eskimiş) kayıtlar"""
+    return {"$or": [
+        {BULK_OP_FIELD: {"$exists": False}},
+        {f"{BULK_OP_FIELD}.at": {"$lt": datetime.now(timezone.utc) - BULK_OP_TIMEOUT}},
+    ]}
+
+
+async def raise_missing(collection, record_id: str, detail: str):
+    """Tekil güncelleme/silmede kayıt bulunamadıysa: toplu işlemde ise 409, yoksa 404"""
+    if await collection.count_documents({"id": record_id}, limit=1):
+        raise HTTPException(status_code=409, detail="Kayıt şu anda toplu bir işlemde; tekrar deneyin")
+    raise HTTPException(status_code=404, detail=detail)
+
+
+async def claim_selected(collection, query: dict):
+    """Seçimi bu işleme ait bir kimlikle işaretler ve işaretlenen belgeleri okur.
+    Sonraki silme/güncelleme sadece işaretli belgelere uygulanır; aynı anda başka bir
+    istek bir kaydı silse/değiştirse bile toplamlara yansıyan belgeler tam olarak
+    bu işlemin değiştirdikleridir. Tekil güncelleme/silme işaretli kayıtlara dokunmaz."""
+    token = uuid.uuid4().hex
+    await collection.update_many(
+        {"$and": [query, unclaimed_filter()]},
+        {"$set": {BULK_OP_FIELD: {"token": token, "at": datetime.now(timezone.utc)}}}
+    )
+    claimed = {f"{BULK_OP_FIELD}.token": token}
+    docs = await collection.find(
+        claimed, {"_id": 0, SEARCH_TOKENS_FIELD: 0, BULK_OP_FIELD: 0}
+    ).to_list(None)
+    return claimed, docs
+
+
+async def release_unapplied(collection, claimed: dict, docs: List[dict], error: Exception):
+    """Yarıda kesilen işlemde hâlâ işaretli (işlem uygulanmamış) kayıtları ayırıp işaretlerini kaldırır.
+    (uygulanan belgeler, başarısız kayıt sayısı) döner."""
+    logger.error(f"Toplu işlem yarıda kesildi: {str(error)}")
+    remaining = {doc["id"] for doc in await collection.find(claimed, {"_id": 0, "id": 1}).to_list(None)}
+    await collection.update_many(claimed, {"$unset": {BULK_OP_FIELD: ""}})
+    return [doc for doc in docs if doc["id"] not in remaining], len(remaining)
+
+
+async def bulk_delete(collection, query: dict):
+    """Seçilen kayıtları siler; (bu istekle silinen belgeler, başarısız sayısı) döner"""
+    claimed, docs = await claim_selected(collection, query)
+    failed = 0
+    try:
+        await collection.delete_many(claimed)
+    except Exception as e:
+        docs, failed = await release_unapplied(collection, claimed, docs, e)
+    if docs:
+        await record_tombstones(db, collection.name, docs)
+    return docs, failed
+
+
+async def bulk_update(collection, query: dict, update_data: dict):
+    """Seçilen kayıtlara aynı değerleri yazar.
+    (eski belgeler, yeni belgeler, değişen kayıt sayısı, başarısız sayısı) döner."""
+    claimed, old_docs = await claim_selected(collection, query)
+    modified, failed = 0, 0
+    try:
+        result = await collection.update_many(claimed, {"$set": update_data, "$unset": {BULK_OP_FIELD: ""}})
+        modified = result.modified_count
+    except Exception as e:
+        # Güncellenen kayıtların işareti kalkmıştır; işaretli kalanlar uygulanmamıştır
+        old_docs, failed = await release_unapplied(collection, claimed, old_docs, e)
+        modified = len(old_docs)
+    new_docs = [{**doc, **update_data} for doc in old_docs]
+    return old_docs, new_docs, modified, failed
+
+
+@api_router.post("/nakliye/bulk", response_model=BulkInsertResponse)
+async def bulk_create_nakliye(items: List[Any]):
+    """Çok sayıda nakliye kaydını tek istekte ekler"""
+    try:
+        results, inserted_docs = await bulk_insert(
+            db.nakliye_kayitlari, items, NakliyeKayitCreate, NakliyeKayit, prepare=search_fields
+        )
+        await apply_nakliye_changes(db, [(None, doc) for doc in inserted_docs])
+        for doc in inserted_docs:
+            customer_index.apply_change(None, doc)
+        return BulkInsertResponse(
+            inserted=len(inserted_docs),
+            failed=len(results) - len(inserted_docs),
+            results=results
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@api_router.post("/nakliye/bulk-delete", response_model=BulkDeleteResponse)
+async def bulk_delete_nakliye(selection: NakliyeBulkSelection):
+    """Seçilen nakliye kayıtlarını tek istekte siler"""
+    try:
+        query = selection_filter(selection, "tarih", musteri=selection.musteri)
+        deleted, failed = await bulk_delete(db.nakliye_kayitlari, query)
+        await apply_nakliye_changes(db, [(doc, None) for doc in deleted])
+        for doc in deleted:
+            customer_index.apply_change(doc, None)
+        return BulkDeleteResponse(deleted=len(deleted), failed=failed)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@api_router.post("/nakliye/bulk-update", response_model=BulkUpdateResponse)
+async def bulk_update_nakliye(request: NakliyeBulkUpdate):
+    """Seçilen nakliye kayıtlarına aynı alan değerlerini tek istekte yazar"""
+    try:
+        update_data = {k: v for k, v in request.update.dict().items() if v is not None}
+        if not update_data:
+            raise HTTPException(status_code=400, detail="Güncellenecek veri bulunamadı")
+        query = selection_filter(request, "tarih", musteri=request.musteri)
+        prepared_data = touch(prepare_for_mongo(update_data))
+        old_docs, new_docs, modified, failed = await bulk_update(db.nakliye_kayitlari, query, prepared_data)
+        await apply_nakliye_changes(db, zip(old_docs, new_docs))
+        for old_doc, new_doc in zip(old_docs, new_docs):
+            customer_index.apply_change(old_doc, new_doc)
+
+        if search_fields_changed(prepared_data):
+            # Arama tokenları belgenin diğer alanlarına da bağlı; belge başına hesaplanır
+            operations = [UpdateOne({"id": doc["id"]}, {"$set": search_fields(doc)}) for doc in new_docs]
+            for start in range(0, len(operations), BULK_CHUNK_SIZE):
+                await db.nakliye_kayitlari.bulk_write(operations[start:start + BULK_CHUNK_SIZE], ordered=False)
+        return BulkUpdateResponse(matched=len(old_docs), modified=modified, failed=failed)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @api_router.get("/nakliye", response_model=List[NakliyeKayit])
-async def get_nakliye_list(skip: int = 0, limit: int = 100):
+async def get_nakliye_list(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    year: Optional[int] = None,
+    month: Optional[int] = Query(None, ge=1, le=12),
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to")
+):
     try:
-        nakliye_kayitlari = await db.nakliye_kayitlari.find().sort("tarih", -1).skip(skip).limit(limit).to_list(limit)
-        return [NakliyeKayit(**parse_from_mongo(kayit)) for kayit in nakliye_kayitlari]
+        query = combine_filters(
+            period_filter("tarih", year, month, date_from, date_to),
+            keyset_filter("tarih", cursor)
+        )
+        nakliye_kayitlari = await db.nakliye_kayitlari.find(query).sort(
+            [("tarih", -1), ("id", -1)]
+        ).skip(skip).limit(limit).to_list(limit)
+        next_cursor = next_cursor_for(nakliye_kayitlari, "tarih", limit)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return [NakliyeKayit(**kayit) for kayit in nakliye_kayitlari]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -218,7 +670,7 @@ async def get_nakliye_by_id(nakliye_id: str):
         nakliye_kayit = await db.nakliye_kayitlari.find_one({"id": nakliye_id})
         if not nakliye_kayit:
             raise HTTPException(status_code=404, detail="Nakliye kaydı bulunamadı")
-        return NakliyeKayit(**parse_from_mongo(nakliye_kayit))
+        return NakliyeKayit(**nakliye_kayit)
     except HTTPException:
         raise
     except Exception as e:
@@ -232,19 +684,26 @@ async def update_nakliye(nakliye_id: str, input: NakliyeKayitUpdate):
         if not update_data:
             raise HTTPException(status_code=400, detail="Güncellenecek veri bulunamadı")
         
-        prepared_data = prepare_for_mongo(update_data)
-        result = await db.nakliye_kayitlari.update_one(
-            {"id": nakliye_id},
-            {"$set": prepared_data}
+        prepared_data = touch(prepare_for_mongo(update_data))
+        old_kayit = await db.nakliye_kayitlari.find_one_and_update(
+            {"$and": [{"id": nakliye_id}, unclaimed_filter()]},
+            {"$set": prepared_data},
+            return_document=ReturnDocument.BEFORE
         )
         
-        if result.matched_count == 0:
-            raise HTTPException(status_code=404, detail="Nakliye kaydı bulunamadı")
+        if old_kayit is None:
+            await raise_missing(db.nakliye_kayitlari, nakliye_id, "Nakliye kaydı bulunamadı")
         
-        updated_kayit = await db.nakliye_kayitlari.find_one({"id": nakliye_id})
-        return NakliyeKayit(**parse_from_mongo(updated_kayit))
+        updated_kayit = {**old_kayit, **prepared_data}
+        if search_fields_changed(prepared_data):
+            await db.nakliye_kayitlari.update_one({"id": nakliye_id}, {"$set": search_fields(updated_kayit)})
+        await apply_nakliye_change(db, old_kayit, updated_kayit)
+        customer_index.apply_change(old_kayit, updated_kayit)
+        return NakliyeKayit(**updated_kayit)
     except HTTPException:
         raise
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Aynı sıra no, müşteri ve irsaliye no ile kayıt zaten var")
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -252,9 +711,12 @@ async def update_nakliye(nakliye_id: str, input: NakliyeKayitUpdate):
 @api_router.delete("/nakliye/{nakliye_id}")
 async def delete_nakliye(nakliye_id: str):
     try:
-        result = await db.nakliye_kayitlari.delete_one({"id": nakliye_id})
-        if result.deleted_count == 0:
-            raise HTTPException(status_code=404, detail="Nakliye kaydı bulunamadı")
+        deleted = await db.nakliye_kayitlari.find_one_and_delete({"$and": [{"id": nakliye_id}, unclaimed_filter()]})
+        if deleted is None:
+            await raise_missing(db.nakliye_kayitlari, nakliye_id, "Nakliye kaydı bulunamadı")
+        await apply_nakliye_change(db, deleted, None)
+        customer_index.apply_change(deleted, None)
+        await record_tombstones(db, "nakliye_kayitlari", [deleted])
         return {"message": "Nakliye kaydı başarıyla silindi"}
     except HTTPException:
         raise
@@ -263,22 +725,33 @@ async def delete_nakliye(nakliye_id: str):
 
 
 @api_router.get("/nakliye/search/{query}")
-async def search_nakliye(query: str, skip: int = 0, limit: int = 100):
+async def search_nakliye(query: str, skip: int = 0, limit: int = 100, fuzzy: bool = True):
     try:
-        search_filter = {
-            "$or": [
-                {"musteri": {"$regex": query, "$options": "i"}},
-                {"sira_no": {"$regex": query, "$options": "i"}},
-                {"kod": {"$regex": query, "$options": "i"}},
-                {"irsaliye_no": {"$regex": query, "$options": "i"}}
-            ]
-        }
-        nakliye_kayitlari = await db.nakliye_kayitlari.find(search_filter).sort("tarih", -1).skip(skip).limit(limit).to_list(limit)
-        return [NakliyeKayit(**parse_from_mongo(kayit)) for kayit in nakliye_kayitlari]
+        nakliye_kayitlari = await search_records(db.nakliye_kayitlari, query, skip, limit)
+        if fuzzy and skip == 0 and len(nakliye_kayitlari) < limit:
+            # Az sonuç varsa yazım hatası toleranslı müşteri eşleşmeleriyle tamamla
+            nakliye_kayitlari += await fuzzy_search_records(
+                db.nakliye_kayitlari, customer_index, query,
+                limit - len(nakliye_kayitlari),
+                exclude_ids=[kayit["id"] for kayit in nakliye_kayitlari]
+            )
+        return [NakliyeKayit(**kayit) for kayit in nakliye_kayitlari]
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@api_router.get("/musteri/suggest")
+async def suggest_musteri(q: str, limit: int = Query(10, ge=1, le=50)):
+    """Müşteri adı otomatik tamamlama - bellek içi index, Mongo sorgusu yok"""
+    return customer_index.suggest(q, limit)
+
+
+@api_router.get("/musteri/fuzzy")
+async def fuzzy_musteri(q: str, limit: int = Query(10, ge=1, le=50)):
+    """Yazım hatalarına toleranslı müşteri adayları"""
+    return customer_index.fuzzy(q, limit)
+
+
 # ========== YATAN TUTAR ENDPOINTS ==========
 
 @api_router.post("/yatan-tutar", response_model=YatanTutar)
@@ -286,17 +759,86 @@ async def create_yatan_tutar(input: YatanTutarCreate):
     try:
         yatan_tutar_dict = input.dict()
         yatan_tutar_obj = YatanTutar(**yatan_tutar_dict)
-        prepared_data = prepare_for_mongo(yatan_tutar_obj.dict())
+        prepared_data = touch(prepare_for_mongo(yatan_tutar_obj.dict()))
         await db.yatan_tutar.insert_one(prepared_data)
+        await apply_yatan_change(db, None, prepared_data)
         return yatan_tutar_obj
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Aynı tutar ve tarihlerle yatan tutar kaydı zaten var")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.post("/yatan-tutar/bulk", response_model=BulkInsertResponse)
+async def bulk_create_yatan_tutar(items: List[Any]):
+    """Çok sayıda yatan tutar kaydını tek istekte ekler"""
+    try:
+        results, inserted_docs = await bulk_insert(db.yatan_tutar, items, YatanTutarCreate, YatanTutar)
+        await apply_yatan_changes(db, [(None, doc) for doc in inserted_docs])
+        return BulkInsertResponse(
+            inserted=len(inserted_docs),
+            failed=len(results) - len(inserted_docs),
+            results=results
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.post("/yatan-tutar/bulk-delete", response_model=BulkDeleteResponse)
+async def bulk_delete_yatan_tutar(selection: BulkSelection):
+    """Seçilen yatan tutar kayıtlarını tek istekte siler"""
+    try:
+        deleted, failed = await bulk_delete(db.yatan_tutar, selection_filter(selection, "yatan_tarih"))
+        await apply_yatan_changes(db, [(doc, None) for doc in deleted])
+        return BulkDeleteResponse(deleted=len(deleted), failed=failed)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.post("/yatan-tutar/bulk-update", response_model=BulkUpdateResponse)
+async def bulk_update_yatan_tutar(request: YatanTutarBulkUpdate):
+    """Seçilen yatan tutar kayıtlarına aynı alan değerlerini tek istekte yazar"""
+    try:
+        update_data = {k: v for k, v in request.update.dict().items() if v is not None}
+        if not update_data:
+            raise HTTPException(status_code=400, detail="Güncellenecek veri bulunamadı")
+        query = selection_filter(request, "yatan_tarih")
+        old_docs, new_docs, modified, failed = await bulk_update(
+            db.yatan_tutar, query, touch(prepare_for_mongo(update_data))
+        )
+        await apply_yatan_changes(db, zip(old_docs, new_docs))
+        return BulkUpdateResponse(matched=len(old_docs), modified=modified, failed=failed)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @api_router.get("/yatan-tutar", response_model=List[YatanTutar])
-async def get_yatan_tutar_list(skip: int = 0, limit: int = 100):
+async def get_yatan_tutar_list(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    year: Optional[int] = None,
+    month: Optional[int] = Query(None, ge=1, le=12),
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to")
+):
     try:
-        yatan_tutar_kayitlari = await db.yatan_tutar.find().sort("yatan_tarih", -1).skip(skip).limit(limit).to_list(limit)
-        return [YatanTutar(**parse_from_mongo(kayit)) for kayit in yatan_tutar_kayitlari]
+        query = combine_filters(
+            period_filter("yatan_tarih", year, month, date_from, date_to),
+            keyset_filter("yatan_tarih", cursor)
+        )
+        yatan_tutar_kayitlari = await db.yatan_tutar.find(query).sort(
+            [("yatan_tarih", -1), ("id", -1)]
+        ).skip(skip).limit(limit).to_list(limit)
+        next_cursor = next_cursor_for(yatan_tutar_kayitlari, "yatan_tarih", limit)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return [YatanTutar(**kayit) for kayit in yatan_tutar_kayitlari]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -306,7 +848,7 @@ async def get_yatan_tutar_by_id(yatan_tutar_id: str):
         yatan_tutar_kayit = await db.yatan_tutar.find_one({"id": yatan_tutar_id})
         if not yatan_tutar_kayit:
             raise HTTPException(status_code=404, detail="Yatan tutar kaydı bulunamadı")
-        return YatanTutar(**parse_from_mongo(yatan_tutar_kayit))
+        return YatanTutar(**yatan_tutar_kayit)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -318,28 +860,34 @@ async def update_yatan_tutar(yatan_tutar_id: str, input: YatanTutarUpdate):
         if not update_data:
             raise HTTPException(status_code=400, detail="Güncellenecek veri bulunamadı")
         
-        prepared_data = prepare_for_mongo(update_data)
-        result = await db.yatan_tutar.update_one(
-            {"id": yatan_tutar_id},
-            {"$set": prepared_data}
+        prepared_data = touch(prepare_for_mongo(update_data))
+        old_kayit = await db.yatan_tutar.find_one_and_update(
+            {"$and": [{"id": yatan_tutar_id}, unclaimed_filter()]},
+            {"$set": prepared_data},
+            return_document=ReturnDocument.BEFORE
         )
         
-        if result.matched_count == 0:
-            raise HTTPException(status_code=404, detail="Yatan tutar kaydı bulunamadı")
+        if old_kayit is None:
+            await raise_missing(db.yatan_tutar, yatan_tutar_id, "Yatan tutar kaydı bulunamadı")
         
-        updated_kayit = await db.yatan_tutar.find_one({"id": yatan_tutar_id})
-        return YatanTutar(**parse_from_mongo(updated_kayit))
+        updated_kayit = {**old_kayit, **prepared_data}
+        await apply_yatan_change(db, old_kayit, updated_kayit)
+        return YatanTutar(**updated_kayit)
     except HTTPException:
         raise
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Aynı tutar ve tarihlerle yatan tutar kaydı zaten var")
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @api_router.delete("/yatan-tutar/{yatan_tutar_id}")
 async def delete_yatan_tutar(yatan_tutar_id: str):
     try:
-        result = await db.yatan_tutar.delete_one({"id": yatan_tutar_id})
-        if result.deleted_count == 0:
-            raise HTTPException(status_code=404, detail="Yatan tutar kaydı bulunamadı")
+        deleted = await db.yatan_tutar.find_one_and_delete({"$and": [{"id": yatan_tutar_id}, unclaimed_filter()]})
+        if deleted is None:
+            await raise_missing(db.yatan_tutar, yatan_tutar_id, "Yatan tutar kaydı bulunamadı")
+        await apply_yatan_change(db, deleted, None)
+        await record_tombstones(db, "yatan_tutar", [deleted])
         return {"message": "Yatan tutar kaydı başarıyla silindi"}
     except HTTPException:
         raise
@@ -347,6 +895,120 @@ async def delete_yatan_tutar(yatan_tutar_id: str):
         raise HTTPException(status_code=400, detail=str(e))
 
 
+# ========== ÖZET ENDPOINTS ==========
+
+def summary_pipeline(nakliye_match: dict, yatan_match: dict):
+    """Nakliye ve yatan tutar toplamlarını tek $facet aggregation'da hesaplayan pipeline"""
+    nakliye_group = {"_id": None, "nakliye_sayisi": {"$sum": 1}}
+    for field in MONEY_FIELDS:
+        nakliye_group[field] = {"$sum": {"$ifNull": [f"${field}", 0]}}
+    yatan_group = {
+        "_id": None,
+        "yatan_sayisi": {"$sum": 1},
+        "yatan_toplam": {"$sum": {"$ifNull": ["$tutar", 0]}}
+    }
+    return [
+        {"$match": nakliye_match},
+        {"$project": {"_tur": "nakliye", "tarih": 1, **{field: 1 for field in MONEY_FIELDS}}},
+        {"$unionWith": {
+            "coll": "yatan_tutar",
+            "pipeline": [
+                {"$match": yatan_match},
+                {"$project": {"_tur": "yatan", "yatan_tarih": 1, "tutar": 1}}
+            ]
+        }},
+        {"$facet": {
+            "nakliye": [{"$match": {"_tur": "nakliye"}}, {"$group": nakliye_group}],
+            "yatan": [{"$match": {"_tur": "yatan"}}, {"$group": yatan_group}]
+        }}
+    ]
+
+
+def build_summary(nakliye_row: Optional[dict], yatan_row: Optional[dict], year=None, month=None) -> DonemOzeti:
+    ozet = DonemOzeti(year=year, month=month)
+    if nakliye_row:
+        ozet.nakliye_sayisi = nakliye_row.get("nakliye_sayisi", 0)
+        for field in MONEY_FIELDS:
+            setattr(ozet, field, round(float(nakliye_row.get(field, 0) or 0), 2))
+    if yatan_row:
+        ozet.yatan_sayisi = yatan_row.get("yatan_sayisi", 0)
+        ozet.yatan_toplam = round(float(yatan_row.get("yatan_toplam", 0) or 0), 2)
+    ozet.fark = round(ozet.toplam - ozet.yatan_toplam, 2)
+    return ozet
+
+
+def merge_rollups(rollups: List[dict]):
+    """Birden fazla ayın toplamlarını build_summary için nakliye/yatan satırlarına birleştirir"""
+    nakliye_row = {"nakliye_sayisi": 0, **{field: 0 for field in MONEY_FIELDS}}
+    yatan_row = {"yatan_sayisi": 0, "yatan_toplam": 0}
+    for doc in rollups:
+        for row in (nakliye_row, yatan_row):
+            for field in row:
+                row[field] += doc.get(field, 0) or 0
+    return nakliye_row, yatan_row
+
+
+@api_router.get("/summary", response_model=DonemOzeti)
+async def get_period_summary(
+    year: Optional[int] = None,
+    month: Optional[int] = Query(None, ge=1, le=12),
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to")
+):
+    """Dönem toplamları - tüm kayıtları indirmeden"""
+    try:
+        if month is not None and year is None:
+            raise HTTPException(status_code=400, detail="Ay filtresi için yıl gerekli")
+
+        if not date_from and not date_to:
+            # Yıl/ay özetleri aylık toplamlardan okunur
+            if month is not None:
+                query = {"_id": rollup_id(year, month)}
+            elif year is not None:
+                query = {"year": year}
+            else:
+                query = {}
+            rollups = await db[ROLLUP_COLLECTION].find(query).to_list(None)
+            return build_summary(*merge_rollups(rollups), year, month)
+
+        # Serbest tarih aralıkları için ham veri üzerinden aggregation
+
+        pipeline = summary_pipeline(
+            period_filter("tarih", year, month, date_from, date_to),
+            period_filter("yatan_tarih", year, month, date_from, date_to)
+        )
+        result = await db.nakliye_kayitlari.aggregate(pipeline).to_list(1)
+        facets = result[0] if result else {}
+        nakliye_rows = facets.get("nakliye", [])
+        yatan_rows = facets.get("yatan", [])
+        return build_summary(
+            nakliye_rows[0] if nakliye_rows else None,
+            yatan_rows[0] if yatan_rows else None,
+            year, month
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@api_router.get("/summary/yearly", response_model=YillikOzet)
+async def get_yearly_summary(year: int):
+    """Yıllık toplam ve ay ay kırılım"""
+    try:
+        rollups = await db[ROLLUP_COLLECTION].find({"year": year}).to_list(12)
+        by_month = {doc["month"]: doc for doc in rollups}
+        aylar = [
+            build_summary(by_month.get(m), by_month.get(m), year, m)
+            for m in range(1, 13)
+        ]
+        return YillikOzet(year=year, toplam=build_summary(*merge_rollups(rollups), year), aylar=aylar)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 # ========== AUTHENTICATION ENDPOINTS ==========
 
 @api_router.post("/auth/register", response_model=dict)
@@ -642,655 +1304,398 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@api_router.post("/generate-backup-download")
-async def generate_backup_download():
-    """Android için server-side yedek oluşturma - düzeltilmiş"""
+def backup_format_info(backup_format: str):
+    if backup_format not in BACKUP_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Geçersiz yedek biçimi. Desteklenenler: {', '.join(BACKUP_FORMATS)}"
+        )
+    return BACKUP_FORMATS[backup_format]
+
+
+async def prepare_backup(backup_format: str, mode: str, parent: Optional[str]):
+    """Biçimi doğrular, manifesti hazırlar ve dosya adını üretir"""
+    extension, media_type = backup_format_info(backup_format)
     try:
-        from datetime import datetime
-        import json
-        import tempfile
-        import os
-        
-        # Tüm verileri al
-        nakliye_data = await db.nakliye_kayitlari.find().to_list(length=None)
-        yatan_tutar_data = await db.yatan_tutar.find().to_list(length=None)
-        
-        # MongoDB ObjectId'leri string'e çevir
-        for item in nakliye_data:
-            if '_id' in item:
-                del item['_id']
-        
-        for item in yatan_tutar_data:
-            if '_id' in item:
-                del item['_id']
-        
-        backup_data = {
-            "timestamp": datetime.now().isoformat(),
-            "version": "2.0",
-            "nakliyeData": nakliye_data,  
-            "yatulanTutarData": yatan_tutar_data
+        manifest = await new_manifest(db, mode, parent)
+    except BackupChainError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Ad sıralaması zincir sırasını verir (geri yüklemede dosyalar ada göre sıralanır)
+    filename = f"Arkas_Yedek_{datetime.now().strftime('%Y-%m-%d_%H%M%S')}"
+    if mode == "incremental":
+        filename += "_artimli"
+    return manifest, filename + extension, media_type
+
+
+@api_router.post("/generate-backup-download")
+async def generate_backup_download(
+    backup_format: str = Query(DEFAULT_BACKUP_FORMAT, alias="format"),
+    mode: str = Query("full", pattern="^(full|incremental)$"),
+    parent: Optional[str] = None
+):
+    """Android için server-side yedek oluşturma - belgeler okundukça yanıta yazılır.
+    mode=incremental: sadece ana yedekten (varsayılan: son yedek) sonra değişenler"""
+    manifest, filename, media_type = await prepare_backup(backup_format, mode, parent)
+    return StreamingResponse(
+        iter_backup(db, backup_format, manifest=manifest),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "X-Backup-Id": manifest["backup_id"],
+            "Cache-Control": "no-cache, no-store, must-revalidate",
+            "Pragma": "no-cache",
+            "Expires": "0"
         }
-        
-        # Geçici JSON dosyası oluştur
-        filename = f"Arkas_Yedek_{datetime.now().strftime('%Y-%m-%d')}.json"
-        temp_path = f"/tmp/{filename}"
-        
-        with open(temp_path, 'w', encoding='utf-8') as f:
-            json.dump(backup_data, f, ensure_ascii=False, indent=2, default=str)
-        
-        if not os.path.exists(temp_path):
-            raise HTTPException(status_code=500, detail="Yedek dosyası oluşturulamadı")
-            
-        return FileResponse(
-            temp_path,
-            media_type='application/json',
-            filename=filename,
-            headers={
-                "Content-Disposition": f"attachment; filename={filename}",
-                "Cache-Control": "no-cache, no-store, must-revalidate",
-                "Pragma": "no-cache",
-                "Expires": "0"
-            }
+    )
+
+class RestoreStats(BaseModel):
+    added: int = 0
+    updated: int = 0
+    deleted: int = 0
+    skipped: int = 0
+    failed: int = 0
+
+
+class RestoreResponse(BaseModel):
+    nakliye: RestoreStats
+    yatan_tutar: RestoreStats
+    backup_id: Optional[str] = None
+    kind: str = "full"
+    user_info: Optional[dict] = None
+
+
+async def check_restore_chain(manifest: dict):
+    """Artımlı yedek, en son yüklenen yedeğin devamı olmalı"""
+    tip = await db[RESTORE_STATE_COLLECTION].find_one({"_id": RESTORE_TIP_ID})
+    if tip is None or tip.get("backup_id") != manifest.get("parent_id"):
+        raise HTTPException(
+            status_code=409,
+            detail=f"Bu artımlı yedek {manifest.get('parent_id')} yedeğinin devamı; önce o yedek yüklenmeli"
         )
-        
-    except Exception as e:
-        logger.error(f"Backup download hatası: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Server yedek hatası: {str(e)}")
 
-@api_router.post("/generate-pdf-download") 
-async def generate_pdf_download(request: dict):
-    """Android için server-side PDF oluşturma - basitleştirilmiş"""
+
+@api_router.post("/restore", response_model=RestoreResponse)
+async def restore_backup(request: Request, force: bool = False):
+    """Yedek dosyasını akış halinde okuyarak geri yükler.
+    Tam yedekte mevcut kayıtlar (doğal anahtara göre) atlanır; yenileri batch'ler halinde
+    eklenir. Artımlı yedekte önce silinen kayıtlar silinir, değişen kayıtlar id ile
+    son hâline getirilir. Artımlı yedekler zincir sırasıyla yüklenmelidir (force ile atlanabilir)."""
+    sections = {
+        NAKLIYE_SECTION: {
+            "collection": db.nakliye_kayitlari, "model": NakliyeKayit, "prepare": search_fields,
+            "apply": apply_nakliye_changes, "stats": RestoreStats(), "batch": [],
+        },
+        YATAN_SECTION: {
+            "collection": db.yatan_tutar, "model": YatanTutar, "prepare": None,
+            "apply": apply_yatan_changes, "stats": RestoreStats(), "batch": [],
+        },
+    }
+    by_collection = {section["collection"].name: section for section in sections.values()}
+    tombstones = []
+    manifest = None
+    user_info = None
+
+    def incremental() -> bool:
+        return bool(manifest) and manifest.get("kind") == "incremental"
+
+    def apply_to_index(section, changes):
+        if section["collection"].name == "nakliye_kayitlari":
+            for old_doc, new_doc in changes:
+                customer_index.apply_change(old_doc, new_doc)
+
+    async def flush(section):
+        batch = section["batch"]
+        section["batch"] = []
+        collection = section["collection"]
+        stats = section["stats"]
+        if incremental():
+            changes, skipped, failed = await upsert_latest(collection, batch, DEDUP_KEYS[collection.name])
+            stats.added += sum(1 for old_doc, _ in changes if old_doc is None)
+            stats.updated += sum(1 for old_doc, _ in changes if old_doc is not None)
+        else:
+            inserted, skipped, failed = await upsert_new(collection, batch, DEDUP_KEYS[collection.name])
+            changes = [(None, doc) for doc in inserted]
+            stats.added += len(inserted)
+        stats.skipped += skipped
+        stats.failed += failed
+        await section["apply"](db, changes)
+        apply_to_index(section, changes)
+
+    async def flush_tombstones():
+        groups: Dict[str, List[str]] = {}
+        for tombstone in tombstones:
+            groups.setdefault(tombstone["collection"], []).append(tombstone["id"])
+        tombstones.clear()
+        for collection_name, ids in groups.items():
+            section = by_collection[collection_name]
+            deleted, failed = await bulk_delete(section["collection"], {"id": {"$in": ids}})
+            section["stats"].deleted += len(deleted)
+            section["stats"].failed += failed
+            changes = [(doc, None) for doc in deleted]
+            await section["apply"](db, changes)
+            apply_to_index(section, changes)
+
+    async def flush_all():
+        if tombstones:
+            await flush_tombstones()
+        for section in sections.values():
+            if section["batch"]:
+                await flush(section)
+
+    seen_sections = set()
     try:
-        from datetime import datetime
-        import tempfile
-        import os
-        
-        # PDF verilerini al
-        data = request.get('data', [])
-        period = request.get('period', 'Unknown')
-        
-        if not data or len(data) == 0:
-            raise HTTPException(status_code=400, detail="PDF için veri bulunamadı")
-        
-        # Yatan tutar verilerini al
-        yatan_data = request.get('yatan_data', [])
-        
-        # Detaylı HTML tablosu oluştur - Landscape ve tüm bilgiler dahil
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <title>Arkas Lojistik - {period} Raporu</title>
-            <style>
-                body {{ font-family: Arial, sans-serif; margin: 15px; font-size: 10px; }}
-                .header {{ text-align: center; margin-bottom: 20px; }}
-                .header h1 {{ margin: 5px 0; color: #1e2563; }}
-                .header h2 {{ margin: 5px 0; color: #3b82f6; }}
-                table {{ border-collapse: collapse; width: 100%; margin-bottom: 20px; }}
-                th, td {{ border: 1px solid #333; padding: 4px; text-align: left; font-size: 9px; }}
-                th {{ background-color: #f0f0f0; font-weight: bold; }}
-                .right {{ text-align: right; }}
-                .center {{ text-align: center; }}
-                .nakliye-table th {{ background-color: #dbeafe; }}
-                .yatan-table th {{ background-color: #fdf4ff; }}
-                .summary {{ background-color: #f9fafb; padding: 10px; margin: 10px 0; border: 1px solid #d1d5db; }}
-                .footer {{ font-size: 8px; color: #666; margin-top: 20px; }}
-            </style>
-        </head>
-        <body>
-            <div class="header">
-                <h1>ARKAS LOJİSTİK</h1>
-                <h2>{period} NAKLİYE VE YATAN TUTAR RAPORU</h2>
-                <p>Rapor Tarihi: {datetime.now().strftime('%d.%m.%Y %H:%M')}</p>
-            </div>
-            
-            <h3>📦 NAKLİYE KAYITLARI</h3>
-            <table class="nakliye-table">
-                <thead>
-                    <tr>
-                        <th class="center">Sıra No</th>
-                        <th class="center">Kod</th>
-                        <th>Müşteri</th>
-                        <th class="center">İrsaliye No</th>
-                        <th class="center">Tarih</th>
-                        <th class="center">Tür</th>
-                        <th class="right">Boş Taşıma (₺)</th>
-                        <th class="right">Reefer (₺)</th>
-                        <th class="right">Bekleme (₺)</th>
-                        <th class="right">Geceleme (₺)</th>
-                        <th class="right">Pazar (₺)</th>
-                        <th class="right">Harcirah (₺)</th>
-                        <th class="right">Toplam (₺)</th>
-                        <th class="right">Sistem (₺)</th>
-                    </tr>
-                </thead>
-                <tbody>
-        """
-        
-        total_amount = 0
-        total_sistem = 0
-        for item in data:
-            toplam = float(item.get('toplam', 0))
-            sistem = float(item.get('sistem', 0))
-            total_amount += toplam
-            total_sistem += sistem
-            
-            # Tarih formatı
-            tarih_str = item.get('tarih', '')
-            if tarih_str:
-                try:
-                    tarih_obj = datetime.fromisoformat(tarih_str.replace('T', ' ').replace('Z', '+00:00'))
-                    tarih_formatted = tarih_obj.strftime('%d.%m.%Y')
-                except:
-                    tarih_formatted = tarih_str[:10] if len(tarih_str) >= 10 else tarih_str
-            else:
-                tarih_formatted = ''
-            
-            # Tür bilgileri
-            turler = []
-            if item.get('ithalat'): turler.append('İthalat')
-            if item.get('ihracat'): turler.append('İhracat')
-            if item.get('bos'): turler.append('Boş')
-            tur_str = ', '.join(turler) if turler else '-'
-            
-            html_content += f"""
-                    <tr>
-                        <td class="center">{item.get('sira_no', '')}</td>
-                        <td class="center">{item.get('kod', '') or '-'}</td>
-                        <td>{item.get('musteri', '')}</td>
-                        <td class="center">{item.get('irsaliye_no', '')}</td>
-                        <td class="center">{tarih_formatted}</td>
-                        <td class="center">{tur_str}</td>
-                        <td class="right">{float(item.get('bos_tasima', 0)):,.2f}</td>
-                        <td class="right">{float(item.get('reefer', 0)):,.2f}</td>
-                        <td class="right">{float(item.get('bekleme', 0)):,.2f}</td>
-                        <td class="right">{float(item.get('geceleme', 0)):,.2f}</td>
-                        <td class="right">{float(item.get('pazar', 0)):,.2f}</td>
-                        <td class="right">{float(item.get('harcirah', 0)):,.2f}</td>
-                        <td class="right"><strong>{toplam:,.2f}</strong></td>
-                        <td class="right"><strong>{sistem:,.2f}</strong></td>
-                    </tr>
-            """
-        
-        html_content += f"""
-                </tbody>
-                <tfoot>
-                    <tr style="font-weight: bold; background-color: #dbeafe;">
-                        <td colspan="12" class="right"><strong>NAKLİYE TOPLAMI:</strong></td>
-                        <td class="right"><strong>{total_amount:,.2f} ₺</strong></td>
-                        <td class="right"><strong>{total_sistem:,.2f} ₺</strong></td>
-                    </tr>
-                </tfoot>
-            </table>
-        """
-        
-        # Yatan Tutar tablosu ekle
-        if yatan_data and len(yatan_data) > 0:
-            total_yatan = sum(float(item.get('tutar', 0)) for item in yatan_data)
-            
-            html_content += """
-            <h3>💰 YATAN TUTAR KAYITLARI</h3>
-            <table class="yatan-table">
-                <thead>
-                    <tr>
-                        <th class="center">Yatan Tarih</th>
-                        <th class="center">Çalışma Başlangıç</th>
-                        <th class="center">Çalışma Bitiş</th>
-                        <th class="right">Yatan Tutar (₺)</th>
-                        <th>Açıklama</th>
-                    </tr>
-                </thead>
-                <tbody>
-            """
-            
-            for item in yatan_data:
-                tutar = float(item.get('tutar', 0))
-                
-                # Tarih formatları
-                yatan_tarih = item.get('yatan_tarih', '')
-                if yatan_tarih:
-                    try:
-                        yatan_tarih = datetime.fromisoformat(yatan_tarih.replace('T', ' ').replace('Z', '+00:00')).strftime('%d.%m.%Y')
-                    except:
-                        yatan_tarih = yatan_tarih[:10] if len(yatan_tarih) >= 10 else yatan_tarih
-                
-                baslangic_tarih = item.get('baslangic_tarih', '')
-                if baslangic_tarih:
-                    try:
-                        baslangic_tarih = datetime.fromisoformat(baslangic_tarih.replace('T', ' ').replace('Z', '+00:00')).strftime('%d.%m.%Y')
-                    except:
-                        baslangic_tarih = baslangic_tarih[:10] if len(baslangic_tarih) >= 10 else baslangic_tarih
-                
-                bitis_tarih = item.get('bitis_tarih', '')
-                if bitis_tarih:
-                    try:
-                        bitis_tarih = datetime.fromisoformat(bitis_tarih.replace('T', ' ').replace('Z', '+00:00')).strftime('%d.%m.%Y')
-                    except:
-                        bitis_tarih = bitis_tarih[:10] if len(bitis_tarih) >= 10 else bitis_tarih
-                
-                aciklama = item.get('aciklama', '') or '-'
-                
-                html_content += f"""
-                        <tr>
-                            <td class="center">{yatan_tarih}</td>
-                            <td class="center">{baslangic_tarih}</td>
-                            <td class="center">{bitis_tarih}</td>
-                            <td class="right"><strong>{tutar:,.2f}</strong></td>
-                            <td>{aciklama}</td>
-                        </tr>
-                """
-            
-            html_content += f"""
-                </tbody>
-                <tfoot>
-                    <tr style="font-weight: bold; background-color: #fdf4ff;">
-                        <td colspan="3" class="right"><strong>YATAN TUTAR TOPLAMI:</strong></td>
-                        <td class="right"><strong>{total_yatan:,.2f} ₺</strong></td>
-                        <td></td>
-                    </tr>
-                </tfoot>
-            </table>
-            """
-        
-        # Özet Bölümü
-        html_content += f"""
-            <div class="summary">
-                <h3>📊 DÖNEM ÖZETİ</h3>
-                <div style="display: flex; justify-content: space-between;">
-                    <div>
-                        <p><strong>Nakliye Kayıt Sayısı:</strong> {len(data)} adet</p>
-                        <p><strong>Nakliye Toplam Tutarı:</strong> {total_amount:,.2f} ₺</p>
-                        <p><strong>Sistem Toplam Tutarı:</strong> {total_sistem:,.2f} ₺</p>
-                    </div>"""
-        
-        if yatan_data and len(yatan_data) > 0:
-            total_yatan = sum(float(item.get('tutar', 0)) for item in yatan_data)
-            html_content += f"""
-                    <div>
-                        <p><strong>Yatan Tutar Kayıt Sayısı:</strong> {len(yatan_data)} adet</p>
-                        <p><strong>Toplam Yatan Tutar:</strong> {total_yatan:,.2f} ₺</p>
-                        <p><strong>Fark (Nakliye - Yatan):</strong> {(total_amount - total_yatan):,.2f} ₺</p>
-                    </div>"""
-        
-        html_content += f"""
-                </div>
-            </div>
-            
-            <div class="footer">
-                <p><strong>Rapor Detayları:</strong></p>
-                <p>• Oluşturulma Tarihi: {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}</p>
-                <p>• Rapor Dönemi: {period}</p>
-                <p>• Sistem: Arkas Lojistik Nakliye Takip Sistemi</p>
-            </div>
-        </body>
-        </html>
-        """
-        
-        # ReportLab ile PDF oluştur
-        pdf_filename = f"Arkas_Lojistik_{period}_Raporu.pdf"
-        pdf_path = f"/tmp/{pdf_filename}"
-        
-        # PDF oluşturma fonksiyonu
-        doc = SimpleDocTemplate(pdf_path, pagesize=landscape(A4))
-        elements = []
-        
-        # Türkçe font desteği için 
-        from reportlab.pdfbase.pdfmetrics import registerFont
-        from reportlab.pdfbase.ttfonts import TTFont
-        from reportlab.lib.fonts import addMapping
-        
-        # Türkçe karakterler için DejaVu font'u kaydet
-        try:
-            registerFont(TTFont('DejaVuSans', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'))
-            registerFont(TTFont('DejaVuSans-Bold', '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf'))
-            turkish_font = 'DejaVuSans'
-            turkish_font_bold = 'DejaVuSans-Bold'
-        except:
-            # Fallback to default fonts
-            turkish_font = 'Helvetica'
-            turkish_font_bold = 'Helvetica-Bold'
-        
-        # Stil tanımlamaları
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'TitleStyle',
-            parent=styles['Heading1'],
-            fontSize=16,
-            alignment=1,  # Center
-            spaceAfter=20,
-            fontName=turkish_font_bold
+        async for kind, key, value in iter_backup_events(request.stream()):
+            if kind == "meta":
+                if key == "userInfo" and isinstance(value, dict):
+                    user_info = value
+                elif key == "manifest" and isinstance(value, dict):
+                    manifest = value
+                continue
+            if kind == "section":
+                if not seen_sections and incremental() and not force:
+                    await check_restore_chain(manifest)
+                seen_sections.add(key)
+                # Silmeler kayıtlardan önce uygulanır; bölüm değişirken bekleyenler yazılır
+                await flush_all()
+                continue
+            if key == DELETED_SECTION:
+                if not incremental() or not isinstance(value, dict) or \
+                        value.get("collection") not in by_collection or not isinstance(value.get("id"), str):
+                    continue
+                tombstones.append(value)
+                if len(tombstones) >= RESTORE_BATCH_SIZE:
+                    await flush_tombstones()
+                continue
+            section = sections[key]
+            try:
+                doc = touch(prepare_for_mongo(section["model"](**value).dict()))
+            except (ValidationError, TypeError):
+                section["stats"].failed += 1
+                continue
+            if section["prepare"]:
+                doc.update(section["prepare"](doc))
+            section["batch"].append(doc)
+            if len(section["batch"]) >= RESTORE_BATCH_SIZE:
+                await flush(section)
+        await flush_all()
+    except BackupParseError as e:
+        # Bozuk dosyada o ana kadar okunan kayıtlar eklenmiş olabilir; tekrar yükleme güvenlidir
+        logger.error(f"Geri yükleme hatası: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not seen_sections:
+        raise HTTPException(status_code=400, detail="Geçersiz yedek dosyası: kayıt listesi bulunamadı")
+
+    if manifest and manifest.get("backup_id"):
+        await db[RESTORE_STATE_COLLECTION].update_one(
+            {"_id": RESTORE_TIP_ID},
+            {"$set": {"backup_id": manifest["backup_id"], "restored_at": datetime.now(timezone.utc)}},
+            upsert=True
         )
-        
-        # Başlık
-        title = Paragraph(f"ARKAS LOJİSTİK - {period} RAPORU", title_style)
-        elements.append(title)
-        elements.append(Spacer(1, 20))
-        
-        # Nakliye tablosu verilerini hazırla
-        nakliye_data = [['Sıra No', 'Kod', 'Müşteri', 'İrsaliye No', 'Tarih', 'Tür', 'Boş Taşıma', 'Reefer', 'Bekleme', 'Geceleme', 'Pazar', 'Harcirah', 'Toplam', 'Sistem']]
-        
-        total_amount = 0
-        total_sistem = 0
-        
-        for item in data:
-            toplam = float(item.get('toplam', 0))
-            sistem = float(item.get('sistem', 0))
-            total_amount += toplam
-            total_sistem += sistem
-            
-            # Tarih formatı
-            tarih_str = item.get('tarih', '')
-            if tarih_str:
-                try:
-                    tarih_obj = datetime.fromisoformat(tarih_str.replace('T', ' ').replace('Z', '+00:00'))
-                    tarih_formatted = tarih_obj.strftime('%d.%m.%Y')
-                except:
-                    tarih_formatted = tarih_str[:10] if len(tarih_str) >= 10 else tarih_str
-            else:
-                tarih_formatted = ''
-            
-            # Tür bilgileri
-            turler = []
-            if item.get('ithalat'): turler.append('İthalat')
-            if item.get('ihracat'): turler.append('İhracat')
-            if item.get('bos'): turler.append('Boş')
-            tur_str = ', '.join(turler) if turler else '-'
-            
-            nakliye_data.append([
-                item.get('sira_no', ''),
-                item.get('kod', '') or '-',
-                item.get('musteri', ''),
-                item.get('irsaliye_no', ''),
-                tarih_formatted,
-                tur_str,
-                f"{float(item.get('bos_tasima', 0)):,.2f}",
-                f"{float(item.get('reefer', 0)):,.2f}",
-                f"{float(item.get('bekleme', 0)):,.2f}",
-                f"{float(item.get('geceleme', 0)):,.2f}",
-                f"{float(item.get('pazar', 0)):,.2f}",
-                f"{float(item.get('harcirah', 0)):,.2f}",
-                f"{toplam:,.2f}",
-                f"{sistem:,.2f}"
-            ])
-        
-        # Toplam satırı ekle
-        nakliye_data.append(['', '', '', '', '', '', '', '', '', '', '', 'TOPLAM:', f"{total_amount:,.2f}", f"{total_sistem:,.2f}"])
-        
-        # Nakliye tablosu oluştur
-        nakliye_table = Table(nakliye_data)
-        nakliye_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.lightblue),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), turkish_font_bold),
-            ('FONTNAME', (0, 1), (-1, -2), turkish_font),
-            ('FONTSIZE', (0, 0), (-1, 0), 8),
-            ('FONTSIZE', (0, 1), (-1, -1), 7),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -2), colors.beige),
-            ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
-            ('FONTNAME', (0, -1), (-1, -1), turkish_font_bold),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        elements.append(nakliye_table)
-        
-        # Yatan tutar bölümü (eğer varsa)
-        if yatan_data and len(yatan_data) > 0:
-            elements.append(Spacer(1, 20))
-            yatan_title_style = ParagraphStyle(
-                'YatanTitleStyle',
-                parent=styles['Heading2'],
-                fontName=turkish_font_bold
-            )
-            yatan_title = Paragraph("YATAN TUTAR KAYITLARI", yatan_title_style)
-            elements.append(yatan_title)
-            elements.append(Spacer(1, 10))
-            
-            yatan_table_data = [['Yatan Tarih', 'Çalışma Başlangıç', 'Çalışma Bitiş', 'Yatan Tutar', 'Açıklama']]
-            total_yatan = 0
-            
-            for item in yatan_data:
-                tutar = float(item.get('tutar', 0))
-                total_yatan += tutar
-                
-                # Tarih formatları
-                yatan_tarih = item.get('yatan_tarih', '')
-                if yatan_tarih:
-                    try:
-                        yatan_tarih = datetime.fromisoformat(yatan_tarih.replace('T', ' ').replace('Z', '+00:00')).strftime('%d.%m.%Y')
-                    except:
-                        yatan_tarih = yatan_tarih[:10] if len(yatan_tarih) >= 10 else yatan_tarih
-                
-                baslangic_tarih = item.get('baslangic_tarih', '')
-                if baslangic_tarih:
-                    try:
-                        baslangic_tarih = datetime.fromisoformat(baslangic_tarih.replace('T', ' ').replace('Z', '+00:00')).strftime('%d.%m.%Y')
-                    except:
-                        baslangic_tarih = baslangic_tarih[:10] if len(baslangic_tarih) >= 10 else baslangic_tarih
-                
-                bitis_tarih = item.get('bitis_tarih', '')
-                if bitis_tarih:
-                    try:
-                        bitis_tarih = datetime.fromisoformat(bitis_tarih.replace('T', ' ').replace('Z', '+00:00')).strftime('%d.%m.%Y')
-                    except:
-                        bitis_tarih = bitis_tarih[:10] if len(bitis_tarih) >= 10 else bitis_tarih
-                
-                yatan_table_data.append([
-                    yatan_tarih,
-                    baslangic_tarih,
-                    bitis_tarih,
-                    f"{tutar:,.2f}",
-                    item.get('aciklama', '') or '-'
-                ])
-            
-            yatan_table_data.append(['', '', 'TOPLAM:', f"{total_yatan:,.2f}", ''])
-            
-            yatan_table = Table(yatan_table_data)
-            yatan_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.lightcoral),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), turkish_font_bold),
-                ('FONTNAME', (0, 1), (-1, -2), turkish_font),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('FONTSIZE', (0, 1), (-1, -1), 9),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -2), colors.white),
-                ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
-                ('FONTNAME', (0, -1), (-1, -1), turkish_font_bold),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            
-            elements.append(yatan_table)
-        
-        # PDF'i oluştur
-        doc.build(elements)
-        
-        return FileResponse(
-            pdf_path,
-            media_type='application/pdf',
-            filename=pdf_filename,
-            headers={
-                "Content-Disposition": f"attachment; filename={pdf_filename}",
-                "Cache-Control": "no-cache, no-store, must-revalidate",
-                "Pragma": "no-cache", 
-                "Expires": "0"
-            }
+
+    result = RestoreResponse(
+        nakliye=sections[NAKLIYE_SECTION]["stats"],
+        yatan_tutar=sections[YATAN_SECTION]["stats"],
+        backup_id=(manifest or {}).get("backup_id"),
+        kind="incremental" if incremental() else "full",
+        user_info=user_info
+    )
+    logger.info(f"Geri yükleme tamamlandı: {result.dict(exclude={'user_info'})}")
+    return result
+
+class ReportRequest(BaseModel):
+    """Rapor isteği: sadece dönem (yıl/ay veya from/to); kayıtlar veritabanından okunur"""
+    kind: str = Field("detailed", pattern="^(detailed|summary)$")
+    report_format: str = Field("pdf", alias="format", pattern="^(pdf|csv|xlsx)$")
+    year: Optional[int] = None
+    month: Optional[int] = Field(None, ge=1, le=12)
+    date_from: Optional[str] = Field(None, alias="from")
+    date_to: Optional[str] = Field(None, alias="to")
+    # Dosya adı/başlık için etiket; verilmezse dönemden üretilir
+    period: Optional[str] = None
+    # Eski istemciler (yüklü Android sürümleri) satırları gövdede gönderir;
+    # geçiş süresince sadece generate-pdf-* endpoint'lerinde kabul edilir
+    data: Optional[List[dict]] = None
+    yatan_data: Optional[List[dict]] = None
+
+    def has_period(self) -> bool:
+        return self.year is not None or bool(self.date_from) or bool(self.date_to)
+
+
+def report_params(request: ReportRequest, kind: Optional[str] = None, report_format: Optional[str] = None) -> dict:
+    """İsteği doğrular ve rapor işinin parametrelerine çevirir"""
+    if not request.has_period():
+        raise HTTPException(status_code=400, detail="Rapor dönemi gerekli (yıl/ay veya from/to)")
+    # Geçersiz dönemler iş kuyruğa girmeden reddedilir
+    period_bounds(request.year, request.month, request.date_from, request.date_to)
+    return {
+        "kind": kind or request.kind,
+        "format": report_format or request.report_format,
+        "period": request.period or period_label(request.year, request.month, request.date_from, request.date_to),
+        "year": request.year,
+        "month": request.month,
+        "date_from": request.date_from,
+        "date_to": request.date_to,
+    }
+
+
+async def report_fingerprints(params: dict) -> List[dict]:
+    """Raporda kullanılan koleksiyonların dönem bazlı veri sürümü"""
+    period = (params["year"], params["month"], params["date_from"], params["date_to"])
+    fingerprints = [
+        await period_fingerprint(db.nakliye_kayitlari, "tarih", period_filter("tarih", *period))
+    ]
+    if params["kind"] == "detailed":
+        fingerprints.append(
+            await period_fingerprint(db.yatan_tutar, "yatan_tarih", period_filter("yatan_tarih", *period))
         )
+    return fingerprints
+
+
+async def fetch_report_rows(params: dict):
+    """Dönemin nakliye (ve detaylı raporda yatan tutar) kayıtlarını sadece basılan alanlarla okur"""
+    period = (params["year"], params["month"], params["date_from"], params["date_to"])
+    data = await db.nakliye_kayitlari.find(
+        period_filter("tarih", *period), nakliye_projection(params["kind"])
+    ).sort([("tarih", -1), ("id", -1)]).to_list(None)
+    yatan_data = []
+    if params["kind"] == "detailed":
+        yatan_data = await db.yatan_tutar.find(
+            period_filter("yatan_tarih", *period), YATAN_PROJECTION
+        ).sort([("yatan_tarih", -1), ("id", -1)]).to_list(None)
+    return data, yatan_data
+
+
+async def render_report_artifact(params: dict):
+    """Dönemin raporunu döndürür; veri değişmediyse önbellekteki dosya kullanılır"""
+    fingerprints = await report_fingerprints(params)
+    if fingerprints[0]["count"] == 0:
+        raise HTTPException(status_code=400, detail="Rapor için veri bulunamadı")
+    key = cache_key(params, fingerprints)
+    info = await artifact_store.cached(key)
+    if info is not None:
+        return info
+
+    # Aynı rapor bu süreçte zaten çiziliyorsa onun sonucu beklenir
+    render = report_renders.get(key)
+    if render is None:
+        render = asyncio.ensure_future(render_report_rows(params, key))
+        report_renders[key] = render
+        render.add_done_callback(lambda _: report_renders.pop(key, None))
+    return await asyncio.shield(render)
+
+
+async def render_report_rows(params: dict, key: str):
+    data, yatan_data = await fetch_report_rows(params)
+    if not data:
+        raise HTTPException(status_code=400, detail="Rapor için veri bulunamadı")
+    return await render_report_file(params["period"], data, yatan_data, params["kind"], params["format"], key)
+
+
+async def render_report_file(period: str, data: List[dict], yatan_data: Optional[List[dict]], kind: str,
+                             report_format: str = "pdf", key: Optional[str] = None):
+    """Raporu havuzda üretip artifact deposuna ekler; `key` verilirse önbellek anahtarına bağlar"""
+    media_type, extension = REPORT_FORMATS[report_format]
+    filename = f"Arkas_Lojistik_{period}_Raporu{extension}"
+    # Kimlik her üretimde rastgele: eş zamanlı üretimler aynı dosyaya/GridFS kaydına yazmaz
+    file_id = artifact_store.new_id(f"Arkas_{report_format.upper()}", extension)
+    try:
+        await report_pool.render(artifact_store.staging_path(file_id), period, data, yatan_data, kind,
+                                 report_format)
+    except BaseException as e:
+        await artifact_store.discard(file_id)
+        if isinstance(e, ReportPoolBusy):
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "10"})
+        if isinstance(e, ReportTimeout):
+            raise HTTPException(status_code=504, detail=str(e))
+        raise
+    return await artifact_store.commit(file_id, filename, media_type, key=key)
+
+
+async def pdf_artifact(request: ReportRequest, kind: str):
+    """generate-pdf-* istekleri: dönem verildiyse veritabanından (önbellekli), dönem yok
+    ama satırlar gövdedeyse eski sözleşmeyle gönderilen satırlardan üretir"""
+    if request.data is None or request.has_period():
+        return await render_report_artifact(report_params(request, kind, "pdf"))
+    logger.warning("Eski PDF isteği (satırlar gövdede); istemci dönem parametreleriyle güncellenmeli")
+    if not request.data:
+        raise HTTPException(status_code=400, detail="PDF için veri bulunamadı")
+    return await render_report_file(request.period or "Unknown", request.data, request.yatan_data or [], kind)
+
+
+@api_router.post("/generate-pdf-download") 
+async def generate_pdf_download(request: ReportRequest):
+    """Android için server-side PDF oluşturma - dönemin kayıtları veritabanından okunur"""
+    try:
+        info = await pdf_artifact(request, "detailed")
+        return artifact_response(info)
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"PDF generation hatası: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Server PDF hatası: {str(e)}")
 
-@api_router.get("/download-temp/{file_id}")
+def content_disposition(filename: str) -> str:
+    """Türkçe karakterli dosya adları için RFC 6266 uyumlu başlık"""
+    fallback = filename.encode("ascii", "replace").decode("ascii").replace("?", "_").replace('"', "_")
+    if fallback == filename:
+        return f'attachment; filename="{filename}"'
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename)}"
+
+def artifact_response(info) -> Response:
+    """Depodaki artifact'ı indirme yanıtı olarak döndürür (Range/ETag destekli)"""
+    return ArtifactResponse(info, artifact_store, headers={"Content-Disposition": content_disposition(info.filename)})
+
+@api_router.api_route("/download-temp/{file_id}", methods=["GET", "HEAD"])
 async def download_temp_file(file_id: str):
     """Geçici dosya indirme endpoint'i - QR kod için"""
+    info = await artifact_store.get(file_id)
+    if info is None:
+        raise HTTPException(status_code=404, detail="Dosya bulunamadı veya süresi dolmuş")
+    return artifact_response(info)
+
+def artifact_urls(file_id: str) -> Dict[str, str]:
+    """QR yanıtlarındaki indirme ve QR görseli linkleri"""
+    return {
+        "download_url": f"{BACKEND_URL}/api/download-temp/{file_id}",
+        "qr_url": f"{BACKEND_URL}/api/qr/{file_id}.png",
+        "qr_svg_url": f"{BACKEND_URL}/api/qr/{file_id}.svg",
+    }
+
+@api_router.get("/qr/{name}")
+async def artifact_qr(name: str, size: int = Query(DEFAULT_QR_SIZE, ge=MIN_QR_SIZE, le=MAX_QR_SIZE)):
+    """Artifact indirme linkinin QR kodu (`{file_id}.png` veya `{file_id}.svg`)"""
     try:
-        import os
-        
-        # Geçici dosya yolunu kontrol et
-        temp_path = f"/tmp/{file_id}"
-        logger.info(f"Download request for file: {file_id}, path: {temp_path}")
-        logger.info(f"File exists: {os.path.exists(temp_path)}")
-        
-        if not os.path.exists(temp_path):
-            logger.error(f"File not found: {temp_path}")
-            raise HTTPException(status_code=404, detail="Dosya bulunamadı veya süresi dolmuş")
-        
-        # Dosya tipini belirle
-        if file_id.endswith('.pdf'):
-            media_type = 'application/pdf'
-        elif file_id.endswith('.json'):
-            media_type = 'application/json'
-        else:
-            media_type = 'application/octet-stream'
-        
-        return FileResponse(
-            temp_path,
-            media_type=media_type,
-            filename=file_id,
-            headers={
-                "Content-Disposition": f"attachment; filename={file_id}",
-                "Cache-Control": "no-cache, no-store, must-revalidate",
-                "Pragma": "no-cache",
-                "Expires": "0"
-            }
-        )
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Geçici dosya indirme hatası: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Dosya indirme hatası: {str(e)}")
+        file_id, fmt = split_qr_name(name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    info = await artifact_store.get(file_id)
+    if info is None:
+        raise HTTPException(status_code=404, detail="Dosya bulunamadı veya süresi dolmuş")
+    # Önbellekte yoksa çizim thread'de yapılır
+    image = await asyncio.to_thread(render_qr, artifact_urls(file_id)["download_url"], size, fmt)
+    remaining = max(int((info.expires_at - datetime.now(timezone.utc)).total_seconds()), 0)
+    return Response(
+        content=image,
+        media_type=QR_FORMATS[fmt],
+        headers={"Cache-Control": f"private, max-age={remaining}, immutable"}
+    )
 
 @api_router.post("/generate-pdf-qr")
-async def generate_pdf_qr(request: dict):
+async def generate_pdf_qr(request: ReportRequest):
     """Android QR kod için PDF oluşturma - geçici URL döndürür"""
     try:
-        from datetime import datetime
-        import uuid
-        import os
-        
-        # PDF verilerini al
-        data = request.get('data', [])
-        period = request.get('period', 'Unknown')
-        
-        if not data or len(data) == 0:
-            raise HTTPException(status_code=400, detail="PDF için veri bulunamadı")
-        
-        # Benzersiz dosya ID'si oluştur
-        file_id = f"Arkas_PDF_{uuid.uuid4().hex[:8]}.pdf"
-        
-        # ReportLab ile PDF oluştur
-        pdf_path = f"/tmp/{file_id}"
-        
-        # PDF oluşturma fonksiyonu
-        doc = SimpleDocTemplate(pdf_path, pagesize=landscape(A4))
-        elements = []
+        info = await pdf_artifact(request, "summary")
         
-        # Türkçe font desteği için 
-        from reportlab.pdfbase.pdfmetrics import registerFont
-        from reportlab.pdfbase.ttfonts import TTFont
-        from reportlab.lib.fonts import addMapping
-        
-        # Türkçe karakterler için DejaVu font'u kaydet
-        try:
-            registerFont(TTFont('DejaVuSans', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'))
-            registerFont(TTFont('DejaVuSans-Bold', '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf'))
-            turkish_font = 'DejaVuSans'
-            turkish_font_bold = 'DejaVuSans-Bold'
-        except:
-            # Fallback to default fonts
-            turkish_font = 'Helvetica'
-            turkish_font_bold = 'Helvetica-Bold'
-        
-        # Stil tanımlamaları
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'TitleStyle',
-            parent=styles['Heading1'],
-            fontSize=16,
-            alignment=1,  # Center
-            spaceAfter=20,
-            fontName=turkish_font_bold
-        )
-        
-        # Başlık
-        title = Paragraph(f"ARKAS LOJİSTİK - {period} RAPORU", title_style)
-        elements.append(title)
-        elements.append(Spacer(1, 20))
-        
-        # Tablo verilerini hazırla
-        table_data = [['Sıra No', 'Müşteri', 'İrsaliye No', 'Tarih', 'Toplam (₺)', 'Sistem (₺)']]
-        
-        total_amount = 0
-        total_sistem = 0
-        
-        for item in data:
-            toplam = float(item.get('toplam', 0))
-            sistem = float(item.get('sistem', 0))
-            total_amount += toplam
-            total_sistem += sistem
-            
-            # Tarih formatı
-            tarih_str = item.get('tarih', '')
-            if tarih_str:
-                try:
-                    tarih_obj = datetime.fromisoformat(tarih_str.replace('T', ' ').replace('Z', '+00:00'))
-                    tarih_formatted = tarih_obj.strftime('%d.%m.%Y')
-                except:
-                    tarih_formatted = tarih_str[:10] if len(tarih_str) >= 10 else tarih_str
-            else:
-                tarih_formatted = ''
-            
-            table_data.append([
-                item.get('sira_no', ''),
-                item.get('musteri', ''),
-                item.get('irsaliye_no', ''),
-                tarih_formatted,
-                f"{toplam:,.2f}",
-                f"{sistem:,.2f}"
-            ])
-        
-        # Toplam satırı ekle
-        table_data.append(['', '', '', 'TOPLAM:', f"{total_amount:,.2f}", f"{total_sistem:,.2f}"])
-        
-        # Tablo oluştur
-        table = Table(table_data)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.lightblue),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), turkish_font_bold),
-            ('FONTNAME', (0, 1), (-1, -2), turkish_font),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('FONTSIZE', (0, 1), (-1, -1), 9),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -2), colors.beige),
-            ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
-            ('FONTNAME', (0, -1), (-1, -1), turkish_font_bold),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        elements.append(table)
-        
-        # PDF'i oluştur
-        doc.build(elements)
-        
-        if os.path.exists(pdf_path):
-            # İndirme URL'ini döndür
-            download_url = f"{BACKEND_URL}/api/download-temp/{file_id}"
-            
-            return {
-                "success": True,
-                "download_url": download_url,
-                "file_id": file_id,
-                "filename": f"Arkas_Lojistik_{period}_Raporu.pdf"
-            }
-        else:
-            raise HTTPException(status_code=500, detail="PDF dosyası oluşturulamadı")
+        # İndirme ve QR görseli URL'lerini döndür
+        return {
+            "success": True,
+            **artifact_urls(info.id),
+            "file_id": info.id,
+            "filename": info.filename,
+            "expires_at": info.expires_at.isoformat()
+        }
             
     except HTTPException:
         raise
@@ -1298,51 +1703,94 @@ async def generate_pdf_qr(request: dict):
         logger.error(f"QR PDF generation hatası: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Server PDF QR hatası: {str(e)}")
 
+class ReportJobResponse(BaseModel):
+    id: str
+    status: str
+    progress: int
+    position: int = 0
+    kind: str
+    report_format: str = Field("pdf", serialization_alias="format")
+    period: str
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    file_id: Optional[str] = None
+    filename: Optional[str] = None
+    download_url: Optional[str] = None
+    qr_url: Optional[str] = None
+    qr_svg_url: Optional[str] = None
+    expires_at: Optional[datetime] = None
+
+
+async def run_report_job(params: dict):
+    return await render_report_artifact(params)
+
+# Rapor işleri; biten işler artifact süresi kadar sorgulanabilir
+report_jobs = queue_from_env(run_report_job, int(artifact_store.ttl.total_seconds()))
+
+def report_job_response(job) -> ReportJobResponse:
+    response = ReportJobResponse(
+        id=job.id,
+        status=job.status,
+        progress=job.progress,
+        position=report_jobs.position(job),
+        kind=job.params["kind"],
+        report_format=job.params["format"],
+        period=job.params["period"],
+        created_at=job.created_at,
+        finished_at=job.finished_at,
+        error=job.error
+    )
+    if job.result is not None:
+        response.file_id = job.result.id
+        response.filename = job.result.filename
+        response.expires_at = job.result.expires_at
+        for field, url in artifact_urls(job.result.id).items():
+            setattr(response, field, url)
+    return response
+
+@api_router.post("/reports", response_model=ReportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_report_job(request: ReportRequest):
+    """Rapor işini kuyruğa ekler ve hemen döner; durum GET /reports/{id} ile izlenir"""
+    try:
+        job = report_jobs.submit(report_params(request))
+    except ReportQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "10"})
+    return report_job_response(job)
+
+@api_router.get("/reports/{job_id}", response_model=ReportJobResponse)
+async def get_report_job(job_id: str):
+    job = report_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Rapor işi bulunamadı veya süresi dolmuş")
+    return report_job_response(job)
+
 @api_router.post("/generate-backup-qr")
-async def generate_backup_qr():
+async def generate_backup_qr(
+    backup_format: str = Query(DEFAULT_BACKUP_FORMAT, alias="format"),
+    mode: str = Query("full", pattern="^(full|incremental)$"),
+    parent: Optional[str] = None
+):
     """Android QR kod için yedek oluşturma - geçici URL döndürür"""
+    manifest, filename, media_type = await prepare_backup(backup_format, mode, parent)
     try:
-        import uuid
-        import json
-        from datetime import datetime
-        
         # Benzersiz dosya ID'si oluştur
-        file_id = f"Arkas_Yedek_{uuid.uuid4().hex[:8]}.json"
-        
-        # Tüm verileri al
-        nakliye_data = await db.nakliye_kayitlari.find().to_list(length=None)
-        yatan_tutar_data = await db.yatan_tutar.find().to_list(length=None)
-        
-        # MongoDB ObjectId'leri string'e çevir
-        for item in nakliye_data:
-            if '_id' in item:
-                del item['_id']
+        stem, extension = filename.split(".", 1)
+        file_id = artifact_store.new_id(stem, f".{extension}")
         
-        for item in yatan_tutar_data:
-            if '_id' in item:
-                del item['_id']
-        
-        backup_data = {
-            "timestamp": datetime.now().isoformat(),
-            "version": "2.0",
-            "nakliyeData": nakliye_data,
-            "yatulanTutarData": yatan_tutar_data
-        }
-        
-        # JSON dosyası oluştur
-        json_path = f"/tmp/{file_id}"
-        
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(backup_data, f, ensure_ascii=False, indent=2, default=str)
-        
-        # İndirme URL'ini döndür
-        download_url = f"{BACKEND_URL}/api/download-temp/{file_id}"
+        # Yedek dosyası oluştur (batch'ler halinde, event loop'u bloklamadan)
+        backup_path = artifact_store.staging_path(file_id)
+        await write_backup_file(db, backup_path, backup_format, manifest=manifest)
+        info = await artifact_store.commit(file_id, filename, media_type)
         
+        # İndirme ve QR görseli URL'lerini döndür
         return {
             "success": True,
-            "download_url": download_url,
+            **artifact_urls(file_id),
             "file_id": file_id,
-            "filename": file_id
+            "filename": filename,
+            "backup_id": manifest["backup_id"],
+            "expires_at": info.expires_at.isoformat()
         }
         
     except Exception as e:
@@ -1358,8 +1806,33 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Backup-Id", "Content-Disposition"],
 )
 
+@app.on_event("startup")
+async def startup_indexes():
+    await ensure_indexes(db)
+    await artifact_store.start()
+    # Rapor süreçleri font, stil ve logo yüklü olarak başlatılır
+    await report_pool.start()
+    report_jobs.start()
+    await ensure_rollups(db)
+    # Eski kayıtların arama alanları istekleri bekletmeden arka planda doldurulur
+    app.state.search_backfill = asyncio.create_task(backfill_search_fields(db.nakliye_kayitlari))
+    try:
+        await customer_index.load(db.nakliye_kayitlari)
+    except Exception as e:
+        logger.error(f"Müşteri indexi yüklenemedi: {str(e)}")
+    app.state.customer_refresh = asyncio.create_task(customer_index.refresh_forever(db.nakliye_kayitlari))
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    # Başlatma yarıda kaldıysa arka plan görevleri hiç oluşturulmamış olabilir
+    for name in ("search_backfill", "customer_refresh"):
+        task = getattr(app.state, name, None)
+        if task is not None:
+            task.cancel()
+    await artifact_store.stop()
+    await report_jobs.stop()
+    await report_pool.stop()
     client.close()
\ No newline at end of file
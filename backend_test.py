@@ -846,27 +846,35 @@ class ComprehensiveCrossPlatformAPITester:
         
         # Test PDF QR code generation
         print("\n📄 PDF QR Code Generation Test")
-        pdf_test_data = {
-            "data": [
-                {
-                    "sira_no": "QR001",
-                    "musteri": "QR Test Müşteri",
-                    "tarih": "2024-01-01",
-                    "toplam": 1000.50,
-                    "sistem": 950.25,
-                    "irsaliye_no": "QR-TEST-001"
-                },
-                {
-                    "sira_no": "QR002", 
-                    "musteri": "QR Test Müşteri 2",
-                    "tarih": "2024-01-02",
-                    "toplam": 2500.75,
-                    "sistem": 2400.00,
-                    "irsaliye_no": "QR-TEST-002"
-                }
-            ],
-            "period": "QR_Test_2024"
-        }
+        # The PDF is requested by period; records are created first and read from the database
+        qr_records = [
+            {
+                "sira_no": "QR001",
+                "musteri": "QR Test Müşteri",
+                "tarih": "2024-01-01",
+                "toplam": 1000.50,
+                "sistem": 950.25,
+                "irsaliye_no": "QR-TEST-001"
+            },
+            {
+                "sira_no": "QR002", 
+                "musteri": "QR Test Müşteri 2",
+                "tarih": "2024-01-02",
+                "toplam": 2500.75,
+                "sistem": 2400.00,
+                "irsaliye_no": "QR-TEST-002"
+            }
+        ]
+        _, created, _ = self.run_test(
+            "Create PDF QR Test Records",
+            "POST",
+            "nakliye/bulk",
+            200,
+            data=qr_records
+        )
+        qr_record_ids = [item['id'] for item in created.get('results', []) if item.get('status') == 'ok'] \
+            if isinstance(created, dict) else []
+        pdf_test_data = {"year": 2024, "month": 1, "period": "QR_Test_2024"}
         
         success, response, response_time = self.run_test(
             "Generate PDF QR Code",
@@ -899,6 +907,32 @@ class ComprehensiveCrossPlatformAPITester:
             self.log_result('file_operations', 'PDF QR Generation', False, "Request failed")
             all_success = False
         
+        # Installed Android builds still send the rows in the body (legacy payload)
+        success, response, response_time = self.run_test(
+            "Generate PDF QR Code (Legacy Payload)",
+            "POST",
+            "generate-pdf-qr",
+            200,
+            data={"data": qr_records, "period": "QR_Test_2024"}
+        )
+        if success and isinstance(response, dict) and response.get('success') == True:
+            print(f"✅ Legacy PDF QR generation successful")
+            generated_file_ids.append(response.get('file_id'))
+            self.log_result('file_operations', 'PDF QR Generation (Legacy)', True, f"File ID: {response.get('file_id')}, Time: {response_time:.3f}s")
+        else:
+            print(f"❌ Legacy PDF QR generation failed")
+            self.log_result('file_operations', 'PDF QR Generation (Legacy)', False, "Request failed")
+            all_success = False
+        
+        if qr_record_ids:
+            self.run_test(
+                "Delete PDF QR Test Records",
+                "POST",
+                "nakliye/bulk-delete",
+                200,
+                data={"ids": qr_record_ids}
+            )
+        
         # Test Backup QR code generation
         print("\n💾 Backup QR Code Generation Test")
         success, response, response_time = self.run_test(
@@ -985,18 +1019,30 @@ class ComprehensiveCrossPlatformAPITester:
         # Test error cases
         print("\n❌ QR Code Error Handling Tests")
         
-        # Test PDF generation with empty data
+        # Test PDF generation for a period without records
         success, response, _ = self.run_test(
             "PDF QR with Empty Data",
             "POST",
             "generate-pdf-qr", 
             400,  # Should return 400 for empty data
-            data={"data": [], "period": "Empty_Test"}
+            data={"year": 1990, "month": 1, "period": "Empty_Test"}
         )
         self.log_result('file_operations', 'PDF QR Empty Data Error', success, "Properly rejected empty data")
         if not success:
             all_success = False
         
+        # Test PDF generation with an empty legacy payload
+        success, response, _ = self.run_test(
+            "PDF QR with Empty Legacy Data",
+            "POST",
+            "generate-pdf-qr", 
+            400,  # Should return 400 for empty data
+            data={"data": [], "period": "Empty_Test"}
+        )
+        self.log_result('file_operations', 'PDF QR Empty Legacy Data Error', success, "Properly rejected empty legacy data")
+        if not success:
+            all_success = False
+        
         # Test invalid file ID download
         fake_file_id = "nonexistent_file.pdf"
         download_url = f"{self.base_url.replace('/api', '')}/download-temp/{fake_file_id}"
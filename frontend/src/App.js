@@ -5,7 +5,6 @@ import { Capacitor } from '@capacitor/core';
 import { Filesystem, Directory } from '@capacitor/filesystem';
 import { Share } from '@capacitor/share';
 import { saveAs } from 'file-saver';
-import QRCode from 'qrcode';
 import { Button } from "./components/ui/button";
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "./components/ui/card";
 import { Input } from "./components/ui/input";
@@ -111,6 +110,9 @@ function App() {
     sistem: 0
   });
   
+  // Müşteri adı önerileri (otomatik tamamlama)
+  const [musteriOnerileri, setMusteriOnerileri] = useState([]);
+
   // Çoklu seçim için state'ler
   const [selectedItems, setSelectedItems] = useState([]);
   const [selectAll, setSelectAll] = useState(false);
@@ -180,11 +182,25 @@ function App() {
     setIsLoggedIn(false);
   };
 
+  // Dönem filtresi sunucuda uygulanır, sayfalar cursor ile takip edilir
+  const fetchPeriodRecords = async (endpoint, params) => {
+    let records = [];
+    let cursor = null;
+    do {
+      const response = await axios.get(`${API}/${endpoint}`, {
+        params: { ...params, limit: 500, ...(cursor ? { cursor } : {}) }
+      });
+      records = records.concat(response.data);
+      cursor = response.headers['x-next-cursor'];
+    } while (cursor);
+    return records;
+  };
+
   // Yatan Tutar CRUD Functions
   const fetchYatulanTutarList = async () => {
     try {
-      const response = await axios.get(`${API}/yatan-tutar`);
-      setYatulanTutarList(response.data);
+      const records = await fetchPeriodRecords('yatan-tutar', { year: displayYear, month: displayMonth + 1 });
+      setYatulanTutarList(records);
     } catch (error) {
       console.error("Yatan tutar listesi yüklenirken hata:", error);
       toast({
@@ -330,18 +346,10 @@ function App() {
 
     try {
       setLoading(true);
-      let successCount = 0;
-      let errorCount = 0;
-
-      for (const id of selectedYatulanItems) {
-        try {
-          await axios.delete(`${API}/yatan-tutar/${id}`);
-          successCount++;
-        } catch (error) {
-          console.error(`Yatan tutar kayıt silme hatası (${id}):`, error);
-          errorCount++;
-        }
-      }
+      // Tek istekte toplu silme
+      const response = await axios.post(`${API}/yatan-tutar/bulk-delete`, { ids: selectedYatulanItems });
+      const successCount = response.data.deleted;
+      const errorCount = selectedYatulanItems.length - successCount;
 
       toast({
         title: "Silme İşlemi Tamamlandı",
@@ -365,8 +373,8 @@ function App() {
   const fetchNakliyeList = async () => {
     try {
       setLoading(true);
-      const response = await axios.get(`${API}/nakliye`);
-      setNakliyeList(response.data);
+      const records = await fetchPeriodRecords('nakliye', { year: displayYear, month: displayMonth + 1 });
+      setNakliyeList(records);
     } catch (error) {
       console.error("Nakliye listesi getirilirken hata:", error);
       toast({
@@ -453,6 +461,20 @@ function App() {
     }
   };
 
+  const handleMusteriChange = async (value) => {
+    setFormData(prev => ({ ...prev, musteri: value }));
+    if (!value.trim()) {
+      setMusteriOnerileri([]);
+      return;
+    }
+    try {
+      const response = await axios.get(`${API}/musteri/suggest`, { params: { q: value } });
+      setMusteriOnerileri(response.data.map(item => item.musteri));
+    } catch (error) {
+      setMusteriOnerileri([]);
+    }
+  };
+
   const handleEdit = (item) => {
     setEditingItem(item);
     setFormData({
@@ -542,18 +564,10 @@ function App() {
 
     try {
       setLoading(true);
-      let successCount = 0;
-      let errorCount = 0;
-
-      for (const id of selectedItems) {
-        try {
-          await axios.delete(`${API}/nakliye/${id}`);
-          successCount++;
-        } catch (error) {
-          console.error(`Kayıt silme hatası (${id}):`, error);
-          errorCount++;
-        }
-      }
+      // Tek istekte toplu silme
+      const response = await axios.post(`${API}/nakliye/bulk-delete`, { ids: selectedItems });
+      const successCount = response.data.deleted;
+      const errorCount = selectedItems.length - successCount;
 
       toast({
         title: "Silme İşlemi Tamamlandı",
@@ -669,14 +683,9 @@ function App() {
     setDisplayYear(year);
     setMonthDialogOpen(false);
     
-    const filteredCount = nakliyeList.filter(item => {
-      const itemDate = new Date(item.tarih);
-      return itemDate.getMonth() === month && itemDate.getFullYear() === year;
-    }).length;
-    
     toast({
       title: "Ay Seçildi",
-      description: `${monthNames[month]} ${year} - ${filteredCount} kayıt tabloda gösteriliyor`
+      description: `${monthNames[month]} ${year} kayıtları tabloda gösteriliyor`
     });
   };
 
@@ -698,36 +707,30 @@ function App() {
     setUserEditDialogOpen(true);
   };
 
+  // Rapor işini başlatır ve bitene kadar durumunu sorgular
+  const waitForReportJob = async (request) => {
+    let { data: job } = await axios.post(`${API}/reports`, request);
+    while (job.status === 'queued' || job.status === 'running') {
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+      ({ data: job } = await axios.get(`${API}/reports/${job.id}`));
+    }
+    if (job.status === 'failed') {
+      throw new Error(job.error || 'Rapor oluşturulamadı');
+    }
+    return job;
+  };
+
   const exportToPDF = async () => {
     try {
       setLoading(true);
       
-      // Seçilen tarih aralığına göre verileri al
-      const response = await axios.get(`${API}/nakliye`);
-      const yatulanResponse = await axios.get(`${API}/yatan-tutar`);
-      
-      let filteredData = response.data;
-      let filteredYatulanData = yatulanResponse.data;
-
-      if (pdfReportType === 'yearly') {
-        filteredData = response.data.filter(item => {
-          const itemDate = new Date(item.tarih);
-          return itemDate.getFullYear() === selectedPdfYear;
-        });
-        filteredYatulanData = yatulanResponse.data.filter(item => {
-          const yatanDate = new Date(item.yatan_tarih);
-          return yatanDate.getFullYear() === selectedPdfYear;
-        });
-      } else {
-        filteredData = response.data.filter(item => {
-          const itemDate = new Date(item.tarih);
-          return itemDate.getFullYear() === selectedPdfYear && itemDate.getMonth() === selectedPdfMonth;
-        });
-        filteredYatulanData = yatulanResponse.data.filter(item => {
-          const yatanDate = new Date(item.yatan_tarih);
-          return yatanDate.getFullYear() === selectedPdfYear && yatanDate.getMonth() === selectedPdfMonth;
-        });
-      }
+      // Sadece dönem gönderilir; kayıtlar sunucuda veritabanından okunur
+      const periodParams = pdfReportType === 'yearly'
+        ? { year: selectedPdfYear }
+        : { year: selectedPdfYear, month: selectedPdfMonth + 1 };
+      const reportPeriod = pdfReportType === 'yearly' 
+        ? `${selectedPdfYear}_Yillik`
+        : `${monthNames[selectedPdfMonth]}_${selectedPdfYear}`;
 
       // Android için QR kod çözümü - kesinlikle çalışır
       const isAndroid = /Android/i.test(navigator.userAgent);
@@ -740,28 +743,19 @@ function App() {
             description: "QR kod oluşturuluyor"
           });
 
-          const response = await axios.post(`${API}/generate-pdf-qr`, {
-            data: filteredData,
-            period: pdfReportType === 'yearly' 
-              ? `${selectedPdfYear}_Yillik`
-              : `${monthNames[selectedPdfMonth]}_${selectedPdfYear}`
+          // Rapor arka planda üretilir; bağlantı rapor bitene kadar açık tutulmaz
+          const job = await waitForReportJob({
+            kind: 'summary',
+            ...periodParams,
+            period: reportPeriod
           });
 
-          if (response.data.success) {
-            // QR kod oluştur - sadece URL'i kullan
-            const qrCodeDataUrl = await QRCode.toDataURL(response.data.download_url, {
-              width: 300,
-              margin: 2,
-              color: {
-                dark: '#000000',
-                light: '#FFFFFF'
-              }
-            });
-            
+          if (job.status === 'done') {
+            // QR kod görseli sunucuda üretilir
             setQrCodeData({
-              qrCode: qrCodeDataUrl,
-              downloadUrl: response.data.download_url,
-              fileName: response.data.filename,
+              qrCode: job.qr_url,
+              downloadUrl: job.download_url,
+              fileName: job.filename,
               fileType: 'PDF Raporu',
               instruction: 'QR kodu telefonunuzun kamera uygulaması ile tarayın veya aşağıdaki linke dokunun'
             });
@@ -785,14 +779,8 @@ function App() {
       }
 
       // Server-side PDF oluşturma (Android için)
-      const reportPeriod = pdfReportType === 'yearly' 
-        ? `${selectedPdfYear}_Yillik`
-        : `${monthNames[selectedPdfMonth]}_${selectedPdfYear}`;
-
       const requestData = {
-        data: filteredData,
-        yatan_data: filteredYatulanData,
-        report_type: pdfReportType,
+        ...periodParams,
         period: reportPeriod
       };
 
@@ -823,7 +811,7 @@ function App() {
 
       toast({
         title: "PDF Server-Side İndirme Başarılı",
-        description: `${reportPeriod} raporu server'dan indirildi (${filteredData.length} kayıt)\n📁 Konum: İndirilenler klasöründe\n📄 Dosya: ${fileName}`,
+        description: `${reportPeriod} raporu server'dan indirildi\n📁 Konum: İndirilenler klasöründe\n📄 Dosya: ${fileName}`,
         duration: 6000
       });
 
@@ -852,7 +840,8 @@ function App() {
   };
 
   // Yedekleme fonksiyonları
-  const exportBackup = async () => {
+  // mode: 'full' (tam yedek) veya 'incremental' (son yedekten sonraki değişiklikler)
+  const exportBackup = async (mode = 'full') => {
     try {
       // Android için QR kod çözümü
       const isAndroid = /Android/i.test(navigator.userAgent);
@@ -865,21 +854,15 @@ function App() {
             description: "QR kod oluşturuluyor"
           });
 
-          const response = await axios.post(`${API}/generate-backup-qr`);
+          // Mobil veri için sıkıştırılmış yedek (geri yüklemede biçim otomatik anlaşılır)
+          const response = await axios.post(`${API}/generate-backup-qr`, null, {
+            params: { format: 'jsonl.gz', mode }
+          });
 
           if (response.data.success) {
-            // QR kod oluştur - sadece URL'i kullan
-            const qrCodeDataUrl = await QRCode.toDataURL(response.data.download_url, {
-              width: 300,
-              margin: 2,
-              color: {
-                dark: '#000000',
-                light: '#FFFFFF'
-              }
-            });
-            
+            // QR kod görseli sunucuda üretilir
             setQrCodeData({
-              qrCode: qrCodeDataUrl,
+              qrCode: response.data.qr_url,
               downloadUrl: response.data.download_url,
               fileName: response.data.filename,
               fileType: 'Yedek Dosyası',
@@ -913,6 +896,7 @@ function App() {
       console.log('Server-side yedek indirme başlıyor...');
       
       const response = await axios.post(`${API}/generate-backup-download`, {}, {
+        params: { mode },
         responseType: 'blob',
         headers: {
           'Content-Type': 'application/json'
@@ -921,7 +905,10 @@ function App() {
 
       // Blob'dan dosya oluştur ve indir
       const blob = new Blob([response.data], { type: 'application/json' });
-      const filename = `Arkas_Yedek_${new Date().toISOString().split('T')[0]}.json`;
+      const dispositionMatch = /filename=([^;]+)/.exec(response.headers['content-disposition'] || '');
+      const filename = dispositionMatch
+        ? dispositionMatch[1].trim()
+        : `Arkas_Yedek_${new Date().toISOString().split('T')[0]}.json`;
       
       // Modern dosya indirme
       const url = window.URL.createObjectURL(blob);
@@ -945,122 +932,97 @@ function App() {
       
     } catch (error) {
       console.error('Yedekleme hatası:', error);
+      // Blob yanıtındaki hata mesajını oku (ör. artımlı yedek için önce tam yedek gerekli)
+      let detail = "Yedek oluşturulamadı. Lütfen tekrar deneyin.";
+      if (error.response?.data instanceof Blob) {
+        try {
+          detail = JSON.parse(await error.response.data.text()).detail || detail;
+        } catch (parseError) {
+          // Varsayılan mesaj kullanılır
+        }
+      }
       toast({
         title: "Yedekleme Hatası",
-        description: "Yedek oluşturulamadı. Lütfen tekrar deneyin.",
+        description: detail,
         variant: "destructive"
       });
     }
   };
 
   const importBackup = async (event) => {
-    const file = event.target.files[0];
-    if (!file) return;
-
-    const reader = new FileReader();
-    reader.onload = async (e) => {
-      try {
-        const backupData = JSON.parse(e.target.result);
-        
-        if (!backupData.nakliyeData || !Array.isArray(backupData.nakliyeData)) {
-          throw new Error('Geçersiz yedek dosyası');
-        }
+    // Tam yedek ve artımlı yedekler birlikte seçilebilir; dosya adları zincir sırasını verir
+    const files = Array.from(event.target.files).sort((a, b) => a.name.localeCompare(b.name));
+    if (files.length === 0) return;
+    event.target.value = '';
 
-        // Mevcut kayıtları al
-        const existingResponse = await axios.get(`${API}/nakliye`);
-        const existingData = existingResponse.data;
-        
-        // Mevcut yatan tutar kayıtlarını al
-        const existingYatulanResponse = await axios.get(`${API}/yatan-tutar`);
-        const existingYatulanData = existingYatulanResponse.data;
-        
-        let nakliyeAddedCount = 0;
-        let nakliyeSkippedCount = 0;
-        let yatulanAddedCount = 0;
-        let yatulanSkippedCount = 0;
-
-        // Nakliye verilerini geri yükle - duplicate kontrolü ile
-        for (const item of backupData.nakliyeData) {
-          try {
-            // Aynı sıra_no, musteri ve irsaliye_no kombinasyonu var mı kontrol et
-            const isDuplicate = existingData.some(existing => 
-              existing.sira_no === item.sira_no && 
-              existing.musteri === item.musteri && 
-              existing.irsaliye_no === item.irsaliye_no
-            );
-
-            if (!isDuplicate) {
-              await axios.post(`${API}/nakliye`, item);
-              nakliyeAddedCount++;
-            } else {
-              nakliyeSkippedCount++;
-              console.log(`Duplicate nakliye kaydı atlandı: ${item.sira_no} - ${item.musteri} - ${item.irsaliye_no}`);
-            }
-          } catch (err) {
-            console.warn('Nakliye kaydı yüklenirken hata:', err);
-            nakliyeSkippedCount++;
-          }
-        }
+    const totals = { added: 0, updated: 0, deleted: 0, skipped: 0, failed: 0 };
+    let yatulanAdded = 0;
+    let restoredCount = 0;
+
+    try {
+      toast({
+        title: "Geri Yükleme Başlatılıyor...",
+        description: `${files.length} yedek dosyası server'a gönderiliyor`
+      });
 
-        // Yatan Tutar verilerini geri yükle (eğer varsa)
-        if (backupData.yatulanTutarData && Array.isArray(backupData.yatulanTutarData)) {
-          for (const item of backupData.yatulanTutarData) {
-            try {
-              // Aynı tutar, yatan_tarih ve baslangic_tarih kombinasyonu var mı kontrol et
-              const isDuplicate = existingYatulanData.some(existing => 
-                existing.tutar === item.tutar && 
-                existing.yatan_tarih === item.yatan_tarih && 
-                existing.baslangic_tarih === item.baslangic_tarih
-              );
-
-              if (!isDuplicate) {
-                await axios.post(`${API}/yatan-tutar`, item);
-                yatulanAddedCount++;
-              } else {
-                yatulanSkippedCount++;
-                console.log(`Duplicate yatan tutar kaydı atlandı: ${item.tutar} - ${item.yatan_tarih}`);
-              }
-            } catch (err) {
-              console.warn('Yatan tutar kaydı yüklenirken hata:', err);
-              yatulanSkippedCount++;
-            }
+      for (const file of files) {
+        // Dosya olduğu gibi gönderilir; server akış halinde okuyup tekrar eden kayıtları atlar
+        const response = await axios.post(`${API}/restore`, file, {
+          headers: {
+            'Content-Type': 'application/octet-stream'
           }
-        }
+        });
+        const { nakliye, yatan_tutar, user_info } = response.data;
+        Object.keys(totals).forEach(key => {
+          totals[key] += nakliye[key] + yatan_tutar[key];
+        });
+        yatulanAdded += yatan_tutar.added;
+        restoredCount++;
 
         // Kullanıcı bilgilerini geri yükle
-        if (backupData.userInfo) {
-          setUserInfo(backupData.userInfo);
-          localStorage.setItem('arkas_user_info', JSON.stringify(backupData.userInfo));
-        }
-
-        fetchNakliyeList();
-        fetchYatulanTutarList();
-        
-        // Detaylı sonuç mesajı
-        let message = `${nakliyeAddedCount} nakliye kaydı eklendi`;
-        if (yatulanAddedCount > 0) {
-          message += `, ${yatulanAddedCount} yatan tutar kaydı eklendi`;
-        }
-        if (nakliyeSkippedCount > 0 || yatulanSkippedCount > 0) {
-          const totalSkipped = nakliyeSkippedCount + yatulanSkippedCount;
-          message += `, ${totalSkipped} duplicate kayıt atlandı`;
+        if (user_info) {
+          setUserInfo(user_info);
+          localStorage.setItem('arkas_user_info', JSON.stringify(user_info));
         }
-        
-        toast({
-          title: "Geri Yükleme Tamamlandı",
-          description: message
-        });
-      } catch (error) {
-        console.error('Import backup error:', error);
-        toast({
-          title: "Hata",
-          description: "Geri yükleme sırasında hata oluştu: " + error.message,
-          variant: "destructive"
-        });
       }
-    };
-    reader.readAsText(file);
-    event.target.value = '';
+    } catch (error) {
+      console.error('Import backup error:', error);
+      toast({
+        title: "Hata",
+        description: "Geri yükleme sırasında hata oluştu: " + (error.response?.data?.detail || error.message),
+        variant: "destructive"
+      });
+      if (restoredCount === 0) return;
+    }
+
+    fetchNakliyeList();
+    fetchYatulanTutarList();
+
+    // Detaylı sonuç mesajı
+    let message = `${totals.added - yatulanAdded} nakliye kaydı eklendi`;
+    if (yatulanAdded > 0) {
+      message += `, ${yatulanAdded} yatan tutar kaydı eklendi`;
+    }
+    if (totals.updated > 0) {
+      message += `, ${totals.updated} kayıt güncellendi`;
+    }
+    if (totals.deleted > 0) {
+      message += `, ${totals.deleted} kayıt silindi`;
+    }
+    if (totals.skipped > 0) {
+      message += `, ${totals.skipped} duplicate kayıt atlandı`;
+    }
+    if (totals.failed > 0) {
+      message += `, ${totals.failed} hatalı kayıt yüklenemedi`;
+    }
+    if (files.length > 1) {
+      message += ` (${restoredCount}/${files.length} dosya)`;
+    }
+
+    toast({
+      title: "Geri Yükleme Tamamlandı",
+      description: message
+    });
   };
 
   const showDetails = (type) => {
@@ -1097,7 +1059,7 @@ function App() {
       fetchNakliyeList();
       fetchYatulanTutarList();
     }
-  }, [isLoggedIn]);
+  }, [isLoggedIn, displayMonth, displayYear]);
 
   useEffect(() => {
     calculateTotal();
@@ -1645,7 +1607,7 @@ function App() {
                   </Button>
                   
                   <Button 
-                    onClick={exportBackup} 
+                    onClick={() => exportBackup('full')} 
                     variant="outline" 
                     className="flex-1 sm:flex-none border-orange-300 text-orange-600 hover:bg-orange-50 text-xs sm:text-sm btn-android"
                     disabled={loading}
@@ -1654,6 +1616,17 @@ function App() {
                     <span className="hidden xs:inline">Yedek Al</span>
                     <span className="xs:hidden">Yedek</span>
                   </Button>
+                  
+                  <Button 
+                    onClick={() => exportBackup('incremental')} 
+                    variant="outline" 
+                    className="flex-1 sm:flex-none border-orange-300 text-orange-600 hover:bg-orange-50 text-xs sm:text-sm btn-android"
+                    disabled={loading}
+                  >
+                    <Download className="mr-1 sm:mr-2 h-3 w-3 sm:h-4 sm:w-4" />
+                    <span className="hidden xs:inline">Artımlı Yedek</span>
+                    <span className="xs:hidden">Artımlı</span>
+                  </Button>
                 </div>
                 
                 {/* İkinci satır: Yükleme ve Yeni Kayıt butonları */}
@@ -1686,7 +1659,8 @@ function App() {
                 <input
                   id="backup-file-input"
                   type="file"
-                  accept=".json"
+                  accept=".json,.gz,.zst,.bson"
+                  multiple
                   onChange={importBackup}
                   style={{ display: 'none' }}
                 />
@@ -1750,11 +1724,18 @@ function App() {
                             <Label htmlFor="musteri">Müşteri</Label>
                             <Input
                               id="musteri"
+                              list="musteri-onerileri"
+                              autoComplete="off"
                               value={formData.musteri}
-                              onChange={(e) => setFormData(prev => ({ ...prev, musteri: e.target.value }))}
+                              onChange={(e) => handleMusteriChange(e.target.value)}
                               placeholder="Müşteri adı"
                               required
                             />
+                            <datalist id="musteri-onerileri">
+                              {musteriOnerileri.map(musteri => (
+                                <option key={musteri} value={musteri} />
+                              ))}
+                            </datalist>
                           </div>
                           <div className="space-y-2 md:col-span-2">
                             <Label htmlFor="irsaliye_no">İrsaliye No</Label>
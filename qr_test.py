@@ -10,6 +10,26 @@ import os
 import time
 from datetime import datetime
 
+QR_TEST_RECORDS = [
+    {
+        "sira_no": "QR001",
+        "musteri": "QR Test Müşteri",
+        "tarih": "2024-01-01",
+        "toplam": 1000.50,
+        "sistem": 950.25,
+        "irsaliye_no": "QR-TEST-001"
+    },
+    {
+        "sira_no": "QR002", 
+        "musteri": "QR Test Müşteri 2",
+        "tarih": "2024-01-02",
+        "toplam": 2500.75,
+        "sistem": 2400.00,
+        "irsaliye_no": "QR-TEST-002"
+    }
+]
+
+
 class QRCodeEndpointTester:
     def __init__(self, base_url="https://shipmate-40.preview.emergentagent.com"):
         self.base_url = base_url
@@ -20,27 +40,15 @@ class QRCodeEndpointTester:
         """Test PDF QR code generation endpoint"""
         print("\n🔍 Testing PDF QR Code Generation...")
         
-        test_data = {
-            "data": [
-                {
-                    "sira_no": "QR001",
-                    "musteri": "QR Test Müşteri",
-                    "tarih": "2024-01-01",
-                    "toplam": 1000.50,
-                    "sistem": 950.25,
-                    "irsaliye_no": "QR-TEST-001"
-                },
-                {
-                    "sira_no": "QR002", 
-                    "musteri": "QR Test Müşteri 2",
-                    "tarih": "2024-01-02",
-                    "toplam": 2500.75,
-                    "sistem": 2400.00,
-                    "irsaliye_no": "QR-TEST-002"
-                }
-            ],
-            "period": "QR_Test_2024"
-        }
+        # The PDF is requested by period; records are read from the database
+        test_data = {"year": 2024, "month": 1, "period": "QR_Test_2024"}
+        
+        try:
+            created = requests.post(f"{self.api_url}/nakliye/bulk", json=QR_TEST_RECORDS, timeout=30).json()
+            self.test_record_ids = [item["id"] for item in created.get("results", []) if item.get("status") == "ok"]
+        except Exception as e:
+            print(f"❌ Test records could not be created: {str(e)}")
+            return None
         
         try:
             response = requests.post(f"{self.api_url}/generate-pdf-qr", json=test_data, timeout=30)
@@ -66,6 +74,40 @@ class QRCodeEndpointTester:
         except Exception as e:
             print(f"❌ PDF QR generation error: {str(e)}")
             return None
+        finally:
+            self.cleanup_test_records()
+    
+    def test_pdf_qr_legacy_payload(self):
+        """Test PDF QR generation with the legacy payload (rows in the body) used by installed Android builds"""
+        print("\n🔍 Testing PDF QR Code Generation (legacy payload)...")
+        
+        try:
+            response = requests.post(f"{self.api_url}/generate-pdf-qr",
+                                   json={"data": QR_TEST_RECORDS, "period": "QR_Test_2024"},
+                                   timeout=30)
+            print(f"   Status Code: {response.status_code}")
+            
+            if response.status_code == 200:
+                result = response.json()
+                print(f"✅ Legacy PDF QR generation successful!")
+                print(f"   File ID: {result.get('file_id')}")
+                return result.get('file_id')
+            else:
+                print(f"❌ Legacy PDF QR generation failed: {response.text}")
+                return None
+        except Exception as e:
+            print(f"❌ Legacy PDF QR generation error: {str(e)}")
+            return None
+    
+    def cleanup_test_records(self):
+        """Remove the records created for the PDF QR test"""
+        if not getattr(self, "test_record_ids", None):
+            return
+        try:
+            requests.post(f"{self.api_url}/nakliye/bulk-delete", json={"ids": self.test_record_ids}, timeout=30)
+        except Exception as e:
+            print(f"⚠️ Test records could not be removed: {str(e)}")
+        self.test_record_ids = []
     
     def test_backup_qr_generation(self):
         """Test Backup QR code generation endpoint"""
@@ -147,10 +189,10 @@ class QRCodeEndpointTester:
         print("\n🔍 Testing Error Cases...")
         
         # Test PDF generation with empty data
-        print("\n   Testing PDF QR with empty data...")
+        print("\n   Testing PDF QR for a period without records...")
         try:
             response = requests.post(f"{self.api_url}/generate-pdf-qr", 
-                                   json={"data": [], "period": "Empty_Test"}, 
+                                   json={"year": 1990, "month": 1, "period": "Empty_Test"}, 
                                    timeout=10)
             if response.status_code == 400:
                 print(f"✅ Empty data properly rejected with 400")
@@ -159,6 +201,19 @@ class QRCodeEndpointTester:
         except Exception as e:
             print(f"❌ Error testing empty data: {str(e)}")
         
+        # Test PDF generation with an empty legacy payload
+        print("\n   Testing PDF QR with empty legacy data...")
+        try:
+            response = requests.post(f"{self.api_url}/generate-pdf-qr", 
+                                   json={"data": [], "period": "Empty_Test"}, 
+                                   timeout=10)
+            if response.status_code == 400:
+                print(f"✅ Empty legacy data properly rejected with 400")
+            else:
+                print(f"⚠️ Expected 400, got {response.status_code}")
+        except Exception as e:
+            print(f"❌ Error testing empty legacy data: {str(e)}")
+        
         # Test invalid file ID download
         print("\n   Testing invalid file ID download...")
         try:
@@ -234,11 +289,14 @@ class QRCodeEndpointTester:
         
         # Test QR code generation endpoints
         pdf_file_id = self.test_pdf_qr_generation()
+        legacy_pdf_file_id = self.test_pdf_qr_legacy_payload()
         backup_file_id = self.test_backup_qr_generation()
         
         # Test file downloads
         if pdf_file_id:
             self.test_temp_file_download(pdf_file_id)
+        if legacy_pdf_file_id:
+            self.test_temp_file_download(legacy_pdf_file_id)
         if backup_file_id:
             self.test_temp_file_download(backup_file_id)
         
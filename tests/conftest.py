@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Sunucu modülleri backend/ altında üst düzey modül olarak içe aktarılır
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
@@ -0,0 +1,60 @@
+import asyncio
+
+import artifacts
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+async def produce(store, key, size=10):
+    artifact_id = store.new_id("Arkas_PDF", ".pdf")
+    with open(store.staging_path(artifact_id), "wb") as handle:
+        handle.write(b"x" * size)
+    return await store.commit(artifact_id, "rapor.pdf", "application/pdf", key=key)
+
+
+def test_alias_is_dropped_with_evicted_artifact(tmp_path):
+    async def scenario():
+        store = artifacts.ArtifactStore(artifacts.LocalDiskBackend(str(tmp_path)), max_bytes=25)
+        await store.start()
+        try:
+            first = await produce(store, "k1")
+            await produce(store, "k2")
+            await produce(store, "k3")  # bütçe: en eski (k1) LRU ile silinir
+            assert store.index.get(first.id) is None
+            assert set(store.backend.aliases) == {"k2", "k3"}
+            assert await store.cached("k1") is None
+        finally:
+            await store.stop()
+
+    run(scenario())
+
+
+def test_alias_is_dropped_with_expired_artifact(tmp_path):
+    async def scenario():
+        store = artifacts.ArtifactStore(artifacts.LocalDiskBackend(str(tmp_path)), ttl_seconds=0)
+        await store.start()
+        try:
+            await produce(store, "k1")
+            assert await store.sweep() == 1
+            assert store.backend.aliases == {}
+        finally:
+            await store.stop()
+
+    run(scenario())
+
+
+def test_concurrent_commits_share_one_artifact(tmp_path):
+    async def scenario():
+        store = artifacts.ArtifactStore(artifacts.LocalDiskBackend(str(tmp_path)))
+        await store.start()
+        try:
+            first, second = await asyncio.gather(produce(store, "k"), produce(store, "k"))
+            assert first is second
+            assert list(store.index) == [first.id]
+            assert (await store.cached("k")) is first
+        finally:
+            await store.stop()
+
+    run(scenario())
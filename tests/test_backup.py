@@ -0,0 +1,182 @@
+import asyncio
+import json
+import zlib
+
+import pytest
+import zstandard
+from pymongo.errors import BulkWriteError
+
+import backup
+
+
+def collect(chunks, decoder):
+    async def stream():
+        for chunk in chunks:
+            yield chunk
+
+    async def run():
+        return [data async for data in backup._decompressed(stream(), decoder)]
+
+    return asyncio.run(run())
+
+
+def gzip_bytes(data: bytes) -> bytes:
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def zstd_stream_bytes(data: bytes) -> bytes:
+    compressor = zstandard.ZstdCompressor(write_checksum=True).compressobj()
+    return compressor.compress(data) + compressor.flush()
+
+
+def split(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+BOMB = b"\0" * (64 * 1024 * 1024)
+TEXT = b"".join(b'{"id": "%d", "musteri": "M\xc3\xbc\xc5\x9fteri %d"}\n' % (i, i % 13) for i in range(20000))
+
+
+@pytest.mark.parametrize("compress, decoder, limit", [
+    (gzip_bytes, backup._GzipDecoder, backup.DECOMPRESS_CHUNK),
+    (zstd_stream_bytes, backup._ZstdDecoder, 128 * 1024),
+    (zstandard.ZstdCompressor(level=19).compress, backup._ZstdDecoder, 128 * 1024),
+])
+def test_decompression_is_bounded_per_step(compress, decoder, limit):
+    compressed = compress(BOMB)
+    assert len(compressed) < 1024 * 1024
+    outputs = collect([compressed], decoder())
+    assert max(len(output) for output in outputs) <= limit
+    assert sum(len(output) for output in outputs) == len(BOMB)
+
+
+@pytest.mark.parametrize("compress, decoder", [
+    (gzip_bytes, backup._GzipDecoder),
+    (zstd_stream_bytes, backup._ZstdDecoder),
+    (zstandard.ZstdCompressor().compress, backup._ZstdDecoder),
+])
+@pytest.mark.parametrize("chunk_size", [1, 7, 4096, 10 ** 9])
+def test_decompression_is_independent_of_chunking(compress, decoder, chunk_size):
+    outputs = collect(split(compress(TEXT), chunk_size), decoder())
+    assert b"".join(outputs) == TEXT
+
+
+@pytest.mark.parametrize("compress, decoder", [
+    (gzip_bytes, backup._GzipDecoder),
+    (zstd_stream_bytes, backup._ZstdDecoder),
+])
+def test_truncated_compressed_backup_is_rejected(compress, decoder):
+    compressed = compress(TEXT)
+    with pytest.raises(backup.BackupParseError):
+        collect([compressed[:-10]], decoder())
+
+
+BACKUP = {
+    "version": "2.0",
+    "exportDate": "2026-01-31T23:59:59.123456+00:00",
+    "nakliyeData": [
+        {"id": "a1", "sira_no": 1, "musteri": "Çağrı \"Lojistik\" Ltd. Şti.", "toplam": 1250.75,
+         "notlar": "satır\nsonu \\ ters bölü é \U0001F69A", "etiketler": [], "ek": {"x": [1, {"y": None}]}},
+        {"id": "a2", "sira_no": 22, "musteri": "Öz İş", "toplam": -3e-2, "iptal": False},
+    ],
+    "yatulanTutarData": [],
+    "deletedData": [{"id": "a0", "collection": "nakliye_kayitlari"}],
+    "kayitSayisi": 1234567,
+}
+
+
+def expected_events(document):
+    events = []
+    for key, value in document.items():
+        if key in backup.RECORD_SECTIONS and isinstance(value, list):
+            events.append(("section", key, None))
+            events.extend(("record", key, item) for item in value)
+        else:
+            events.append(("meta", key, value))
+    return events
+
+
+def parse_text(parts):
+    parser = backup.BackupStreamParser()
+    events = []
+    for part in parts:
+        events.extend(parser.feed(part))
+    return events + parser.close()
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+def test_stream_parser_splits_at_every_offset(indent):
+    text = json.dumps(BACKUP, ensure_ascii=False, indent=indent)
+    expected = expected_events(BACKUP)
+    assert parse_text([text]) == expected
+    for offset in range(len(text) + 1):
+        assert parse_text([text[:offset], text[offset:]]) == expected, offset
+    assert parse_text(list(text)) == expected
+
+
+def test_backup_events_split_at_every_byte_offset():
+    data = json.dumps(BACKUP, ensure_ascii=False).encode("utf-8")
+    expected = expected_events(BACKUP)
+
+    async def run(chunks):
+        async def stream():
+            for chunk in chunks:
+                yield chunk
+        return [event async for event in backup.iter_backup_events(stream())]
+
+    for offset in range(1, len(data)):
+        assert asyncio.run(run([data[:offset], data[offset:]])) == expected, offset
+
+
+@pytest.mark.parametrize("text", [
+    '{"nakliyeData": [{"id": "a1"}',
+    '{"nakliyeData": [{"id": "a1"}]',
+    '{"kayitSayisi": 12',
+])
+def test_stream_parser_rejects_truncated_input(text):
+    with pytest.raises(backup.BackupParseError):
+        parse_text([text])
+
+
+class FakeCollection:
+    """bulk_write çağrısında verilen yazma hatalarıyla BulkWriteError fırlatır"""
+
+    def __init__(self, write_errors, upserted=()):
+        self.write_errors = write_errors
+        self.upserted = list(upserted)
+
+    def find(self, query, projection=None):
+        async def empty():
+            return
+            yield
+        return empty()
+
+    async def bulk_write(self, operations, ordered=True):
+        raise BulkWriteError({"writeErrors": self.write_errors, "upserted": self.upserted})
+
+
+KEY_FIELDS = backup.DEDUP_KEYS["nakliye_kayitlari"]
+DOCS = [{"id": f"n{i}", "sira_no": i, "musteri": "M", "irsaliye_no": str(i)} for i in range(4)]
+WRITE_ERRORS = [
+    # Aynı kayıt eşzamanlı eklenmiş: doğal anahtar çakışması
+    {"index": 1, "code": 11000, "errmsg": "E11000 sira_musteri_irsaliye_unique",
+     "keyPattern": {"sira_no": 1, "musteri": 1, "irsaliye_no": 1}},
+    # Başka bir kayıt aynı id ile var
+    {"index": 2, "code": 11000, "errmsg": "E11000 id_unique", "keyPattern": {"id": 1}},
+    {"index": 3, "code": 121, "errmsg": "Document failed validation"},
+]
+
+
+def test_upsert_new_counts_only_natural_key_duplicates_as_skipped():
+    collection = FakeCollection(WRITE_ERRORS, upserted=[{"index": 0, "_id": "x"}])
+    inserted, skipped, failed = asyncio.run(backup.upsert_new(collection, DOCS, KEY_FIELDS))
+    assert inserted == DOCS[:1]
+    assert (skipped, failed) == (1, 2)
+
+
+def test_upsert_latest_counts_only_natural_key_duplicates_as_skipped():
+    collection = FakeCollection(WRITE_ERRORS)
+    changes, skipped, failed = asyncio.run(backup.upsert_latest(collection, DOCS, KEY_FIELDS))
+    assert changes == [(None, DOCS[0])]
+    assert (skipped, failed) == (1, 2)
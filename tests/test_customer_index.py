@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta, timezone
+
+import customer_index
+from customer_index import CustomerIndex
+
+
+def build_index(names):
+    index = CustomerIndex()
+    used_at = datetime.now(timezone.utc) - timedelta(days=365)
+    for name in names:
+        index.add(name, used_at)
+    return index
+
+
+def suggested(index, query, limit=5):
+    return [item["musteri"] for item in index.suggest(query, limit)]
+
+
+def test_suggest_ranks_over_full_prefix_range():
+    names = [f"ARKAS {i:04d}" for i in range(customer_index.SUGGEST_SCAN_LIMIT * 3)]
+    index = build_index(names)
+    # Alfabetik olarak en sonda ama en çok kullanılan müşteri
+    for _ in range(50):
+        index.add("ARKAS ZİRVE", datetime.now(timezone.utc))
+
+    assert suggested(index, "a")[0] == "ARKAS ZİRVE"
+    assert suggested(index, "ark")[0] == "ARKAS ZİRVE"
+    assert suggested(index, "zir") == ["ARKAS ZİRVE"]
+
+
+def test_suggest_cache_follows_changes():
+    names = [f"ARKAS {i:04d}" for i in range(customer_index.SUGGEST_SCAN_LIMIT * 3)]
+    index = build_index(names)
+    assert suggested(index, "ar")[0] != "ARKAS 0450"
+    assert "ar" in index.ranked
+
+    for _ in range(20):
+        index.add("ARKAS 0450", datetime.now(timezone.utc))
+    assert suggested(index, "ar")[0] == "ARKAS 0450"
+    assert index.suggest("ar", 1) == [{"musteri": "ARKAS 0450", "kayit_sayisi": 21}]
+
+    for _ in range(21):
+        index.remove("ARKAS 0450")
+    assert "ARKAS 0450" not in suggested(index, "ar", 50)
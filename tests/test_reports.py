@@ -0,0 +1,72 @@
+import re
+from io import BytesIO
+
+import pytest
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.platypus import SimpleDocTemplate
+
+import reports
+from report_data import nakliye_table
+
+ROWS = 2500
+
+
+def records(count):
+    return [
+        {"sira_no": f"R{i:05d}", "musteri": f"Müşteri {i % 7}", "irsaliye_no": f"I{i}",
+         "tarih": f"2024-01-{i % 28 + 1:02d}", "toplam": 10, "sistem": 4}
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def chunks(monkeypatch):
+    """Büyük rapor düzeninde üretilen her sayfa tablosunun satırları"""
+    recorded = []
+
+    class RecordingLongTable(reports.LongTable):
+        def __init__(self, data, *args, **kwargs):
+            recorded.append(data)
+            super().__init__(data, *args, **kwargs)
+
+    monkeypatch.setattr(reports, "LongTable", RecordingLongTable)
+    return recorded
+
+
+def page_count(pdf: bytes) -> int:
+    return len(re.findall(rb"/Type /Page\b(?!s)", pdf))
+
+
+def check_chunks(chunks, kind):
+    """Her parça: başlık + kayıtlar + sayfa toplamı; son parça genel toplamla biter"""
+    numbers = []
+    for position, chunk in enumerate(chunks):
+        last = position == len(chunks) - 1
+        body = chunk[1:-2] if last else chunk[1:-1]
+        page_total = chunk[-2] if last else chunk[-1]
+        assert chunk[0] == reports.nakliye_header(kind)
+        assert page_total == reports.total_row(kind, 'Sayfa Toplamı:', len(body) * 10, len(body) * 4)
+        numbers.extend(row[0] for row in body)
+    assert chunks[-1][-1] == reports.total_row(kind, 'GENEL TOPLAM:', ROWS * 10, ROWS * 4)
+    assert numbers == [f"R{i:05d}" for i in range(ROWS)]
+
+
+def test_large_report_has_one_table_per_page(chunks):
+    output = BytesIO()
+    reports.build_report(output, "Ocak_2024", records(ROWS), kind="summary")
+
+    assert ROWS > reports.LARGE_REPORT_ROWS
+    check_chunks(chunks, "summary")
+    assert page_count(output.getvalue()) == len(chunks) > 1
+
+
+def test_large_report_story_survives_multi_build(chunks):
+    # multiBuild hikâyeyi kopyalayarak birden çok geçiş yapar
+    output = BytesIO()
+    doc = SimpleDocTemplate(output, pagesize=landscape(A4))
+    story = reports._large_report(doc, reports._header("Ocak_2024", doc.width),
+                                  nakliye_table(records(ROWS), "summary"), None, "summary")
+    doc.multiBuild(story)
+
+    last_pass = chunks[-page_count(output.getvalue()):]
+    check_chunks(last_pass, "summary")